@@ -46,13 +46,14 @@ class ReviewService:
             logger.error(f"Failed to generate review: {str(e)}")
             raise
     
-    async def generate_chunked_review(self, chunk_variables: Dict[str, Any], llm_service) -> PRReviewResponse:
+    async def generate_chunked_review(self, chunk_variables: Dict[str, Any], llm_service, with_summary: bool = False) -> PRReviewResponse:
         """
         Generate review response for a chunk of files.
         
         Args:
             chunk_variables: Variables prepared for the chunk including file data
             llm_service: LLM service instance
+            with_summary: Whether to also return the chunk's summary section
         
         Returns:
             PRReviewResponse: Review response for the chunk
@@ -67,7 +68,14 @@ class ReviewService:
             prompt = self.prompt_manager.create_filled_prompt('review', chunk_variables)
             
             # Generate review using LLM
-            review, review_usage, model_info = await llm_service.generate_code_review(prompt)
+            summary_section = None
+            if with_summary:
+                review_items, summary_section, review_usage, model_info = await llm_service.generate_code_review_with_summary(prompt)
+                review = ""
+            else:
+                # Comments arrive as parsed items in both output modes, no text to serialize and parse again
+                review_items, review_usage, model_info = await llm_service.generate_code_review_items(prompt)
+                review = ""
             
             logger.info(f"Chunked review generated successfully. Usage: {review_usage}")
             
@@ -75,6 +83,8 @@ class ReviewService:
                 prNumber=str(pr_number), 
                 pr_line=1, 
                 pr_review_and_suggestion=review, 
+                review_items=review_items,
+                summary_section=summary_section,
                 review_usage=review_usage, 
                 model_info=model_info
             )
@@ -97,9 +107,9 @@ async def generate_review_response(variables: dict, llm_service) -> PRReviewResp
     return await _review_service.generate_review(variables, llm_service)
 
 
-async def generate_chunked_review_response(chunk_variables: dict, llm_service) -> PRReviewResponse:
+async def generate_chunked_review_response(chunk_variables: dict, llm_service, with_summary: bool = False) -> PRReviewResponse:
     """
     Legacy function for backward compatibility.
     Use ReviewService.generate_chunked_review() for new code.
     """
-    return await _review_service.generate_chunked_review(chunk_variables, llm_service) 
\ No newline at end of file
+    return await _review_service.generate_chunked_review(chunk_variables, llm_service, with_summary) 
\ No newline at end of file
@@ -1,7 +1,10 @@
 import json 
-import re 
 from typing import List, Dict, Optional, Any
+from app.utils.parsed_diff import get_parsed_diff, build_parsed_diff
+from app.utils.json_salvage import salvage_json_array
+from app.models.review_schema import SEVERITY_CODES, CATEGORY_CODES
 from app.core.setup import setup_logger
+from config.settings import settings
 
 logger = setup_logger(__name__)
 
@@ -12,51 +15,27 @@ class JSONParser:
     @staticmethod
     def parse_json_from_text(text: str) -> List[Dict[str, Any]]:
         """
-        Parse JSON array from text using multiple strategies.
+        Parse the objects of a JSON array from text, bare, fenced or surrounded by prose.
         
         Args:
             text: Input text that may contain JSON
             
         Returns:
-            List of dictionaries parsed from JSON, empty list if parsing fails
+            List of every complete object recovered, empty list if none
         """
         text = (text or "").strip()
         if not text:
             return []
         
-        # Strategy 1: Parse direct JSON
-        try:
-            parsed = json.loads(text)
-            if isinstance(parsed, list):
-                logger.debug("Successfully parsed direct JSON")
-                return parsed
-        except json.JSONDecodeError:
-            pass
-        
-        # Strategy 2: Parse fenced JSON (```json ... ```)
-        fenced_match = re.search(r"```json\s*(\[.*?\])\s*```", text, flags=re.DOTALL | re.IGNORECASE)
-        if fenced_match:
-            try:
-                parsed = json.loads(fenced_match.group(1))
-                if isinstance(parsed, list):
-                    logger.debug("Successfully parsed fenced JSON")
-                    return parsed
-            except json.JSONDecodeError:
-                pass
-        
-        # Strategy 3: Find first JSON array substring
-        array_match = re.search(r"\[.*\]", text, flags=re.DOTALL)
-        if array_match:
-            try:
-                parsed = json.loads(array_match.group(0))
-                if isinstance(parsed, list):
-                    logger.debug("Successfully parsed JSON array substring")
-                    return parsed
-            except json.JSONDecodeError:
-                pass
-        
-        logger.warning("Failed to parse JSON from text")
-        return []
+        # Objects are decoded one by one, so a truncated or malformed item only loses itself
+        parser = salvage_json_array(text)
+        if parser.malformed_items:
+            logger.warning(f"Skipped {parser.malformed_items} malformed review items")
+        if parser.truncated:
+            logger.warning(f"Review output was truncated, recovered {len(parser.items)} complete items")
+        if not parser.items and not parser.complete:
+            logger.warning("Failed to parse JSON from text")
+        return parser.items
 
 
 class SeverityManager:
@@ -163,23 +142,39 @@ class CommentFormatter:
         Returns:
             Tuple of (line_start, line_end)
         """
-        line_start = int(item.get("line", item.get("lineStart", 1)) or 1)
+        line_start = CommentFormatter.to_line_number(item.get("line", item.get("lineStart", 1))) or 1
+        line_end = CommentFormatter.to_line_number(item.get("lineEnd"))
+        
+        return line_start, line_end
+    
+    @staticmethod
+    def to_line_number(value: Any) -> Optional[int]:
+        """
+        Coerce a line number from a review item, which text output may give as a string.
         
-        line_end = item.get("lineEnd")
-        if isinstance(line_end, str):
+        Args:
+            value: Line number as reported by the model
+            
+        Returns:
+            Line number, None if the value is missing or not a number
+        """
+        if isinstance(value, bool):
+            return None
+        if isinstance(value, (int, float)):
+            return int(value)
+        if isinstance(value, str):
             try:
-                line_end = int(line_end)
+                return int(value.strip())
             except ValueError:
-                line_end = None
-        elif not isinstance(line_end, int):
-            line_end = None
-        
-        return line_start, line_end
+                return None
+        return None
 
 
 class ReviewCommentBuilder:
     """Builds UI-ready comment objects from review items"""
     
+    MAX_SNIPPET_LINES = 30
+    
     def __init__(self):
         self.json_parser = JSONParser()
         self.severity_manager = SeverityManager()
@@ -199,6 +194,7 @@ class ReviewCommentBuilder:
         if not isinstance(item, dict):
             logger.warning("Review item is not a dictionary, skipping")
             return {}
+        item = self.expand_compact_item(item, {})
         
         # Validate and normalize severity
         raw_severity = item.get("severity", "Info")
@@ -217,7 +213,7 @@ class ReviewCommentBuilder:
             "lineEnd": line_end,
             "content": content,
             "codeSnippet": item.get("codeSnippet"),
-            "codeSnippetLineStart": item.get("codeSnippetLineStart"),
+            "codeSnippetLineStart": self.comment_formatter.to_line_number(item.get("codeSnippetLineStart")),
             "severity": severity,
             "metadata": item.get("metadata", {}),
             "category": item.get("category", "Issue"),
@@ -240,6 +236,7 @@ class ReviewCommentBuilder:
         if not isinstance(item, dict):
             logger.warning("Review item is not a dictionary, skipping")
             return None
+        item = self.expand_compact_item(item, file_mapping)
         
         # Validate severity and check threshold
         raw_severity = item.get("severity", "Info")
@@ -268,13 +265,126 @@ class ReviewCommentBuilder:
             "lineEnd": line_end,
             "content": content,
             "codeSnippet": item.get("codeSnippet"),
-            "codeSnippetLineStart": item.get("codeSnippetLineStart"),
+            "codeSnippetLineStart": self.comment_formatter.to_line_number(item.get("codeSnippetLineStart")),
             "severity": severity,
             "metadata": item.get("metadata", {}),
             "category": item.get("category", "Issue"),
         }
         
+        return self.anchor_comment(comment, file_mapping[target_file])
+    
+    def anchor_comment(self, comment: Dict[str, Any], file_info: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Validate a comment's lines against the diff and fix them where possible.
+        
+        A comment whose codeSnippet sits within COMMENT_SNAP_MAX_DISTANCE lines of the
+        claimed line is moved onto the snippet. The end line is clamped to the hunk
+        interval holding the start line. Comments that still point outside the diff
+        are dropped or, with COMMENT_UNANCHORED_ACTION=demote, attached to the first
+        changed line of the file with the intended line stated in the content.
+        
+        Args:
+            comment: UI-ready comment dictionary
+            file_info: File information of the commented file
+            
+        Returns:
+            Anchored comment, None if it was dropped
+        """
+        file_path = comment["filePath"]
+        index = get_parsed_diff(file_info).line_index
+        if not index.intervals:
+            logger.warning(f"Dropping comment on {file_path}:{comment['lineStart']}, the file has no commentable lines")
+            return None
+        
+        line_start = comment["lineStart"]
+        line_end = comment["lineEnd"] if comment["lineEnd"] is not None else line_start
+        
+        # The snippet is the model's own quote of the code, so it outranks the line number it reported
+        claimed_snippet_start = comment.get("codeSnippetLineStart") or line_start
+        snippet_start = index.find_snippet(comment.get("codeSnippet"), claimed_snippet_start, settings.COMMENT_SNAP_MAX_DISTANCE)
+        if snippet_start is not None and snippet_start != claimed_snippet_start:
+            shift = snippet_start - claimed_snippet_start
+            logger.info(f"Snapping comment on {file_path} from line {line_start} to {line_start + shift} to match its code snippet")
+            line_start += shift
+            line_end += shift
+            comment["codeSnippetLineStart"] = snippet_start
+        
+        interval = index.interval_of(line_start)
+        if interval is None:
+            if settings.COMMENT_UNANCHORED_ACTION != "demote":
+                logger.warning(f"Dropping comment on {file_path}:{line_start}, the line is outside the changed hunks")
+                return None
+            logger.warning(f"Demoting comment on {file_path}:{line_start} to a file-level comment, the line is outside the changed hunks")
+            comment["content"] = f"_Refers to line {line_start} of this file, outside the changed lines._\n\n{comment['content']}"
+            comment["metadata"] = {**(comment.get("metadata") or {}), "anchor": "file", "requestedLine": line_start}
+            line_start = line_end = index.intervals[0][0]
+        else:
+            line_end = min(max(line_end, line_start), interval[1])
+        
+        comment["lineStart"] = line_start
+        comment["lineEnd"] = line_end
         return comment
+    
+    def expand_compact_item(self, item: Dict[str, Any], file_mapping: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Expand a compact-schema review item to the standard item shape.
+        
+        The code snippet is not part of compact output; it is rebuilt from the
+        file's parsed diff, or from its after-change content for lines outside the diff.
+        
+        Args:
+            item: Review item, compact or standard
+            file_mapping: Mapping of file names to file info
+            
+        Returns:
+            Standard review item; standard items are returned unchanged
+        """
+        if "f" not in item or "fileName" in item:
+            return item
+        
+        line_range = item.get("l")
+        if not isinstance(line_range, list):
+            line_range = [line_range]
+        try:
+            line_start = int(line_range[0])
+            line_end = int(line_range[-1])
+        except (TypeError, ValueError, IndexError):
+            line_start, line_end = 1, None
+        
+        expanded = {
+            "fileName": item.get("f"),
+            "lineStart": line_start,
+            "lineEnd": line_end,
+            "issue": item.get("i", ""),
+            "severity": SEVERITY_CODES.get(item.get("s"), item.get("s") or "Info"),
+            "category": CATEGORY_CODES.get(item.get("c"), item.get("c") or "Issue"),
+            "suggestion": item.get("x", "")
+        }
+        
+        file_info = file_mapping.get(expanded["fileName"])
+        if file_info and line_end is not None:
+            snippet = self._rebuild_snippet(file_info, line_start, max(line_end, line_start))
+            if snippet is not None:
+                expanded["codeSnippet"] = snippet
+                expanded["codeSnippetLineStart"] = line_start
+        
+        return expanded
+    
+    def _rebuild_snippet(self, file_info: Dict[str, Any], line_start: int, line_end: int) -> Optional[str]:
+        """Get the after-change code of a line range, capped at MAX_SNIPPET_LINES lines"""
+        line_end = min(line_end, line_start + self.MAX_SNIPPET_LINES - 1)
+        lines = get_parsed_diff(file_info).new_lines(line_start, line_end)
+        
+        if len(lines) < line_end - line_start + 1:
+            content_after = file_info.get("prFileContentAfter") or ""
+            if content_after and not content_after.startswith("File not found"):
+                after_lines = content_after.split("\n")
+                for line_num in range(line_start, min(line_end, len(after_lines)) + 1):
+                    lines.setdefault(line_num, after_lines[line_num - 1])
+        
+        if not lines:
+            return None
+        return "\n".join(lines[line_num] for line_num in sorted(lines))
 
 
 class ReviewParser:
@@ -330,24 +440,76 @@ class ReviewParser:
         
         # Parse JSON from text
         review_items = self.json_parser.parse_json_from_text(review_text)
+        return self.build_chunked_comments(review_items, chunk_files, min_severity)
+    
+    def build_chunked_comments(self, review_items: List[Dict[str, Any]], chunk_files: List[Dict], min_severity: str) -> List[Dict[str, Any]]:
+        """
+        Build UI-ready comments from review items of a chunk of files.
         
+        Args:
+            review_items: Review comment dictionaries, parsed from text or read from structured output
+            chunk_files: List of files in the chunk with their metadata
+            min_severity: Minimum severity threshold
+            
+        Returns:
+            List of UI-ready comment dictionaries
+        """
         if not review_items:
             logger.warning("No valid review items found in chunked response")
             return []
         
         # Create file mapping for validation
-        file_mapping = {file_info["prFileName"]: file_info for file_info in chunk_files}
+        file_mapping = self.map_chunk_files(chunk_files)
         
-        # Build comments
+        # Build comments; a bad item is skipped without losing the rest of the chunk
         comments = []
         for item in review_items:
-            comment = self.comment_builder.build_chunked_comment(item, file_mapping, min_severity)
+            if not isinstance(item, dict):
+                continue
+            try:
+                comment = self.comment_builder.build_chunked_comment(item, file_mapping, min_severity)
+            except Exception as e:
+                logger.warning(f"Skipping review item on '{item.get('fileName', item.get('f'))}' that could not be built: {str(e)}")
+                continue
             if comment:  # Only add valid comments
                 comments.append(comment)
         
         logger.info(f"Generated {len(comments)} comments from {len(review_items)} review items")
         return comments
 
+    
+    @staticmethod
+    def map_chunk_files(chunk_files: List[Dict]) -> Dict[str, Dict]:
+        """
+        Map the file names of a chunk to their file info.
+        
+        Parts of a file split across hunks are merged into one entry holding the
+        hunks of every part, so a comment is anchored against all of them.
+        
+        Args:
+            chunk_files: List of files in the chunk with their metadata
+            
+        Returns:
+            Mapping of file names to file info
+        """
+        parts: Dict[str, List[Dict]] = {}
+        for file_info in chunk_files:
+            parts.setdefault(file_info["prFileName"], []).append(file_info)
+        
+        file_mapping = {}
+        for file_name, file_parts in parts.items():
+            if len(file_parts) == 1:
+                file_mapping[file_name] = file_parts[0]
+                continue
+            hunks = sorted(
+                (hunk for file_info in file_parts for hunk in get_parsed_diff(file_info).hunks),
+                key=lambda hunk: hunk.new_start
+            )
+            merged = {key: value for key, value in file_parts[0].items() if key not in ("renderedSections", "prFilePart")}
+            merged["parsedDiff"] = build_parsed_diff(file_name, hunks)
+            file_mapping[file_name] = merged
+        return file_mapping
+
 
 # Global parser instance
 _review_parser = ReviewParser()
@@ -367,4 +529,12 @@ def parse_chunked_review_response(review_text: str, chunk_files: List[Dict], min
     Legacy function for backward compatibility.
     Use ReviewParser.parse_chunked_review() for new code.
     """
-    return _review_parser.parse_chunked_review(review_text, chunk_files, minSeverity)
\ No newline at end of file
+    return _review_parser.parse_chunked_review(review_text, chunk_files, minSeverity)
+
+
+def build_chunked_review_comments(review_items: List[Dict], chunk_files: List[Dict], minSeverity: str) -> List[Dict[str, Any]]:
+    """
+    Legacy function for backward compatibility.
+    Use ReviewParser.build_chunked_comments() for new code.
+    """
+    return _review_parser.build_chunked_comments(review_items, chunk_files, minSeverity)
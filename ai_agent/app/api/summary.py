@@ -1,6 +1,7 @@
 from typing import Dict, Any
 from app.models.pr_response import PRSummaryResponse
 from app.utils.prompt_manager import PromptManager
+from app.utils.summary_metadata import SummaryMetadataService
 from app.core.setup import setup_logger
 
 logger = setup_logger(__name__)
@@ -11,6 +12,7 @@ class SummaryService:
     
     def __init__(self):
         self.prompt_manager = PromptManager()
+        self.metadata_service = SummaryMetadataService()
     
     async def generate_summary(self, variables: Dict[str, Any], llm_service) -> PRSummaryResponse:
         """
@@ -34,10 +36,14 @@ class SummaryService:
             
             logger.info(f"Summary generated successfully. Usage: {summary_usage}")
             
+            summary, metadata = self.metadata_service.split(summary)
+            logger.info(f"Summary totals from {metadata.source}: {metadata.to_dict()}")
+            
             return PRSummaryResponse(
                 prNumber=variables.get('prNumber', "0"), 
                 pr_line=1, 
                 pr_summary=summary, 
+                summary_metadata=metadata.to_dict(),
                 summary_usage=summary_usage, 
                 model_info=model_info
             )
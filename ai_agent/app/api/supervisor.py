@@ -1,8 +1,18 @@
-from fastapi import APIRouter, BackgroundTasks
-from app.models.pr_event import PRPayloadV2
-from app.services.validation import validate_and_extract_pr_data
+import time
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Request
+from typing import Optional
+from pydantic import ValidationError
+from fastapi.concurrency import run_in_threadpool
+from app.services.validation import analyze_pr_files, validate_and_extract_pr_data, validate_git_ingestion_payload
+from app.services.git_mirror import git_mirror_service
 from app.services.pr_processor import PRProcessor
+from app.utils.payload_decoder import decode_pr_payload
+from app.services.blob_store import blob_store, MissingBlobsError
+from app.models.pr_event import BlobNegotiationRequest, PRPayloadV2
+from app.utils.body_encoding import decompress_body_stream, PayloadTooLargeError, UnsupportedContentEncodingError
+from app.utils.metrics import QUEUE_WAIT, REQUESTS, STAGE_DURATION, record_error
 from app.core.setup import setup_logger
+from config.settings import settings
 
 # Setup logger
 logger = setup_logger(__name__)
@@ -12,35 +22,160 @@ supervisor = APIRouter(prefix="", tags=["Supervisor"])
 # Initialize processor
 pr_processor = PRProcessor()
 
-async def process_pr_background(extracted_data: dict):
+async def process_pr_background(extracted_data: dict, accepted_at: Optional[float] = None):
     """Background task wrapper for PR processing"""
+    if accepted_at is not None:
+        QUEUE_WAIT.observe(time.perf_counter() - accepted_at, queue="background")
     try:
         logger.info("=== STARTING BACKGROUND TASK ===")
         logger.info(f"Background task started for PR #{extracted_data.get('prNumber', 'unknown')}")
+        # CPU-bound file analysis runs off the event loop so other requests are still answered
+        await run_in_threadpool(analyze_pr_files, extracted_data)
         await pr_processor.process_pr_review(extracted_data)
         logger.info("=== BACKGROUND TASK COMPLETED ===")
     except Exception as e:
+        record_error("processing", e)
         logger.error(f"=== BACKGROUND TASK FAILED ===")
         logger.error(f"Background task error: {str(e)}")
         logger.error(f"Exception type: {type(e).__name__}")
         import traceback
         logger.error(f"Traceback: {traceback.format_exc()}")
+        # The request was answered as accepted; the backend learns of the failure from the callback
+        pr_processor.report_failure(extracted_data.get("pullRequestAnalysisId"), f"Processing failed: {type(e).__name__}")
 
 
-    
+async def process_git_pr_background(payload: PRPayloadV2, accepted_at: Optional[float] = None):
+    """Background task computing the PR files from the repository mirror, then processing the PR"""
+    if accepted_at is not None:
+        QUEUE_WAIT.observe(time.perf_counter() - accepted_at, queue="background")
+    pr = payload.pullRequest
+    try:
+        with STAGE_DURATION.time(stage="git_ingestion"):
+            files = await git_mirror_service.load_pr_files(pr.prRepoCloneUrl, pr.prBaseSha, pr.prHeadSha, pr.ignore)
+    except Exception as e:
+        record_error("git_ingestion", e)
+        logger.error(f"Computing PR files from the repository failed: {str(e)}")
+        pr_processor.report_failure(pr.pullRequestAnalysisId, f"Computing PR files from the repository failed: {str(e)[:500]}")
+        return
+
+    with STAGE_DURATION.time(stage="validation"):
+        is_valid, error_message, extracted_data = validate_and_extract_pr_data(payload, files)
+    if not is_valid:
+        REQUESTS.inc(outcome="invalid")
+        logger.error(f"Validation failed: {error_message}")
+        pr_processor.report_failure(pr.pullRequestAnalysisId, f"Invalid payload: {error_message}")
+        return
+    await process_pr_background(extracted_data)
+
+
+def store_pr_blobs(pr_files: list):
+    """
+    Background task storing the file contents sent inline, so later requests can reference them by hash.
+    Being synchronous, it runs in the threadpool rather than on the event loop.
+    """
+    try:
+        stored = blob_store.store_files(pr_files)
+        logger.info(f"Stored {stored} new file contents in the blob store")
+    except Exception as e:
+        logger.error(f"Storing file contents failed: {str(e)}")
+
+
+def missing_blobs_error(missing: list) -> HTTPException:
+    """Answer a request referencing contents that are not stored, so the backend resends them inline"""
+    REQUESTS.inc(outcome="missing_blobs")
+    logger.warning(f"Request references {len(missing)} file contents that are not stored")
+    return HTTPException(status_code=409, detail={"message": "Referenced file contents are not stored", "missing": missing})
+
+
+@supervisor.post("/ai_agent/blobs/missing")
+async def supervisor_missing_blobs(request: BlobNegotiationRequest):
+    """
+    Tell the backend which file contents it must send inline.
+    Contents not listed can be replaced by their prFileContentBeforeHash/prFileContentAfterHash.
+    """
+    if not settings.BLOB_STORE_ENABLED:
+        return {"missing": list(dict.fromkeys(request.hashes))}
+    # The first lookup scans the store directory
+    missing = await run_in_threadpool(blob_store.missing, request.hashes)
+    logger.info(f"Blob negotiation: {len(missing)} of {len(request.hashes)} contents missing")
+    return {"missing": missing}
+
 
 @supervisor.post("/ai_agent")
-async def supervisor_pr_review(payload: PRPayloadV2, background_tasks: BackgroundTasks):
+async def supervisor_pr_review(request: Request, background_tasks: BackgroundTasks):
     """
     AI Agent endpoint for PR review processing.
     Validates input, responds immediately, then processes in background.
+    The body is decompressed and decoded into typed models straight from the request stream.
     """
     logger.info("Received PR review request")
     
-    # Validate and extract data using the new validation service
-    is_valid, error_message, extracted_data = validate_and_extract_pr_data(payload)
+    try:
+        body_stream = decompress_body_stream(
+            request.stream(),
+            request.headers.get("content-encoding"),
+            settings.PAYLOAD_MAX_MB * 1024 * 1024
+        )
+        with STAGE_DURATION.time(stage="decode"):
+            payload = await decode_pr_payload(body_stream, settings.PAYLOAD_INCREMENTAL_DECODING)
+    except PayloadTooLargeError as e:
+        REQUESTS.inc(outcome="too_large")
+        logger.error(f"Payload decoding failed: {str(e)}")
+        raise HTTPException(status_code=413, detail=str(e))
+    except UnsupportedContentEncodingError as e:
+        REQUESTS.inc(outcome="unsupported_encoding")
+        logger.error(f"Payload decoding failed: {str(e)}")
+        raise HTTPException(status_code=415, detail=str(e))
+    except ValidationError as e:
+        REQUESTS.inc(outcome="undecodable")
+        logger.error(f"Payload decoding failed: {e.error_count()} errors")
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_input=False))
+    except ValueError as e:
+        REQUESTS.inc(outcome="undecodable")
+        logger.error(f"Payload decoding failed: {str(e)}")
+        raise HTTPException(status_code=422, detail=str(e))
+    
+    if payload.pullRequest.uses_git_ingestion():
+        is_valid, error_message = validate_git_ingestion_payload(payload)
+        if not is_valid:
+            REQUESTS.inc(outcome="invalid")
+            logger.error(f"Validation failed: {error_message}")
+            return {
+                "status": "error",
+                "message": f"Invalid payload: {error_message}"
+            }
+        # Fetching and diffing can take longer than the backend waits for the response
+        logger.info(f"Scheduling git ingestion for PR #{payload.pullRequest.prNumber}")
+        background_tasks.add_task(process_git_pr_background, payload, time.perf_counter())
+        REQUESTS.inc(outcome="accepted")
+        return {
+            "status": "accepted",
+            "message": "Data received, review in progress",
+            "pullRequestAnalysisId": payload.pullRequest.pullRequestAnalysisId,
+            "prNumber": payload.pullRequest.prNumber,
+            "filesCount": None
+        }
+    
+    # Contents referenced by hash must be stored; the backend resends the request with them inline
+    referenced_hashes = [content_hash for file in payload.pullRequest.prFiles for content_hash in file.referenced_hashes()]
+    if referenced_hashes:
+        if settings.BLOB_STORE_ENABLED:
+            missing = await run_in_threadpool(blob_store.missing, referenced_hashes)
+        else:
+            missing = list(dict.fromkeys(referenced_hashes))
+        if missing:
+            raise missing_blobs_error(missing)
+    
+    # Validate and extract data using the new validation service; referenced contents are read from disk
+    try:
+        with STAGE_DURATION.time(stage="validation"):
+            is_valid, error_message, extracted_data = await run_in_threadpool(validate_and_extract_pr_data, payload)
+    except MissingBlobsError as e:
+        # Evicted between the check above and reading them
+        raise missing_blobs_error(e.hashes)
     
     if not is_valid:
+        REQUESTS.inc(outcome="invalid")
         logger.error(f"Validation failed: {error_message}")
         return {
             "status": "error", 
@@ -49,7 +184,10 @@ async def supervisor_pr_review(payload: PRPayloadV2, background_tasks: Backgroun
     
     # Schedule background processing using the new processor
     logger.info(f"Scheduling background processing for PR #{extracted_data['prNumber']}")
-    background_tasks.add_task(process_pr_background, extracted_data)
+    if settings.BLOB_STORE_ENABLED:
+        background_tasks.add_task(store_pr_blobs, extracted_data["prFiles"])
+    background_tasks.add_task(process_pr_background, extracted_data, time.perf_counter())
+    REQUESTS.inc(outcome="accepted")
     
     # Return immediate response
     logger.info("Sending immediate response: Data received, review in progress")
@@ -1,9 +1,22 @@
+from contextlib import asynccontextmanager
 from app.api.supervisor import supervisor
+from app.services.callback_outbox import callback_outbox
+from app.utils.metrics import registry
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 
 # from app.api.enhanced_supervisor import enhanced_supervisor
 
-app = FastAPI(title="AI-Powered PR Reviewer")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Resume callbacks spooled before a restart; undelivered ones stay on disk at shutdown
+    callback_outbox.start()
+    yield
+    await callback_outbox.close()
+
+
+app = FastAPI(title="AI-Powered PR Reviewer", lifespan=lifespan)
 
 app.include_router(supervisor)
 # app.include_router(enhanced_supervisor)
@@ -20,7 +33,14 @@ async def health_check():
         "status": "healthy",
         "endpoints": {
             "basic": "/ai_agent/",
+            "metrics": "/metrics",
             # "enhanced": "/enhanced_ai_agent/",
             # "chunked": "/enhanced_ai_agent/chunked_review"
         },
     }
+
+
+@app.get("/metrics")
+async def metrics():
+    """Processing metrics in the Prometheus text format"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
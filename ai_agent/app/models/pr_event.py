@@ -1,6 +1,74 @@
-from pydantic import BaseModel, Field
-from typing import Optional, Dict, List
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Optional, Dict, List, Union, Any
+
+
+class PRFilePayload(BaseModel):
+    """One changed file as sent by the backend; unknown fields are dropped"""
+    model_config = ConfigDict(extra="ignore")
+
+    prFileName: str
+    prFileStatus: Optional[str] = None
+    prFilePreviousName: Optional[str] = None
+    prFileAdditions: Optional[int] = None
+    prFileDeletions: Optional[int] = None
+    prFileChanges: Optional[int] = None
+    prFileContentBefore: Optional[str] = None
+    prFileContentAfter: Optional[str] = None
+    # SHA-256 of the UTF-8 contents, sent instead of contents the agent already stores
+    prFileContentBeforeHash: Optional[str] = None
+    prFileContentAfterHash: Optional[str] = None
+    prFileDiff: Optional[str] = None
+    prFileDiffHunks: Optional[List[str]] = None
+    prFileBlobUrl: Optional[str] = None
+
+    def referenced_hashes(self) -> List[str]:
+        """Hashes of the contents this file references instead of sending them"""
+        return [
+            content_hash
+            for content, content_hash in (
+                (self.prFileContentBefore, self.prFileContentBeforeHash),
+                (self.prFileContentAfter, self.prFileContentAfterHash)
+            )
+            if content_hash and content is None
+        ]
+
+    def to_file_info(self) -> Dict[str, Any]:
+        """File dictionary used by the processing pipeline, holding only the fields that were sent"""
+        return self.model_dump(exclude_unset=True)
+
+
+class PullRequestPayload(BaseModel):
+    """Pull request fields read by the agent; unknown fields are dropped"""
+    model_config = ConfigDict(extra="ignore")
+
+    provider: Optional[str] = None
+    installationId: Optional[Union[str, int]] = None
+    pullRequestAnalysisId: Optional[str] = None
+    prNumber: Optional[Union[str, int]] = None
+    prTitle: Optional[str] = None
+    prBody: Optional[str] = None
+    prUser: Optional[str] = None
+    prRepoName: Optional[str] = None
+    # Git ingestion: the agent computes the files from its mirror of the repository instead of prFiles
+    prRepoCloneUrl: Optional[str] = None
+    prBaseSha: Optional[str] = None
+    prHeadSha: Optional[str] = None
+    apiKey: Optional[str] = None
+    modelName: Optional[str] = None
+    minSeverity: Optional[str] = None
+    ignore: Optional[List[str]] = None
+    prFiles: List[PRFilePayload] = Field(default_factory=list)
+    prFileDiffHunks: Optional[List[Any]] = None
+
+    def uses_git_ingestion(self) -> bool:
+        """Whether the files are to be computed from the repository rather than read from prFiles"""
+        return bool(self.prRepoCloneUrl and self.prBaseSha and self.prHeadSha) and not self.prFiles
 
 
 class PRPayloadV2(BaseModel):
-    pullRequest: dict
\ No newline at end of file
+    pullRequest: PullRequestPayload
+
+
+class BlobNegotiationRequest(BaseModel):
+    """Content hashes the backend intends to reference in a review request"""
+    hashes: List[str] = Field(default_factory=list)
@@ -1,10 +1,11 @@
 from pydantic import BaseModel
-from typing import Any
+from typing import Any, Optional
 
 class PRSummaryResponse(BaseModel):
     prNumber: str
     pr_line: int
     pr_summary: str
+    summary_metadata: Optional[dict[str, Any]] = None
     summary_usage: dict[Any, Any] = None
     model_info: str = None
 
@@ -12,5 +13,7 @@ class PRReviewResponse(BaseModel):
     prNumber: str
     pr_line: int
     pr_review_and_suggestion: str 
+    review_items: Optional[list[dict[str, Any]]] = None
+    summary_section: Optional[dict[str, Any]] = None
     review_usage: dict[Any, Any] = None
     model_info: str = None
\ No newline at end of file
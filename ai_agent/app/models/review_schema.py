@@ -0,0 +1,100 @@
+from typing import Dict, Any
+
+REVIEW_TOOL_NAME = "report_review_comments"
+# Key of the review tool input that holds the comments
+REVIEW_COMMENTS_KEY = "comments"
+
+# Codes used by the compact response schema
+SEVERITY_CODES = {"I": "Info", "N": "Minor", "M": "Major", "C": "Critical", "B": "Blocker"}
+CATEGORY_CODES = {"S": "Security", "L": "Logic", "G": "Bug", "P": "Performance", "T": "Style", "R": "Readability"}
+
+# One review comment, matching the item fields ReviewCommentBuilder reads
+REVIEW_COMMENT_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "fileName": {"type": "string", "description": "Exact path of the file as shown in the diff"},
+        "lineStart": {"type": "integer", "description": "First line of the issue in the changed file"},
+        "lineEnd": {"type": "integer", "description": "Last line of the issue in the changed file"},
+        "issue": {"type": "string", "description": "Clear, specific description of the problem and its impact"},
+        "codeSnippet": {"type": "string", "description": "The problematic code from the diff"},
+        "codeSnippetLineStart": {"type": "integer", "description": "Line number of the first line of codeSnippet"},
+        "severity": {"type": "string", "enum": ["Info", "Minor", "Major", "Critical", "Blocker"]},
+        "category": {"type": "string", "enum": ["Security", "Logic", "Bug", "Performance", "Style", "Readability"]},
+        "suggestion": {"type": "string", "description": "Explanation of the fix with a plain markdown code block"}
+    },
+    "required": ["fileName", "lineStart", "issue", "severity"]
+}
+
+# Tool the model is required to call with every review comment of a chunk
+REVIEW_TOOL: Dict[str, Any] = {
+    "name": REVIEW_TOOL_NAME,
+    "description": "Report all review comments for the code changes. Call once with every issue found; use an empty list if there are none.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            REVIEW_COMMENTS_KEY: {"type": "array", "items": REVIEW_COMMENT_SCHEMA}
+        },
+        "required": [REVIEW_COMMENTS_KEY]
+    }
+}
+
+# Compact comment: short keys, enum codes and a line range instead of the code snippet,
+# expanded back to the standard shape by ReviewCommentBuilder
+COMPACT_REVIEW_COMMENT_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "f": {"type": "string", "description": "Exact path of the file as shown in the diff"},
+        "l": {
+            "type": "array",
+            "items": {"type": "integer"},
+            "minItems": 1,
+            "maxItems": 2,
+            "description": "First and last line of the problematic code in the changed file"
+        },
+        "s": {"type": "string", "enum": list(SEVERITY_CODES), "description": "Severity: C Critical, B Blocker, M Major, N Minor, I Info"},
+        "c": {"type": "string", "enum": list(CATEGORY_CODES), "description": "Category: S Security, L Logic, G Bug, P Performance, T Style, R Readability"},
+        "i": {"type": "string", "description": "Clear, specific description of the problem and its impact"},
+        "x": {"type": "string", "description": "Explanation of the fix with a plain markdown code block"}
+    },
+    "required": ["f", "l", "s", "i"]
+}
+
+# Chunk summary reported next to the comments when the summary and review passes are combined
+SUMMARY_SECTION_PROPERTIES: Dict[str, Any] = {
+    "summary": {
+        "type": "string",
+        "description": "Markdown summary of this chunk with a '## Walkthrough' section and a '## File changes' table"
+    },
+    "estimatedReviewMinutes": {"type": "integer", "description": "Minutes a senior engineer needs to review this chunk"},
+    "potentialIssues": {"type": "integer", "description": "Number of issues reported for this chunk"}
+}
+
+REVIEW_COMMENT_SCHEMAS = {
+    "standard": REVIEW_COMMENT_SCHEMA,
+    "compact": COMPACT_REVIEW_COMMENT_SCHEMA
+}
+
+
+def get_review_tool(output_schema: str, with_summary: bool = False) -> Dict[str, Any]:
+    """
+    Get the review tool definition for a response schema.
+
+    Args:
+        output_schema: "standard" or "compact"
+        with_summary: Whether the tool also takes the chunk summary
+
+    Returns:
+        Tool definition whose input holds the list of comments
+    """
+    comment_schema = REVIEW_COMMENT_SCHEMAS.get(output_schema, REVIEW_COMMENT_SCHEMA)
+    properties = {REVIEW_COMMENTS_KEY: {"type": "array", "items": comment_schema}}
+    if with_summary:
+        properties.update(SUMMARY_SECTION_PROPERTIES)
+    return {
+        **REVIEW_TOOL,
+        "input_schema": {
+            "type": "object",
+            "properties": properties,
+            "required": list(properties)
+        }
+    }
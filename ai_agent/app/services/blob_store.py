@@ -0,0 +1,265 @@
+"""
+Content-addressed store of file contents.
+Keeps file contents on disk under the SHA-256 of their UTF-8 bytes, so review requests
+can reference contents the agent has already seen by hash instead of resending them.
+The store is bounded in size and evicts the least recently used contents first.
+"""
+
+import os
+import re
+import mmap
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+HASH_RE = re.compile(r"^[0-9a-f]{64}$")
+
+# Content fields of a file and the fields that may reference them by hash instead
+BLOB_FIELDS = {
+    "prFileContentBefore": "prFileContentBeforeHash",
+    "prFileContentAfter": "prFileContentAfterHash"
+}
+
+
+class MissingBlobsError(Exception):
+    """Review request references contents that are not in the store"""
+
+    def __init__(self, hashes: List[str]):
+        super().__init__(f"{len(hashes)} referenced file contents are not stored")
+        self.hashes = hashes
+
+
+class BlobStore:
+    """Disk-backed, LRU-bounded store of file contents keyed by their SHA-256"""
+
+    def __init__(self, store_dir: Optional[str] = None, max_bytes: Optional[int] = None):
+        """
+        Initialize the blob store.
+
+        Args:
+            store_dir: Directory holding one file per content, in subdirectories named by the first two hash digits
+            max_bytes: Total size of stored contents above which the least recently used are evicted
+        """
+        self.store_dir = store_dir or settings.BLOB_STORE_DIR
+        self.max_bytes = max_bytes if max_bytes is not None else settings.BLOB_STORE_MAX_MB * 1024 * 1024
+        self._lock = threading.Lock()
+        # Stored sizes keyed by hash, least recently used first; loaded from disk on first use
+        self._index: Optional[OrderedDict] = None
+        self._total_bytes = 0
+
+    @staticmethod
+    def hash_content(content: str) -> str:
+        """
+        Get the key of a content.
+
+        Args:
+            content: File content
+
+        Returns:
+            Hex SHA-256 of the content's UTF-8 bytes
+        """
+        return hashlib.sha256(content.encode("utf-8", "surrogatepass")).hexdigest()
+
+    def missing(self, hashes: Iterable[str]) -> List[str]:
+        """
+        Get the hashes whose contents are not stored.
+
+        Args:
+            hashes: Content hashes
+
+        Returns:
+            Hashes not in the store, in their first order of appearance
+        """
+        index = self._get_index()
+        missing = []
+        seen = set()
+        for content_hash in hashes:
+            if content_hash in seen:
+                continue
+            seen.add(content_hash)
+            if content_hash not in index:
+                missing.append(content_hash)
+        return missing
+
+    def read(self, content_hash: str) -> Optional[str]:
+        """
+        Read a stored content through a memory map and mark it as recently used.
+
+        Args:
+            content_hash: Content hash
+
+        Returns:
+            Content, None if it is not stored
+        """
+        if not HASH_RE.match(content_hash or ""):
+            return None
+        path = self._blob_path(content_hash)
+        try:
+            with open(path, "rb") as handle:
+                if os.fstat(handle.fileno()).st_size == 0:
+                    content = ""
+                else:
+                    with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                        content = str(mapped, "utf-8", "surrogatepass")
+            os.utime(path)
+        except FileNotFoundError:
+            self._forget(content_hash)
+            return None
+        except Exception as e:
+            logger.error(f"Error reading blob {content_hash}: {str(e)}")
+            return None
+
+        with self._lock:
+            index = self._get_index_locked()
+            if content_hash in index:
+                index.move_to_end(content_hash)
+        return content
+
+    def write(self, content: str, content_hash: Optional[str] = None) -> str:
+        """
+        Store a content unless it is already stored, then evict beyond the size limit.
+
+        Args:
+            content: File content
+            content_hash: Hash of the content if already computed
+
+        Returns:
+            Content hash
+        """
+        content_hash = content_hash or self.hash_content(content)
+        if content_hash in self._get_index():
+            return content_hash
+
+        data = content.encode("utf-8", "surrogatepass")
+        path = self._blob_path(content_hash)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as handle:
+                    handle.write(data)
+                os.replace(tmp_path, path)
+            except Exception:
+                os.unlink(tmp_path)
+                raise
+        except Exception as e:
+            logger.error(f"Error writing blob {content_hash}: {str(e)}")
+            return content_hash
+
+        with self._lock:
+            index = self._get_index_locked()
+            if content_hash not in index:
+                index[content_hash] = len(data)
+                self._total_bytes += len(data)
+            self._evict_locked()
+        return content_hash
+
+    def resolve_file(self, file_info: Dict) -> Dict:
+        """
+        Fill in the contents a file references by hash.
+
+        Args:
+            file_info: File information dictionary
+
+        Returns:
+            The same dictionary with its referenced contents filled in
+
+        Raises:
+            MissingBlobsError: If a referenced content is not stored
+        """
+        missing = []
+        for content_field, hash_field in BLOB_FIELDS.items():
+            content_hash = file_info.get(hash_field)
+            if not content_hash or file_info.get(content_field) is not None:
+                continue
+            content = self.read(content_hash)
+            if content is None:
+                missing.append(content_hash)
+            else:
+                file_info[content_field] = content
+        if missing:
+            raise MissingBlobsError(missing)
+        return file_info
+
+    def store_files(self, files: List[Dict]) -> int:
+        """
+        Store the contents sent inline with review files, so later requests can reference them.
+
+        Args:
+            files: File information dictionaries
+
+        Returns:
+            Number of contents newly stored
+        """
+        stored = 0
+        for file_info in files:
+            for content_field, hash_field in BLOB_FIELDS.items():
+                content = file_info.get(content_field)
+                # Contents that were referenced by hash came from the store
+                if not content or file_info.get(hash_field):
+                    continue
+                content_hash = self.hash_content(content)
+                if self.missing([content_hash]):
+                    self.write(content, content_hash)
+                    stored += 1
+        return stored
+
+    def _get_index(self) -> OrderedDict:
+        with self._lock:
+            return self._get_index_locked()
+
+    def _get_index_locked(self) -> OrderedDict:
+        """Load the index from the store directory, ordered by last use"""
+        if self._index is not None:
+            return self._index
+        entries = []
+        try:
+            for prefix in os.scandir(self.store_dir):
+                if not prefix.is_dir():
+                    continue
+                for entry in os.scandir(prefix.path):
+                    if HASH_RE.match(entry.name):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, entry.name, stat.st_size))
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.error(f"Error loading blob store {self.store_dir}: {str(e)}")
+        entries.sort()
+        self._index = OrderedDict((content_hash, size) for _, content_hash, size in entries)
+        self._total_bytes = sum(self._index.values())
+        self._evict_locked()
+        return self._index
+
+    def _evict_locked(self) -> None:
+        """Delete least recently used contents until the store fits its size limit"""
+        while self._index and self._total_bytes > self.max_bytes:
+            content_hash, size = self._index.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                os.unlink(self._blob_path(content_hash))
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logger.error(f"Error evicting blob {content_hash}: {str(e)}")
+
+    def _forget(self, content_hash: str) -> None:
+        """Drop an index entry whose file has disappeared"""
+        with self._lock:
+            size = self._get_index_locked().pop(content_hash, None)
+            if size is not None:
+                self._total_bytes -= size
+
+    def _blob_path(self, content_hash: str) -> str:
+        """Get the file path of a content"""
+        return os.path.join(self.store_dir, content_hash[:2], content_hash)
+
+
+# Global store instance shared by the API and the processor
+blob_store = BlobStore()
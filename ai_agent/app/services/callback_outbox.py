@@ -0,0 +1,373 @@
+"""
+Durable outbox for summary and review callbacks to the backend.
+Callbacks are spooled to disk before they are sent and delivered by a background
+worker over one pooled keep-alive client, retried with backoff until the backend
+accepts them, so a backend outage delays results instead of losing them. Only failures
+that leave the callback unprocessed are retried: the backend does not de-duplicate, and
+a repeated review callback would post its comments twice.
+Disk writes run on a writer thread, off the event loop, in the order they were made.
+"""
+
+import os
+import json
+import time
+import random
+import asyncio
+import hashlib
+import logging
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+import httpx
+from app.utils.body_encoding import encode_json_body
+from app.utils.metrics import BACKEND_POST_DURATION, QUEUE_WAIT, record_error, registry
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Responses refusing a callback before the backend acted on it, which a retry can fix
+RETRYABLE_STATUSES = {408, 425, 429, 503}
+# Transport errors raised before the request was sent
+UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+CALLBACKS_FAILED = registry.counter(
+    "pullsight_callbacks_failed_total",
+    "Callbacks given up on and moved to the failed/ directory, by reason (rejected, unconfirmed or exhausted)",
+    ["reason"]
+)
+
+
+class CallbackOutbox:
+    """Disk-spooled callback queue delivered in order per analysis by a background worker"""
+
+    def __init__(self, outbox_dir: Optional[str] = None):
+        """
+        Initialize the outbox.
+
+        Args:
+            outbox_dir: Directory holding one JSON record per undelivered callback,
+                with a failed/ subdirectory for callbacks that were given up
+        """
+        self.outbox_dir = outbox_dir or settings.CALLBACK_OUTBOX_DIR
+        self.max_attempts = settings.CALLBACK_MAX_ATTEMPTS
+        self.retry_base_seconds = settings.CALLBACK_RETRY_BASE_SECONDS
+        self.retry_max_seconds = settings.CALLBACK_RETRY_MAX_SECONDS
+        self.compression = settings.CALLBACK_COMPRESSION
+        self.compression_min_bytes = settings.CALLBACK_COMPRESSION_MIN_BYTES
+        self.retry_failed_on_start = settings.CALLBACK_RETRY_FAILED_ON_START
+        self._client: Optional[httpx.AsyncClient] = None
+        self._pending: Optional[Dict[str, Dict[str, Any]]] = None
+        self._failed_count = 0
+        self._sequence = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        # In-flight delivery of each group and unfinished write of each record
+        self._deliveries: Dict[str, asyncio.Task] = {}
+        self._writes: Dict[str, asyncio.Future] = {}
+        # A single thread keeps the writes of a record in the order they were made
+        self._io = ThreadPoolExecutor(max_workers=1, thread_name_prefix="callback-outbox")
+
+    def get_client(self) -> httpx.AsyncClient:
+        """
+        Get the process-wide HTTP client for backend calls.
+
+        Returns:
+            Keep-alive client limited to CALLBACK_MAX_CONNECTIONS connections
+        """
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=settings.CALLBACK_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.CALLBACK_MAX_CONNECTIONS
+                ),
+                timeout=settings.CALLBACK_TIMEOUT
+            )
+        return self._client
+
+    def enqueue(self, url: str, payload: Dict[str, Any], idempotency_key: str, group: str, label: str) -> None:
+        """
+        Spool a callback and wake the delivery worker.
+
+        Returns once the callback is queued for the writer thread; it is not sent
+        before it is on disk.
+
+        Args:
+            url: Backend endpoint
+            payload: JSON payload
+            idempotency_key: Key identifying this callback, sent as the Idempotency-Key header;
+                a pending callback with the same key is replaced
+            group: Callbacks of the same group are delivered one at a time in enqueue order
+            label: Description of the callback for logging
+        """
+        pending = self._load_pending()
+        self._sequence = max(self._sequence + 1, time.time_ns())
+        record = {
+            "sequence": self._sequence,
+            "url": url,
+            "payload": payload,
+            "idempotency_key": idempotency_key,
+            "group": group,
+            "label": label,
+            "attempts": 0,
+            "next_attempt_at": 0,
+            "enqueued_at": time.time()
+        }
+        path = self._record_path(idempotency_key)
+        pending[path] = record
+        write = self._submit_io(self._save, path, record)
+        self._writes[path] = write
+        write.add_done_callback(lambda future: self._written(path, future))
+        self.start()
+        self._wakeup.set()
+
+    def start(self) -> None:
+        """Start the delivery worker in the running event loop, resuming callbacks spooled by earlier runs"""
+        if self._worker is not None and not self._worker.done():
+            return
+        pending = self._load_pending()
+        if pending:
+            logger.info(f"Resuming delivery of {len(pending)} spooled callbacks")
+        self._wakeup = asyncio.Event()
+        self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def close(self) -> None:
+        """Stop the worker and close the client; undelivered callbacks stay spooled for the next start"""
+        tasks = [task for task in [self._worker, *self._deliveries.values()] if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._worker = None
+        self._deliveries.clear()
+        # Let queued writes reach the disk
+        await asyncio.gather(*self._writes.values(), return_exceptions=True)
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _run(self) -> None:
+        """
+        Deliver due callbacks until cancelled.
+
+        Each group has at most one delivery in flight, its oldest callback; groups
+        are delivered independently, so a slow or failing backend call only holds
+        back the callbacks of its own analysis.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            self._wakeup.clear()
+            now = time.time()
+            heads: Dict[str, Dict[str, Any]] = {}
+            for path, record in sorted(self._pending.items(), key=lambda item: item[1]["sequence"]):
+                heads.setdefault(record["group"], {**record, "path": path})
+
+            waiting = []
+            for group, record in heads.items():
+                if group in self._deliveries:
+                    continue
+                if record["next_attempt_at"] > now:
+                    waiting.append(record["next_attempt_at"])
+                    continue
+                delivery = loop.create_task(self._deliver(record))
+                self._deliveries[group] = delivery
+                delivery.add_done_callback(lambda _, group=group: self._delivered(group))
+
+            timeout = min(waiting, default=None)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), None if timeout is None else max(timeout - now, 0))
+            except asyncio.TimeoutError:
+                pass
+
+    def _delivered(self, group: str) -> None:
+        """Let the worker pick the next callback of a group once its delivery ends"""
+        self._deliveries.pop(group, None)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _deliver(self, record: Dict[str, Any]) -> None:
+        """Send one callback and settle its record"""
+        path = record.pop("path")
+        label = record["label"]
+        endpoint = record["url"].rstrip("/").rsplit("/", 1)[-1]
+        error = None
+        write = self._writes.get(path)
+        if write is not None:
+            # Not sent before it is on disk; a failed write was logged and the callback is still sent
+            await asyncio.wait([write])
+        try:
+            content, headers = encode_json_body(record["payload"], self.compression, self.compression_min_bytes)
+            headers["Idempotency-Key"] = record["idempotency_key"]
+            post_start_time = time.time()
+            response = await self.get_client().post(record["url"], content=content, headers=headers)
+            post_duration = time.time() - post_start_time
+            if response.is_success:
+                BACKEND_POST_DURATION.observe(post_duration, endpoint=endpoint, outcome="success")
+                if "enqueued_at" in record:
+                    QUEUE_WAIT.observe(time.time() - record["enqueued_at"], queue="callback")
+                logger.info(f"Delivered {label} in {post_duration:.2f}s (attempt {record['attempts'] + 1})")
+                await self._settle(path, record)
+                return
+            # Truncate response for cleaner logs
+            response_text = response.text[:200] + "..." if len(response.text) > 200 else response.text
+            error = f"status {response.status_code}, response: {response_text}"
+            if response.status_code not in RETRYABLE_STATUSES:
+                # Client errors are final; server errors may come after the backend already acted
+                failed_reason = "rejected" if response.is_client_error else "unconfirmed"
+                BACKEND_POST_DURATION.observe(post_duration, endpoint=endpoint, outcome=failed_reason)
+                logger.error(f"Backend {'rejected' if response.is_client_error else 'failed on'} {label}, not retrying: {error}")
+                await self._settle(path, record, failed_reason=failed_reason)
+                return
+            BACKEND_POST_DURATION.observe(post_duration, endpoint=endpoint, outcome="retry")
+        except Exception as e:
+            record_error("callback", e)
+            error = f"{type(e).__name__}: {str(e)}"
+            if isinstance(e, httpx.TransportError) and not isinstance(e, UNSENT_ERRORS):
+                # Timed out or cut off after sending: the backend may have processed the callback
+                logger.error(f"Delivery of {label} unconfirmed, not retrying: {error}")
+                await self._settle(path, record, failed_reason="unconfirmed")
+                return
+
+        record["attempts"] += 1
+        if record["attempts"] >= self.max_attempts:
+            logger.error(f"Giving up on {label} after {record['attempts']} attempts: {error}")
+            await self._settle(path, record, failed_reason="exhausted")
+            return
+        delay = min(self.retry_base_seconds * 2 ** (record["attempts"] - 1), self.retry_max_seconds)
+        delay *= random.uniform(0.5, 1.0)
+        record["next_attempt_at"] = time.time() + delay
+        logger.warning(f"Failed to deliver {label} ({error}), retrying in {delay:.1f}s")
+        if self._pending.get(path, {}).get("sequence") == record["sequence"]:
+            self._pending[path] = record
+            try:
+                await self._submit_io(self._save, path, record)
+            except Exception as e:
+                logger.error(f"Error saving callback record {path}: {str(e)}")
+
+    async def _settle(self, path: str, record: Dict[str, Any], failed_reason: Optional[str] = None) -> None:
+        """Remove a delivered or abandoned callback, keeping abandoned ones under failed/ with the reason"""
+        if self._pending.get(path, {}).get("sequence") != record["sequence"]:
+            # Replaced by a newer callback with the same key while this one was in flight
+            return
+        del self._pending[path]
+        if failed_reason:
+            CALLBACKS_FAILED.inc(reason=failed_reason)
+            self._failed_count += 1
+        try:
+            await self._submit_io(self._remove, path, {**record, "failed_reason": failed_reason} if failed_reason else None)
+        except Exception as e:
+            logger.error(f"Error settling callback record {path}: {str(e)}")
+
+    def _remove(self, path: str, failed_record: Optional[Dict[str, Any]]) -> None:
+        """Delete a callback record, first saving an abandoned one under failed/"""
+        if failed_record is not None:
+            self._save(os.path.join(self._failed_dir(), os.path.basename(path)), failed_record)
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+    def _load_pending(self) -> Dict[str, Dict[str, Any]]:
+        """Load the spooled callbacks on first use, first requeueing failed ones if enabled"""
+        if self._pending is not None:
+            return self._pending
+        self._pending = {}
+        self._load_failed()
+        try:
+            for entry in os.scandir(self.outbox_dir):
+                if not entry.name.endswith(".json"):
+                    continue
+                try:
+                    with open(entry.path, "r", encoding="utf-8") as handle:
+                        record = json.load(handle)
+                    # Due right away after a restart
+                    record["next_attempt_at"] = 0
+                    self._pending[entry.path] = record
+                    self._sequence = max(self._sequence, record["sequence"])
+                except Exception as e:
+                    logger.error(f"Error loading callback record {entry.path}: {str(e)}")
+        except FileNotFoundError:
+            pass
+        return self._pending
+
+    def _load_failed(self) -> None:
+        """
+        Count the callbacks kept under failed/ and, with CALLBACK_RETRY_FAILED_ON_START,
+        move the ones given up after exhausting their attempts back into the outbox.
+        Callbacks the backend rejected or may have processed are kept; a newer spooled callback
+        with the same key wins.
+        """
+        try:
+            entries = [entry for entry in os.scandir(self._failed_dir()) if entry.name.endswith(".json")]
+        except FileNotFoundError:
+            return
+        requeued = 0
+        for entry in entries:
+            try:
+                if self.retry_failed_on_start:
+                    with open(entry.path, "r", encoding="utf-8") as handle:
+                        record = json.load(handle)
+                    if record.pop("failed_reason", "exhausted") == "exhausted":
+                        path = os.path.join(self.outbox_dir, entry.name)
+                        if not os.path.exists(path):
+                            record["attempts"] = 0
+                            self._save(path, record)
+                            requeued += 1
+                        os.unlink(entry.path)
+                        continue
+                self._failed_count += 1
+            except Exception as e:
+                logger.error(f"Error loading failed callback record {entry.path}: {str(e)}")
+                self._failed_count += 1
+        if requeued:
+            logger.info(f"Requeued {requeued} callbacks given up on by an earlier run")
+        if self._failed_count:
+            logger.warning(f"{self._failed_count} callbacks are kept in {self._failed_dir()} without being delivered")
+
+    def _failed_dir(self) -> str:
+        """Get the directory of abandoned callback records"""
+        return os.path.join(self.outbox_dir, "failed")
+
+    def _submit_io(self, function: Callable[..., Any], *args: Any) -> asyncio.Future:
+        """Run a disk operation on the writer thread, after every operation submitted before it"""
+        return asyncio.wrap_future(self._io.submit(function, *args))
+
+    def _written(self, path: str, write: asyncio.Future) -> None:
+        """Forget a finished record write, logging it if it failed"""
+        if self._writes.get(path) is write:
+            del self._writes[path]
+        if not write.cancelled() and write.exception() is not None:
+            record_error("callback", write.exception())
+            logger.error(f"Error spooling callback record {path}: {str(write.exception())}")
+
+    def _save(self, path: str, record: Dict[str, Any]) -> None:
+        """Atomically write a callback record"""
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as handle:
+                json.dump(record, handle)
+            os.replace(tmp_path, path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+    def _record_path(self, idempotency_key: str) -> str:
+        """Get the file path of a callback record"""
+        key = hashlib.sha256(idempotency_key.encode("utf-8")).hexdigest()
+        return os.path.join(self.outbox_dir, f"{key}.json")
+
+
+# Global outbox instance shared by the processor and the application lifespan
+callback_outbox = CallbackOutbox()
+
+registry.gauge(
+    "pullsight_callbacks_pending",
+    "Callbacks spooled in the outbox and not yet delivered",
+    lambda: len(callback_outbox._pending or {})
+)
+
+registry.gauge(
+    "pullsight_callbacks_failed",
+    "Callbacks kept in the outbox's failed/ directory without being delivered",
+    lambda: callback_outbox._failed_count
+)
@@ -1,11 +1,20 @@
 from anthropic import AsyncAnthropic
 from config.settings import settings
 from app.services.llm_base import BaseLLMService
-import json
+from app.utils.json_salvage import salvage_json_array, JSONArrayStreamParser, DECODER
+from app.models.review_schema import REVIEW_TOOL_NAME, REVIEW_COMMENTS_KEY, SUMMARY_SECTION_PROPERTIES, get_review_tool
+from app.utils.metrics import LLM_DURATION, LLM_TIME_TO_FIRST_TOKEN, PROMPT_SIZE, record_error, record_llm_usage
+import time
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Item fields named in the text-mode system prompt for each response schema
+TEXT_REVIEW_ITEM_FIELDS = {
+    "standard": "fileName,lineStart, lineEnd, issue, codeSnippet, codeSnippetLineStart, severity, category, suggestion.",
+    "compact": "f (file name), l ([first line, last line]), s (severity code), c (category code), i (issue), x (suggestion)."
+}
+
 class ClaudeService(BaseLLMService):
     """
     Claude LLM service for PR summary and code review generation.
@@ -19,6 +28,8 @@ class ClaudeService(BaseLLMService):
         summary_usage = {}
         try:
             logger.info("Using model for generating summary: %s", self.model_name)    
+            PROMPT_SIZE.observe(len(prompt), operation="summary")
+            request_start_time = time.perf_counter()
             response = await self.client.messages.create(
                 model=self.model_name,
                 max_tokens=8000,
@@ -30,29 +41,39 @@ class ClaudeService(BaseLLMService):
                 logger.info("Claude response received for summary.")
             else:
                 logger.warning("No response received from Claude for summary.")
+            LLM_DURATION.observe(time.perf_counter() - request_start_time, operation="summary", model=self.model_name)
             input_tokens = response.usage.input_tokens
             output_tokens = response.usage.output_tokens
             summary_usage = {"input_tokens": input_tokens, "output_tokens": output_tokens}
             model_info = response.model
+            record_llm_usage(model_info, summary_usage)
             text = response.content[0].text if response.content else "No summary generated."
             
             return text, summary_usage, model_info
         except Exception as e:
-            print(f"Error calling Claude API for summary: {e}")
-            return "Could not generate PR summary."
+            record_error("llm", e)
+            logger.error("Error calling Claude API for summary: %s", e)
+            raise
 
     async def generate_code_review(self, prompt: str) -> str:
+        text, _, review_usage, model_info = await self._request_review_text(prompt)
+        return text, review_usage, model_info
+
+    async def _request_review_text(self, prompt: str):
+        """Request a text-mode review, returning its text, stop reason, usage and model"""
         review_usage = {}
         try:
             logger.info("Using model for generating review: %s", self.model_name)
+            PROMPT_SIZE.observe(len(prompt), operation="review")
+            request_start_time = time.perf_counter()
             response = await self.client.messages.create(
                 model=self.model_name,
                 max_tokens=8000,
                 temperature=0.3,
                 system=(
                     "You are a code review assistant. Provide actionable, line-by-line feedback on code changes. "
-                    "Output must be ONLY a JSON array (no prose) with items containing: fileName,lineStart, lineEnd, issue, "
-                    "codeSnippet, codeSnippetLineStart, severity, category, suggestion."
+                    "Output must be ONLY a JSON array (no prose) with items containing: "
+                    + TEXT_REVIEW_ITEM_FIELDS.get(settings.REVIEW_OUTPUT_SCHEMA, TEXT_REVIEW_ITEM_FIELDS["standard"])
                 ),
                 messages=[{"role": "user", "content": prompt}],
             )
@@ -60,41 +81,121 @@ class ClaudeService(BaseLLMService):
                 logger.info("Claude response received for review.")
             else:
                 logger.warning("No response received from Claude for review.")
+            LLM_DURATION.observe(time.perf_counter() - request_start_time, operation="review", model=self.model_name)
             input_tokens = response.usage.input_tokens
             output_tokens = response.usage.output_tokens
             review_usage = {"input_tokens": input_tokens, "output_tokens": output_tokens}
             model_info = response.model
+            record_llm_usage(model_info, review_usage)
 
             # Concatenate all text blocks
             text = "".join(
                 [getattr(b, "text", "") for b in response.content if getattr(b, "type", "") == "text"]
             ).strip()
+            return text, response.stop_reason, review_usage, model_info
+        except Exception as e:
+            record_error("llm", e)
+            logger.error("Error calling Claude API for review: %s", e)
+            raise
+
+    async def generate_code_review_items(self, prompt: str):
+        """
+        Generate review comments as typed tool input instead of free text.
+
+        The review tool is forced and its input is streamed, so each comment is
+        decoded as soon as the model finishes it and a response cut off by
+        max_tokens still yields every complete comment. In text mode the items
+        salvaged from the response are returned as they are.
+        """
+        if settings.REVIEW_OUTPUT_MODE != "tool":
+            # Keep every complete item, even from truncated or partly malformed output
+            text, stop_reason, review_usage, model_info = await self._request_review_text(prompt)
+            parser = salvage_json_array(text)
+            if parser.truncated or parser.malformed_items:
+                logger.warning(
+                    "Review output incomplete (stop reason %s): recovered %d items, skipped %d malformed",
+                    stop_reason, len(parser.items), parser.malformed_items
+                )
+            return parser.items, review_usage, model_info
+
+        parser, _, review_usage, model_info = await self._stream_review_tool(prompt, with_summary=False)
+        return parser.items, review_usage, model_info
+
+    async def generate_code_review_with_summary(self, prompt: str):
+        """
+        Generate review comments and the summary section of the reviewed chunk in one call.
+
+        The tool input is also kept whole and decoded at the end for the summary
+        fields and, when it is complete, the comments; a response cut off before
+        the end yields the comments salvaged while streaming and no summary.
+        """
+        if settings.REVIEW_OUTPUT_MODE != "tool":
+            return await super().generate_code_review_with_summary(prompt)
+
+        parser, tool_input, review_usage, model_info = await self._stream_review_tool(prompt, with_summary=True)
+        review_items = parser.items
+        summary_section = None
+        try:
+            decoded, _ = DECODER.raw_decode(tool_input.strip())
+            summary_section = {key: decoded[key] for key in SUMMARY_SECTION_PROPERTIES if key in decoded} or None
+            if isinstance(decoded.get(REVIEW_COMMENTS_KEY), list):
+                review_items = [item for item in decoded[REVIEW_COMMENTS_KEY] if isinstance(item, dict)]
+        except (ValueError, TypeError, AttributeError) as e:
+            logger.warning("Could not read the summary from the review tool output: %s", e)
+        return review_items, summary_section, review_usage, model_info
+
+    async def _stream_review_tool(self, prompt: str, with_summary: bool):
+        """Call the review tool with streaming and feed the comments to an incremental parser"""
+        logger.info("Using model for generating review (tool output): %s", self.model_name)
+        parser = JSONArrayStreamParser(REVIEW_COMMENTS_KEY)
+        tool_input = []
+        review_usage = {"input_tokens": 0, "output_tokens": 0}
+        model_info = self.model_name
+        stop_reason = None
+        operation = "review_with_summary" if with_summary else "review"
+        first_token_at = None
 
-            # Try to parse as JSON directly; if it succeeds and is a list, wrap in code fence
-            try:
-                parsed = json.loads(text)
-                if isinstance(parsed, list):
-                    return f"```json\n{json.dumps(parsed, ensure_ascii=False)}\n```", review_usage, model_info
-            except Exception:
-                pass
-
-            # If the text already contains a fenced JSON array, keep it as-is; otherwise extract the first array
-            if text.startswith("```json") and text.rstrip().endswith("```"):
-                return text, review_usage, model_info
-
-            # Extract the first JSON array substring as a fallback
-            import re
-            match = re.search(r"\[.*\]", text, flags=re.DOTALL)
-            if match:
-                array_str = match.group(0)
-                try:
-                    json.loads(array_str)  # validate
-                    return f"```json\n{array_str}\n```", review_usage, model_info
-                except Exception:
-                    pass
-
-            # Last resort: return an empty JSON array in a code fence
-            return "```json\n[]\n```", review_usage, model_info
+        PROMPT_SIZE.observe(len(prompt), operation=operation)
+        request_start_time = time.perf_counter()
+        try:
+            stream = await self.client.messages.create(
+                model=self.model_name,
+                max_tokens=8000,
+                temperature=0.3,
+                system=(
+                    "You are a code review assistant. Provide actionable, line-by-line feedback on code changes. "
+                    f"Report every issue through the {REVIEW_TOOL_NAME} tool."
+                ),
+                tools=[get_review_tool(settings.REVIEW_OUTPUT_SCHEMA, with_summary)],
+                tool_choice={"type": "tool", "name": REVIEW_TOOL_NAME},
+                messages=[{"role": "user", "content": prompt}],
+                stream=True,
+            )
+            async for event in stream:
+                if event.type == "content_block_delta" and event.delta.type == "input_json_delta":
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                        LLM_TIME_TO_FIRST_TOKEN.observe(first_token_at - request_start_time, operation=operation, model=self.model_name)
+                    parser.feed(event.delta.partial_json)
+                    if with_summary:
+                        tool_input.append(event.delta.partial_json)
+                elif event.type == "message_start":
+                    model_info = event.message.model
+                    review_usage["input_tokens"] = event.message.usage.input_tokens
+                elif event.type == "message_delta":
+                    review_usage["output_tokens"] = event.usage.output_tokens
+                    stop_reason = event.delta.stop_reason
         except Exception as e:
-            print(f"Error calling Claude API for review: {e}")
-            return "Could not perform code review."
\ No newline at end of file
+            record_error("llm", e)
+            raise
+        LLM_DURATION.observe(time.perf_counter() - request_start_time, operation=operation, model=self.model_name)
+        record_llm_usage(model_info, review_usage)
+        parser.close()
+
+        logger.info("Claude tool output received for review: %d comments.", len(parser.items))
+        if parser.truncated or parser.malformed_items:
+            logger.warning(
+                "Review tool output incomplete (stop reason %s): recovered %d items, skipped %d malformed",
+                stop_reason, len(parser.items), parser.malformed_items
+            )
+        return parser, "".join(tool_input), review_usage, model_info
@@ -0,0 +1,160 @@
+"""
+Coalescing sink for review comments of one analysis.
+Comments from all chunks are gathered into batches that are posted once they reach
+a comment count or a serialized size, or when the analysis completes; an optional
+latency deadline posts them earlier. The completed marker is queued behind every
+batch so the backend closes the analysis last.
+"""
+
+import json
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+from app.services.callback_outbox import CallbackOutbox
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ReviewCommentSink:
+    """Batches review comments of one analysis into outbox callbacks"""
+
+    def __init__(
+        self,
+        outbox: CallbackOutbox,
+        endpoint: str,
+        analysis_id: str,
+        max_comments: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        max_delay: Optional[float] = None
+    ):
+        """
+        Initialize the sink.
+
+        Args:
+            outbox: Outbox delivering the batches in order
+            endpoint: Backend review endpoint
+            analysis_id: Pull request analysis the comments belong to
+            max_comments: Comments that trigger a flush
+            max_bytes: Serialized size of the buffered comments that triggers a flush
+            max_delay: Seconds the first buffered comment may wait before a flush, 0 to wait for a limit or completion
+        """
+        self.outbox = outbox
+        self.endpoint = endpoint
+        self.analysis_id = str(analysis_id)
+        self.max_comments = max_comments or settings.COMMENT_BATCH_MAX_COMMENTS
+        self.max_bytes = max_bytes or settings.COMMENT_BATCH_MAX_BYTES
+        self.max_delay = max_delay if max_delay is not None else settings.COMMENT_BATCH_MAX_DELAY
+        self.model_info: Dict[str, Any] = {}
+        self.usage_info: Dict[str, Any] = {"input_tokens": 0, "output_tokens": 0}
+        self.batch_count = 0
+        self.comment_count = 0
+        self.completed = False
+        self._buffer: List[Dict] = []
+        self._buffer_bytes = 0
+        self._deadline: Optional[asyncio.TimerHandle] = None
+
+    def add(self, comments: List[Dict], usage_info: Dict[str, Any], model_info: Dict[str, Any]) -> None:
+        """
+        Buffer the comments of a chunk, flushing whenever a limit is reached.
+
+        Args:
+            comments: Review comments of the chunk
+            usage_info: Token usage of the analysis so far
+            model_info: Model information of the analysis
+        """
+        if self.completed:
+            raise RuntimeError(f"Review of analysis {self.analysis_id} is already completed")
+        self.usage_info = usage_info
+        self.model_info = model_info or self.model_info
+        for comment in comments:
+            size = len(json.dumps(comment, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+            if self._buffer and self._buffer_bytes + size > self.max_bytes:
+                self.flush()
+            self._buffer.append(comment)
+            self._buffer_bytes += size
+            if len(self._buffer) >= self.max_comments:
+                self.flush()
+
+        if self._buffer and self._deadline is None and self.max_delay > 0:
+            self._deadline = asyncio.get_running_loop().call_later(self.max_delay, self.flush)
+
+    def flush(self) -> None:
+        """Queue the buffered comments as one review payload"""
+        if self._deadline is not None:
+            self._deadline.cancel()
+            self._deadline = None
+        if not self._buffer:
+            return
+        self._post(self._buffer, completed=False)
+        self._buffer = []
+        self._buffer_bytes = 0
+
+    def complete(self, unchanged_files: List[str], excluded_files: Optional[List[Dict[str, str]]] = None) -> None:
+        """
+        Queue the completed marker with the remaining comments, behind every earlier batch.
+
+        Args:
+            unchanged_files: Files skipped as unchanged since the previous analysis
+            excluded_files: Files left out of the review by their content, as {"fileName", "kind", "reason"}
+        """
+        if self._deadline is not None:
+            self._deadline.cancel()
+            self._deadline = None
+        self._post(self._buffer, completed=True, unchanged_files=unchanged_files, excluded_files=excluded_files)
+        self._buffer = []
+        self._buffer_bytes = 0
+        self.completed = True
+        logger.info(f"Review of analysis {self.analysis_id} queued as {self.batch_count} payloads with {self.comment_count} comments")
+
+    def fail(self, reason: str) -> None:
+        """
+        Queue the completed marker of an analysis that could not be reviewed, dropping buffered comments.
+
+        Args:
+            reason: Why the analysis failed, stored by the backend
+        """
+        if self._deadline is not None:
+            self._deadline.cancel()
+            self._deadline = None
+        self._buffer = []
+        self._buffer_bytes = 0
+        self._post([], completed=True, failed_reason=reason)
+        self.completed = True
+        logger.info(f"Review of analysis {self.analysis_id} queued as failed: {reason}")
+
+    def _post(
+        self,
+        comments: List[Dict],
+        completed: bool,
+        unchanged_files: Optional[List[str]] = None,
+        excluded_files: Optional[List[Dict[str, str]]] = None,
+        failed_reason: Optional[str] = None
+    ) -> None:
+        """Spool one review payload in the outbox"""
+        payload = {
+            "pullRequestAnalysisId": self.analysis_id,
+            "comments": comments,
+            "modelInfo": self.model_info,
+            "usageInfo": self.usage_info,
+            "completed": 1 if completed else 0
+        }
+        if completed:
+            payload["unchangedFiles"] = unchanged_files or []
+            payload["excludedFiles"] = excluded_files or []
+        if failed_reason:
+            payload["failedReason"] = failed_reason
+        key = "final" if completed else f"batch:{self.batch_count}"
+        label = "final review" if completed else f"review batch {self.batch_count + 1}"
+        self.batch_count += 1
+        self.comment_count += len(comments)
+        try:
+            self.outbox.enqueue(
+                self.endpoint,
+                payload,
+                f"{self.analysis_id}:review:{key}",
+                self.analysis_id,
+                f"{label} ({len(comments)} comments)"
+            )
+        except Exception as e:
+            logger.error(f"Exception while spooling {label}: {str(e)}")
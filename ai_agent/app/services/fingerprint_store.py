@@ -0,0 +1,294 @@
+"""
+Fingerprint store for incremental re-reviews.
+Remembers, per pull request, a hash of each reviewed file's diff and before-change
+content together with the comments produced for it, so unchanged files can be skipped.
+Records not updated for FINGERPRINT_STORE_TTL_DAYS are ignored and pruned.
+"""
+
+import os
+import json
+import asyncio
+import hashlib
+import logging
+import time
+import tempfile
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Tuple, Optional
+from app.utils.parsed_diff import get_parsed_diff
+from app.utils.prompt_manager import PromptManager
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class FingerprintStore:
+    """Disk-backed per-PR store of file fingerprints and their review comments"""
+
+    STORE_VERSION = 1
+    # Seconds between two scans of the store for expired records
+    PRUNE_INTERVAL_SECONDS = 3600
+
+    def __init__(self, store_dir: Optional[str] = None):
+        """
+        Initialize the fingerprint store.
+
+        Args:
+            store_dir: Directory holding one JSON record per pull request
+        """
+        self.store_dir = store_dir or settings.FINGERPRINT_STORE_DIR
+        self.ttl_seconds = settings.FINGERPRINT_STORE_TTL_DAYS * 86400
+        self._last_prune = 0.0
+        # Per-PR lock and the number of analyses holding or waiting for it
+        self._locks: Dict[str, Tuple[asyncio.Lock, int]] = {}
+
+    @staticmethod
+    def get_pr_key(extracted_data: Dict) -> str:
+        """
+        Get the storage key of a pull request.
+
+        Args:
+            extracted_data: Validated PR data
+
+        Returns:
+            Hex digest identifying provider, repository and PR number
+        """
+        identity = "\n".join([
+            str(extracted_data.get("provider", "")),
+            str(extracted_data.get("repo_structure_summary", "")),
+            str(extracted_data.get("prNumber", ""))
+        ])
+        return hashlib.sha256(identity.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def get_review_config_key(extracted_data: Dict) -> str:
+        """
+        Get a key for the settings and prompt that shape review output.
+        Previous results are only reused when these have not changed.
+        """
+        config = "\n".join([
+            str(extracted_data.get("model_name") or settings.DEFAULT_MODEL),
+            str(extracted_data.get("minSeverity", "")),
+            settings.REVIEW_CONTEXT_MODE,
+            str(settings.REVIEW_CONTEXT_WINDOW_LINES),
+            str(settings.REVIEW_CONTEXT_TOKEN_BUDGET),
+            settings.REVIEW_OUTPUT_MODE,
+            settings.REVIEW_OUTPUT_SCHEMA,
+            settings.DIFF_RENDER_PROFILE,
+            hashlib.sha256(str(PromptManager.get_prompt_template("review")).encode("utf-8")).hexdigest()
+        ])
+        return hashlib.sha256(config.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def fingerprint_file(file_info: Dict) -> str:
+        """
+        Hash a file's diff hunks and before-change content.
+
+        Args:
+            file_info: File information dictionary
+
+        Returns:
+            Hex digest of the file's reviewable input
+        """
+        digest = hashlib.sha256()
+        hunks = get_parsed_diff(file_info).hunk_texts
+        for part in [file_info.get("prFileName", "")] + hunks + [file_info.get("prFileContentBefore") or ""]:
+            encoded = str(part).encode("utf-8", "surrogatepass")
+            # Length prefix keeps boundaries between parts unambiguous
+            digest.update(len(encoded).to_bytes(8, "big"))
+            digest.update(encoded)
+        return digest.hexdigest()
+
+    @asynccontextmanager
+    async def lock(self, extracted_data: Dict) -> AsyncIterator[None]:
+        """
+        Serialize analyses of the same pull request.
+
+        An analysis holds the lock from reading the stored record until it records its
+        review, so an overlapping analysis of the PR sees the fingerprints and comments
+        of the earlier one instead of the same prior state.
+
+        Args:
+            extracted_data: Validated PR data
+        """
+        pr_key = self.get_pr_key(extracted_data)
+        lock, users = self._locks.get(pr_key) or (asyncio.Lock(), 0)
+        self._locks[pr_key] = (lock, users + 1)
+        if lock.locked():
+            logger.info(f"Waiting for an earlier analysis of PR #{extracted_data.get('prNumber')} to finish")
+        try:
+            async with lock:
+                yield
+        finally:
+            lock, users = self._locks[pr_key]
+            if users > 1:
+                self._locks[pr_key] = (lock, users - 1)
+            else:
+                del self._locks[pr_key]
+
+    def load(self, pr_key: str) -> Dict:
+        """
+        Load the stored record of a pull request.
+
+        Args:
+            pr_key: Key from get_pr_key()
+
+        Returns:
+            Record with "config" and "files" entries, empty if nothing is stored
+        """
+        path = self._record_path(pr_key)
+        try:
+            if self._is_expired(path, time.time()):
+                return {}
+            with open(path, "r", encoding="utf-8") as handle:
+                record = json.load(handle)
+            if record.get("version") != self.STORE_VERSION:
+                return {}
+            return record
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.error(f"Error loading fingerprint record {path}: {str(e)}")
+            return {}
+
+    def save(self, pr_key: str, record: Dict) -> None:
+        """
+        Atomically replace the stored record of a pull request.
+
+        Args:
+            pr_key: Key from get_pr_key()
+            record: Record with "config" and "files" entries
+        """
+        path = self._record_path(pr_key)
+        try:
+            os.makedirs(self.store_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.store_dir, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as handle:
+                    json.dump({**record, "version": self.STORE_VERSION}, handle)
+                os.replace(tmp_path, path)
+            except Exception:
+                os.unlink(tmp_path)
+                raise
+        except Exception as e:
+            logger.error(f"Error saving fingerprint record {path}: {str(e)}")
+
+    def partition_files(self, extracted_data: Dict) -> Tuple[List[Dict], Dict[str, Dict]]:
+        """
+        Split PR files into those that need a review and those unchanged since the last analysis.
+
+        Args:
+            extracted_data: Validated PR data
+
+        Returns:
+            Tuple of (files to review, stored entries of unchanged files keyed by file name)
+        """
+        record = self.load(self.get_pr_key(extracted_data))
+        if record.get("config") != self.get_review_config_key(extracted_data):
+            return list(extracted_data["prFiles"]), {}
+
+        stored_files = record.get("files", {})
+        changed_files = []
+        unchanged_files = {}
+        for file_info in extracted_data["prFiles"]:
+            file_name = file_info.get("prFileName")
+            stored = stored_files.get(file_name)
+            if stored and stored.get("fingerprint") == self.fingerprint_file(file_info):
+                unchanged_files[file_name] = stored
+            else:
+                changed_files.append(file_info)
+
+        return changed_files, unchanged_files
+
+    def get_previous_comments(self, extracted_data: Dict) -> List[Dict]:
+        """
+        Get every comment stored by earlier analyses of a pull request.
+
+        Args:
+            extracted_data: Validated PR data
+
+        Returns:
+            Stored comments of all files, empty if nothing is stored
+        """
+        record = self.load(self.get_pr_key(extracted_data))
+        return [
+            comment
+            for stored in record.get("files", {}).values()
+            for comment in stored.get("comments", [])
+        ]
+
+    def record_review(
+        self,
+        extracted_data: Dict,
+        reviewed_files: List[Dict],
+        comments: List[Dict],
+        unchanged_files: Dict[str, Dict]
+    ) -> None:
+        """
+        Store fingerprints and comments after a review.
+
+        Args:
+            extracted_data: Validated PR data
+            reviewed_files: Files whose review completed in this analysis
+            comments: Comments produced for the reviewed files
+            unchanged_files: Stored entries carried forward from the previous analysis
+        """
+        comments_by_file: Dict[str, List[Dict]] = {}
+        for comment in comments:
+            comments_by_file.setdefault(comment.get("filePath"), []).append(comment)
+
+        files = dict(unchanged_files)
+        for file_info in reviewed_files:
+            file_name = file_info.get("prFileName")
+            files[file_name] = {
+                "fingerprint": self.fingerprint_file(file_info),
+                "comments": comments_by_file.get(file_name, [])
+            }
+
+        self.save(self.get_pr_key(extracted_data), {
+            "config": self.get_review_config_key(extracted_data),
+            "files": files
+        })
+        if time.time() - self._last_prune >= self.PRUNE_INTERVAL_SECONDS:
+            self.prune()
+
+    def prune(self) -> int:
+        """
+        Delete the records of pull requests not analyzed for FINGERPRINT_STORE_TTL_DAYS,
+        such as closed or abandoned ones.
+
+        Returns:
+            Number of records deleted
+        """
+        now = time.time()
+        self._last_prune = now
+        removed = 0
+        try:
+            entries = list(os.scandir(self.store_dir))
+        except FileNotFoundError:
+            return 0
+        for entry in entries:
+            if not entry.name.endswith(".json") or not self._is_expired(entry.path, now):
+                continue
+            try:
+                os.unlink(entry.path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logger.error(f"Error pruning fingerprint record {entry.path}: {str(e)}")
+        if removed:
+            logger.info(f"Pruned {removed} fingerprint records older than {settings.FINGERPRINT_STORE_TTL_DAYS} days")
+        return removed
+
+    def _is_expired(self, path: str, now: float) -> bool:
+        """Whether a record was last saved longer than the TTL ago; a TTL of 0 keeps records forever"""
+        if self.ttl_seconds <= 0:
+            return False
+        try:
+            return now - os.path.getmtime(path) > self.ttl_seconds
+        except FileNotFoundError:
+            return False
+
+    def _record_path(self, pr_key: str) -> str:
+        """Get the file path of a PR record"""
+        return os.path.join(self.store_dir, f"{pr_key}.json")
@@ -0,0 +1,310 @@
+"""
+Git mirror ingestion of pull requests.
+Keeps a local bare mirror per repository, fetched incrementally, and computes the
+changed files of a pull request from its base and head commits with git plumbing,
+so the backend can name commits instead of sending diffs and file contents.
+"""
+
+import os
+import re
+import asyncio
+import hashlib
+import logging
+from typing import Dict, List, Optional, Tuple
+from app.utils.filter_files import filter_pr_files
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+SHA_RE = re.compile(r"^[0-9a-f]{40}([0-9a-f]{24})?$")
+# Remote repositories only: https:// or ssh:// URLs and scp-like user@host:path; nothing git could read as an option
+CLONE_URL_RE = re.compile(r"^(?:(?:https|ssh)://[^\s/@:-][^\s]*|[\w.][\w.-]*@[\w.][\w.-]*:(?!-)[^\s]+)$")
+# Transports git may use for fetching; local paths, file:// and ext:: are refused
+ALLOWED_PROTOCOLS = "https:ssh"
+CREDENTIALS_RE = re.compile(r"(?<=://)[^/@]+@")
+HUNK_START_RE = re.compile(r"^@@ ", re.MULTILINE)
+
+# Raw diff statuses in the vocabulary of the provider file lists
+FILE_STATUSES = {
+    "A": "added",
+    "M": "modified",
+    "D": "removed",
+    "R": "renamed",
+    "C": "copied",
+    "T": "changed"
+}
+SUBMODULE_MODE = "160000"
+
+
+class GitMirrorError(Exception):
+    """A git command failed or the requested commits cannot be read"""
+
+
+class GitMirrorService:
+    """Service computing pull request files from local bare mirrors of their repositories"""
+
+    def __init__(self, mirror_dir: Optional[str] = None, fetch_timeout: Optional[int] = None):
+        """
+        Initialize the git mirror service.
+
+        Args:
+            mirror_dir: Directory holding one bare mirror per repository
+            fetch_timeout: Seconds a clone or fetch may take
+        """
+        self.mirror_dir = mirror_dir or settings.GIT_MIRROR_DIR
+        self.fetch_timeout = fetch_timeout or settings.GIT_FETCH_TIMEOUT
+        # Fetches into the same mirror are serialized
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    @staticmethod
+    def redact(url: str) -> str:
+        """Remove credentials from a clone URL for logging and mirror naming"""
+        return CREDENTIALS_RE.sub("", url)
+
+    def get_mirror_path(self, clone_url: str) -> str:
+        """
+        Get the directory of a repository's mirror.
+
+        Args:
+            clone_url: Clone URL, with or without credentials
+
+        Returns:
+            Path of the bare mirror
+        """
+        key = hashlib.sha256(self.redact(clone_url).encode("utf-8")).hexdigest()
+        return os.path.join(self.mirror_dir, f"{key}.git")
+
+    async def load_pr_files(self, clone_url: str, base_sha: str, head_sha: str, ignore: Optional[List[str]] = None) -> List[Dict]:
+        """
+        Compute the changed files of a pull request.
+
+        Args:
+            clone_url: https, ssh or scp-like clone URL of the repository; credentials in it are
+                used for fetching only and never stored in the mirror
+            base_sha: Commit the pull request is based on
+            head_sha: Head commit of the pull request
+            ignore: Ignore patterns of the repository, applied before file contents are read
+
+        Returns:
+            File information dictionaries in the shape of the prFiles of a review request,
+            diffs computed against the merge base of the two commits
+        """
+        mirror_path = await self.ensure_commits(clone_url, [base_sha, head_sha])
+
+        merge_base = await self._run_git(mirror_path, "merge-base", base_sha, head_sha, check=False)
+        merge_base = merge_base.decode().strip() if merge_base else base_sha
+
+        # The three outputs list the files in the same order
+        diff_args = ["-M", "--no-color", "--no-ext-diff", "--no-textconv", merge_base, head_sha]
+        raw_output, numstat_output, patch_output = await asyncio.gather(
+            self._run_git(mirror_path, "diff", "--raw", "-z", "--no-abbrev", *diff_args),
+            self._run_git(mirror_path, "diff", "--numstat", "-z", *diff_args),
+            self._run_git(mirror_path, "diff", "-p", *diff_args)
+        )
+
+        entries = self._parse_raw(raw_output)
+        counts = self._parse_numstat(numstat_output)
+        patches = self._split_patches(patch_output.decode("utf-8", "replace"))
+        if not len(entries) == len(counts) == len(patches):
+            raise GitMirrorError(f"Mismatched diff outputs: {len(entries)} entries, {len(counts)} counts, {len(patches)} patches")
+
+        allowed = set(filter_pr_files(ignore or [], [entry["path"] for entry in entries]))
+        files = []
+        skipped_binary = 0
+        for entry, (additions, deletions), patch in zip(entries, counts, patches):
+            if entry["path"] not in allowed or SUBMODULE_MODE in (entry["old_mode"], entry["new_mode"]):
+                continue
+            if additions is None:
+                skipped_binary += 1
+                continue
+            file_info = {
+                "prFileName": entry["path"],
+                "prFileStatus": FILE_STATUSES.get(entry["status"], "modified"),
+                "prFileAdditions": additions,
+                "prFileDeletions": deletions,
+                "prFileChanges": additions + deletions,
+                "prFileDiff": patch,
+                "_old_blob": entry["old_blob"] if entry["status"] != "A" else None,
+                "_new_blob": entry["new_blob"] if entry["status"] != "D" else None
+            }
+            if entry["old_path"]:
+                file_info["prFilePreviousName"] = entry["old_path"]
+            files.append(file_info)
+
+        # Contents are read in one batch, only for files that passed the ignore patterns
+        blob_ids = [blob for file_info in files for blob in (file_info["_old_blob"], file_info["_new_blob"]) if blob]
+        contents = await self._read_blobs(mirror_path, blob_ids)
+        for file_info in files:
+            old_blob, new_blob = file_info.pop("_old_blob"), file_info.pop("_new_blob")
+            file_info["prFileContentBefore"] = contents.get(old_blob, "") if old_blob else ""
+            file_info["prFileContentAfter"] = contents.get(new_blob, "") if new_blob else ""
+
+        logger.info(
+            f"Computed {len(files)} files of {self.redact(clone_url)} {base_sha[:12]}...{head_sha[:12]} "
+            f"({len(entries) - len(files) - skipped_binary} ignored, {skipped_binary} binary)"
+        )
+        return files
+
+    async def ensure_commits(self, clone_url: str, commits: List[str]) -> str:
+        """
+        Make sure the mirror of a repository holds the given commits, fetching only when it does not.
+
+        Args:
+            clone_url: https, ssh or scp-like clone URL of the repository
+            commits: Commit SHAs that must be present
+
+        Returns:
+            Path of the bare mirror
+        """
+        if not CLONE_URL_RE.match(clone_url or ""):
+            raise GitMirrorError(f"Invalid clone URL: {self.redact(clone_url or '')[:200]!r}")
+        for commit in commits:
+            if not SHA_RE.match(commit or ""):
+                raise GitMirrorError(f"Invalid commit SHA: {commit!r}")
+
+        mirror_path = self.get_mirror_path(clone_url)
+        lock = self._locks.setdefault(mirror_path, asyncio.Lock())
+        async with lock:
+            if not os.path.isdir(mirror_path):
+                os.makedirs(self.mirror_dir, exist_ok=True)
+                await self._run_git(None, "init", "--bare", "--quiet", mirror_path)
+
+            missing = [commit for commit in commits if not await self._has_commit(mirror_path, commit)]
+            if not missing:
+                return mirror_path
+
+            logger.info(f"Fetching {len(missing)} commits of {self.redact(clone_url)} into {mirror_path}")
+            # Fetch the commits themselves; servers that refuse unadvertised commits get the branch and PR heads
+            fetched = await self._run_git(
+                mirror_path, "fetch", "--quiet", "--no-tags", "--", clone_url, *missing,
+                check=False, timeout=self.fetch_timeout
+            )
+            if fetched is None or not all([await self._has_commit(mirror_path, commit) for commit in missing]):
+                await self._run_git(
+                    mirror_path, "fetch", "--quiet", "--no-tags", "--prune", "--", clone_url,
+                    "+refs/heads/*:refs/heads/*", "+refs/pull/*/head:refs/pull/*/head",
+                    timeout=self.fetch_timeout
+                )
+            for commit in missing:
+                if not await self._has_commit(mirror_path, commit):
+                    raise GitMirrorError(f"Commit {commit} not found in {self.redact(clone_url)}")
+                # Keep fetched commits referenced so garbage collection does not prune them
+                await self._run_git(mirror_path, "update-ref", f"refs/pullsight/{commit}", commit)
+        return mirror_path
+
+    async def _has_commit(self, mirror_path: str, commit: str) -> bool:
+        return await self._run_git(mirror_path, "cat-file", "-e", f"{commit}^{{commit}}", check=False) is not None
+
+    async def _read_blobs(self, mirror_path: str, blob_ids: List[str]) -> Dict[str, str]:
+        """Read blobs with one cat-file process"""
+        unique_ids = list(dict.fromkeys(blob_ids))
+        if not unique_ids:
+            return {}
+        output = await self._run_git(mirror_path, "cat-file", "--batch", stdin="\n".join(unique_ids) + "\n")
+
+        contents = {}
+        pos = 0
+        for blob_id in unique_ids:
+            header_end = output.index(b"\n", pos)
+            header = output[pos:header_end].split()
+            pos = header_end + 1
+            if len(header) < 3:
+                logger.warning(f"Blob {blob_id} missing from the mirror")
+                continue
+            size = int(header[2])
+            contents[blob_id] = output[pos:pos + size].decode("utf-8", "replace")
+            pos += size + 1
+        return contents
+
+    async def _run_git(
+        self,
+        mirror_path: Optional[str],
+        *args: str,
+        check: bool = True,
+        timeout: Optional[int] = None,
+        stdin: Optional[str] = None
+    ) -> Optional[bytes]:
+        """
+        Run a git command against a mirror.
+
+        Returns:
+            Standard output, None if the command failed and check is False
+        """
+        options = ["-c", "protocol.file.allow=never"]
+        command = ["git", *options, "--git-dir", mirror_path, *args] if mirror_path else ["git", *options, *args]
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            stdin=asyncio.subprocess.PIPE if stdin is not None else asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env={**os.environ, "GIT_TERMINAL_PROMPT": "0", "GIT_ALLOW_PROTOCOL": ALLOWED_PROTOCOLS}
+        )
+        try:
+            stdout, stderr = await asyncio.wait_for(
+                process.communicate(stdin.encode() if stdin is not None else None),
+                timeout
+            )
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            raise GitMirrorError(f"git {args[0]} timed out after {timeout}s")
+
+        if process.returncode != 0:
+            if not check:
+                return None
+            message = self.redact(stderr.decode("utf-8", "replace").strip())
+            raise GitMirrorError(f"git {args[0]} failed: {message[:500]}")
+        return stdout
+
+    @staticmethod
+    def _parse_raw(output: bytes) -> List[Dict]:
+        """Parse `git diff --raw -z` into entries with modes, blob ids, status and paths"""
+        fields = output.decode("utf-8", "surrogateescape").split("\0")
+        entries = []
+        position = 0
+        while position < len(fields) and fields[position].startswith(":"):
+            old_mode, new_mode, old_blob, new_blob, status = fields[position][1:].split(" ")
+            status = status[0]
+            if status in ("R", "C"):
+                old_path, path = fields[position + 1], fields[position + 2]
+                position += 3
+            else:
+                old_path, path = None, fields[position + 1]
+                position += 2
+            entries.append({
+                "old_mode": old_mode,
+                "new_mode": new_mode,
+                "old_blob": old_blob,
+                "new_blob": new_blob,
+                "status": status,
+                "old_path": old_path,
+                "path": path
+            })
+        return entries
+
+    @staticmethod
+    def _parse_numstat(output: bytes) -> List[Tuple[Optional[int], Optional[int]]]:
+        """Parse `git diff --numstat -z` into (additions, deletions), None for binary files"""
+        fields = output.decode("utf-8", "surrogateescape").split("\0")
+        counts = []
+        position = 0
+        while position < len(fields) and fields[position]:
+            additions, deletions, path = fields[position].split("\t", 2)
+            # Renames and copies leave the path empty and list both paths as separate fields
+            position += 3 if path == "" else 1
+            counts.append((None, None) if additions == "-" else (int(additions), int(deletions)))
+        return counts
+
+    @staticmethod
+    def _split_patches(output: str) -> List[str]:
+        """Split a patch into per-file hunks, dropping the headers before the first hunk"""
+        sections = re.split(r"^diff --git ", output, flags=re.MULTILINE)[1:]
+        patches = []
+        for section in sections:
+            match = HUNK_START_RE.search(section)
+            patches.append(section[match.start():].rstrip("\n") if match else "")
+        return patches
+
+
+# Global service instance
+git_mirror_service = GitMirrorService()
@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from app.utils.json_salvage import salvage_json_array
 
 class BaseLLMService(ABC):
     """
@@ -9,6 +10,7 @@ class BaseLLMService(ABC):
     async def generate_pr_summary(self, prompt: str) -> str:
         """
         Generate a summary for a pull request based on the provided prompt.
+        Returns (summary, usage, model info) and raises if the LLM call fails.
         """
         pass
 
@@ -16,5 +18,22 @@ class BaseLLMService(ABC):
     async def generate_code_review(self, prompt: str) -> str:
         """
         Generate a line-by-line code review for a pull request based on the provided prompt.
+        Returns (review text, usage, model info) and raises if the LLM call fails.
         """
-        pass 
\ No newline at end of file
+        pass 
+
+    async def generate_code_review_items(self, prompt: str):
+        """
+        Generate a code review as a list of comment dictionaries.
+        Services without structured output support parse their text review.
+        """
+        review, review_usage, model_info = await self.generate_code_review(prompt)
+        return salvage_json_array(review).items, review_usage, model_info
+
+    async def generate_code_review_with_summary(self, prompt: str):
+        """
+        Generate a code review and the summary section of the reviewed chunk.
+        Services without structured output support return no summary section.
+        """
+        review_items, review_usage, model_info = await self.generate_code_review_items(prompt)
+        return review_items, None, review_usage, model_info
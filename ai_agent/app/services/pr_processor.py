@@ -1,11 +1,10 @@
 import time
 import logging
-import httpx
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 from app.services.claude_service import ClaudeService
 from app.api.summary import generate_summary_response
 from app.api.review import generate_chunked_review_response
-from app.api.review_parser import parse_chunked_review_response
+from app.api.review_parser import parse_chunked_review_response, build_chunked_review_comments
 from app.utils.chunking_strategy import (
     create_summary_chunks, 
     create_review_chunks, 
@@ -13,7 +12,14 @@ from app.utils.chunking_strategy import (
     prepare_chunk_for_review
 )
 from app.utils.summary_aggregator import aggregate_chunk_summaries
+from app.utils.summary_metadata import SummaryMetadataService
+from app.models.pr_response import PRSummaryResponse
 from app.utils.line_perser import extract_summary_info
+from app.services.fingerprint_store import FingerprintStore
+from app.utils.comment_dedup import CommentDeduplicationService
+from app.services.callback_outbox import callback_outbox
+from app.services.comment_sink import ReviewCommentSink
+from app.utils.metrics import STAGE_DURATION, record_error
 from app.core.setup import setup_logger
 from config.settings import Settings
 
@@ -27,6 +33,16 @@ class PRProcessor:
         Config = Settings()
         self.summary_endpoint = Config.BACKEND_SUMMARY_ENDPOINT
         self.review_endpoint = Config.BACKEND_REVIEW_ENDPOINT
+        self.callback_outbox = callback_outbox
+        self.incremental_review_enabled = Config.INCREMENTAL_REVIEW_ENABLED
+        self.fingerprint_store = FingerprintStore(Config.FINGERPRINT_STORE_DIR)
+        self.comment_dedup_enabled = Config.COMMENT_DEDUP_ENABLED
+        self.comment_dedup_similarity = Config.COMMENT_DEDUP_SIMILARITY
+        self.combined_summary_enabled = Config.SUMMARY_GENERATION_MODE == "combined"
+        if self.combined_summary_enabled and Config.REVIEW_OUTPUT_MODE != "tool":
+            logger.warning("SUMMARY_GENERATION_MODE=combined needs REVIEW_OUTPUT_MODE=tool, generating the summary separately")
+            self.combined_summary_enabled = False
+        self.metadata_service = SummaryMetadataService()
     
     async def process_pr_review(self, extracted_data: Dict) -> None:
         """
@@ -44,7 +60,7 @@ class PRProcessor:
         logger.info("Starting background PR review process")
         logger.info(f"PR Details: Number={extracted_data['prNumber']}, Title={extracted_data['prTitle'][:50]}...")
         logger.info(f"Configuration: Provider={extracted_data['provider']}, InstallationId={extracted_data['installation_id']}, AnalysisId={extracted_data['pullRequestAnalysisId']}")
-        logger.info(f"Files to process: {extracted_data['number_of_files']}")
+        logger.info(f"Files to process: {extracted_data['number_of_files']}, excluded by content: {len(extracted_data.get('excluded_files', []))}")
         
         llm_service = ClaudeService(
             api_key=extracted_data.get("api_key"), 
@@ -52,28 +68,53 @@ class PRProcessor:
         )
         
         try:
-            # Process summary
-            summary_result = await self._process_summary(extracted_data, llm_service)
-            await self._post_summary_to_backend(extracted_data, summary_result)
-            
-            # Process review
-            await self._process_review(extracted_data, llm_service)
+            if self.combined_summary_enabled:
+                # Review chunks return their summary sections; the summary is posted before the review completes
+                await self._process_review(extracted_data, llm_service, with_summary=True)
+            else:
+                # Process summary
+                summary_result = await self._process_summary(extracted_data, llm_service)
+                await self._post_summary_to_backend(extracted_data, summary_result)
+                
+                # Process review
+                await self._process_review(extracted_data, llm_service)
             
             total_duration = time.time() - start_time
             logger.info(f"Background PR review process completed successfully in {total_duration:.2f}s")
             
         except Exception as e:
+            record_error("processing", e)
             logger.error(f"PR processing failed: {str(e)}")
         finally:
             logger.info("=" * 80)
     
-    async def _process_summary(self, extracted_data: Dict, llm_service: ClaudeService) -> Dict:
+    def report_failure(self, analysis_id: Optional[str], reason: str) -> None:
+        """
+        Close an analysis that could not be reviewed, so the backend does not wait for it forever.
+        
+        Args:
+            analysis_id: Pull request analysis to close
+            reason: Why the analysis failed
+        """
+        if not analysis_id:
+            logger.error(f"Cannot report failed analysis without pullRequestAnalysisId: {reason}")
+            return
+        ReviewCommentSink(self.callback_outbox, self.review_endpoint, analysis_id).fail(reason)
+    
+    async def _process_summary(
+        self,
+        extracted_data: Dict,
+        llm_service: ClaudeService,
+        reviewed_summaries: Optional[List[Tuple[List[str], PRSummaryResponse]]] = None
+    ) -> Dict:
         """
         Process summary generation with chunking strategy.
         
         Args:
             extracted_data: PR data
             llm_service: LLM service instance
+            reviewed_summaries: In combined mode, the file names and summary of each review chunk;
+                only files not covered by them are summarized here
             
         Returns:
             Dictionary containing summary, usage info, model info, and summary info
@@ -87,14 +128,23 @@ class PRProcessor:
                 "info": {"estimated_code_review_time": 0, "potential_issue_count": 0}
             }
         
-        logger.info(f"Processing {len(extracted_data['prFiles'])} files for summary generation with chunking strategy")
+        summary_files = extracted_data["prFiles"]
+        chunk_summaries = []
+        if reviewed_summaries is not None:
+            covered_file_names = {file_name for file_names, _ in reviewed_summaries for file_name in file_names}
+            summary_files = [file_info for file_info in summary_files if file_info.get("prFileName") not in covered_file_names]
+            chunk_summaries = [summary for _, summary in reviewed_summaries]
+            logger.info(f"Using {len(chunk_summaries)} chunk summaries from the review pass, {len(summary_files)} files left to summarize")
+        
+        logger.info(f"Processing {len(summary_files)} files for summary generation with chunking strategy")
         
         # Create chunks for summary generation
-        chunks, ignored_files = create_summary_chunks(
-            files=extracted_data["prFiles"],
-            max_chunk_tokens=100000,  # LLM limit
-            max_file_tokens=100000    # File size limit
-        )
+        with STAGE_DURATION.time(stage="chunking"):
+            chunks, ignored_files = create_summary_chunks(
+                files=summary_files,
+                max_chunk_tokens=100000,  # LLM limit
+                max_file_tokens=100000    # File size limit
+            ) if summary_files else ([], [])
         
         if ignored_files:
             logger.warning(f"Ignored {len(ignored_files)} files for summary due to size limits")
@@ -102,7 +152,6 @@ class PRProcessor:
                 logger.warning(f"  - {ignored['fileName']}: {ignored['reason']}")
         
         # Generate summaries for each chunk
-        chunk_summaries = []
         total_input_tokens = 0
         total_output_tokens = 0
         total_time_estimation = 0
@@ -113,7 +162,8 @@ class PRProcessor:
             logger.info(f"Generating summary for chunk {chunk['chunk_index'] + 1}/{len(chunks)} with {len(chunk['files'])} files")
             
             # Prepare chunk variables
-            chunk_variables = prepare_chunk_for_summary(chunk, extracted_data)
+            with STAGE_DURATION.time(stage="diff_formatting"):
+                chunk_variables = prepare_chunk_for_summary(chunk, extracted_data)
             
             try:
                 chunk_summary = await generate_summary_response(chunk_variables, llm_service)
@@ -121,19 +171,22 @@ class PRProcessor:
                 logger.info(f"Chunk summary usage: {summary_usage}")
                 model_info = chunk_summary.model_info or ""
                 chunk_summaries.append(chunk_summary)
-                
-                summary_info = extract_summary_info(chunk_summary.pr_summary)
-                logger.info(f"Summary info: {summary_info}")
-                total_time_estimation += summary_info.get("estimated_code_review_time", 0)
-                total_issue_count += summary_info.get("potential_issue_count", 0)
+                logger.info(f"Summary info: {chunk_summary.summary_metadata}")
                 total_input_tokens += summary_usage.get("input_tokens", 0)
                 total_output_tokens += summary_usage.get("output_tokens", 0)
                 logger.info(f"Successfully generated summary for chunk {chunk['chunk_index'] + 1}")
             except Exception as e:
+                record_error("summary", e)
                 logger.error(f"Failed to generate summary for chunk {chunk['chunk_index'] + 1}: {str(e)}")
                 # Continue with other chunks
                 continue
         
+        for chunk_summary in chunk_summaries:
+            chunk_info = chunk_summary.summary_metadata or extract_summary_info(chunk_summary.pr_summary)
+            total_time_estimation += chunk_info.get("estimated_code_review_time", 0)
+            total_issue_count += chunk_info.get("potential_issue_count", 0)
+            model_info = model_info or chunk_summary.model_info or ""
+        
         summary_info = {
             "estimated_code_review_time": total_time_estimation,
             "potential_issue_count": total_issue_count
@@ -146,19 +199,24 @@ class PRProcessor:
         if len(chunk_summaries) > 1:
             logger.info(f"Aggregating {len(chunk_summaries)} chunk summaries")
             try:
-                aggregated_summary, agg_usage, model_info = await aggregate_chunk_summaries(
-                    chunk_summaries, extracted_data, llm_service, summary_info
-                )
-                summary_info = extract_summary_info(aggregated_summary)
+                with STAGE_DURATION.time(stage="summary_aggregation"):
+                    aggregated_summary, agg_usage, agg_model_info = await aggregate_chunk_summaries(
+                        chunk_summaries, extracted_data, llm_service, summary_info
+                    )
+                model_info = agg_model_info or model_info
                 total_input_tokens += agg_usage.get("input_tokens", 0)
                 total_output_tokens += agg_usage.get("output_tokens", 0)
                 logger.info(f"Summary info: {summary_info}")
                 final_summary = aggregated_summary
                 logger.info("Successfully aggregated chunk summaries")
             except Exception as e:
+                record_error("summary_aggregation", e)
                 logger.error(f"Failed to aggregate summaries: {str(e)}")
                 # Fallback to first chunk summary
                 final_summary = chunk_summaries[0].pr_summary if chunk_summaries else ""
+        elif len(chunk_summaries) == 1 and reviewed_summaries:
+            # A review pass section has no title or effort line of its own
+            final_summary = self.metadata_service.structured_merge([chunk_summaries[0].pr_summary], summary_info)
         elif len(chunk_summaries) == 1:
             final_summary = chunk_summaries[0].pr_summary
         else:
@@ -176,7 +234,7 @@ class PRProcessor:
     
     async def _post_summary_to_backend(self, extracted_data: Dict, summary_result: Dict) -> None:
         """
-        Post summary to backend endpoint.
+        Post summary to backend endpoint through the callback outbox.
         
         Args:
             extracted_data: PR data
@@ -195,40 +253,62 @@ class PRProcessor:
         }
 
         try:
-            summary_post_start = time.time()
-            async with httpx.AsyncClient() as client:
-                response = await client.post(self.summary_endpoint, json=summary_payload)
-                summary_post_duration = time.time() - summary_post_start
-                
-                if response.status_code == 200:
-                    logger.info(f"Summary posted to backend successfully in {summary_post_duration:.2f}s")
-                else:
-                    # Truncate response for cleaner logs
-                    response_text = response.text[:200] + "..." if len(response.text) > 200 else response.text
-                    logger.error(f"Failed to post summary. Status: {response.status_code}, Response: {response_text}")
+            analysis_id = str(extracted_data["pullRequestAnalysisId"])
+            self.callback_outbox.enqueue(self.summary_endpoint, summary_payload, f"{analysis_id}:summary", analysis_id, "summary")
         except Exception as e:
-            logger.error(f"Exception while posting summary: {str(e)}")
+            logger.error(f"Exception while spooling summary: {str(e)}")
     
-    async def _process_review(self, extracted_data: Dict, llm_service: ClaudeService) -> None:
+    async def _process_review(self, extracted_data: Dict, llm_service: ClaudeService, with_summary: bool = False) -> None:
         """
         Process review generation with chunking strategy.
         
         Args:
             extracted_data: PR data
             llm_service: LLM service instance
+            with_summary: Whether review chunks also return their summary sections, which are
+                assembled and posted as the PR summary before the final review payload
         """
         if not extracted_data["prFiles"]:
+            # Every file was ignored, excluded by content or reduced away by diff analysis;
+            # the analysis is still completed, with its excluded files and the combined summary
             logger.warning("No prFiles found for review processing")
-            return
         
+        if not (self.incremental_review_enabled or self.comment_dedup_enabled):
+            await self._review_files(extracted_data, llm_service, with_summary)
+            return
+        # The stored fingerprints and comments are read and written by one analysis of a PR at a time
+        async with self.fingerprint_store.lock(extracted_data):
+            await self._review_files(extracted_data, llm_service, with_summary)
+    
+    async def _review_files(self, extracted_data: Dict, llm_service: ClaudeService, with_summary: bool) -> None:
+        """Review the files of a PR chunk by chunk and queue the comments"""
         logger.info("Starting review generation process with chunking strategy...")
 
+        # Skip files whose hunks and before-content match the last analysis of this PR
+        review_files = extracted_data["prFiles"]
+        unchanged_files: Dict[str, Dict] = {}
+        if self.incremental_review_enabled:
+            review_files, unchanged_files = self.fingerprint_store.partition_files(extracted_data)
+            if unchanged_files:
+                reused_comment_count = sum(len(entry.get("comments", [])) for entry in unchanged_files.values())
+                logger.info(f"Skipping {len(unchanged_files)} files unchanged since the last analysis ({reused_comment_count} previous comments kept)")
+        unchanged_file_names = list(unchanged_files)
+
+        # Collapse issues repeated across chunks and comments already posted by earlier analyses
+        deduplicator = None
+        if self.comment_dedup_enabled:
+            deduplicator = CommentDeduplicationService(
+                self.comment_dedup_similarity,
+                self.fingerprint_store.get_previous_comments(extracted_data)
+            )
+
         # Create chunks for review generation
-        review_chunks, ignored_review_files = create_review_chunks(
-            files=extracted_data["prFiles"],
-            max_chunk_tokens=100000,  # LLM limit for reviews
-            max_file_tokens=100000    # File size limit
-        )
+        with STAGE_DURATION.time(stage="chunking"):
+            review_chunks, ignored_review_files = create_review_chunks(
+                files=review_files,
+                max_chunk_tokens=100000,  # LLM limit for reviews
+                max_file_tokens=100000    # File size limit
+            ) if review_files else ([], [])
         
         if ignored_review_files:
             logger.warning(f"Ignored {len(ignored_review_files)} files for review due to size limits")
@@ -240,77 +320,143 @@ class PRProcessor:
         
         total_input_tokens = 0
         total_output_tokens = 0
+        reviewed_summaries: Optional[List[Tuple[List[str], PRSummaryResponse]]] = [] if with_summary else None
+        reviewed_comments: List[Dict] = []
+        reviewed_file_names = set()
+        failed_file_names = set()
+        # Comments of all chunks are posted in coalesced batches, the completed marker last
+        comment_sink = ReviewCommentSink(self.callback_outbox, self.review_endpoint, extracted_data["pullRequestAnalysisId"])
 
-        async with httpx.AsyncClient() as client:
-            for chunk_index, chunk in enumerate(review_chunks):
-                chunk_start_time = time.time()
-                logger.info(f"Processing review chunk {chunk_index + 1}/{total_chunks} with {len(chunk['files'])} files")
+        if not review_chunks:
+            # Nothing left to review, still close the analysis and report the untouched files
+            logger.info("No files need a review in this analysis")
+
+        for chunk_index, chunk in enumerate(review_chunks):
+            chunk_start_time = time.time()
+            logger.info(f"Processing review chunk {chunk_index + 1}/{total_chunks} with {len(chunk['files'])} files")
+            
+            try:
+                # Prepare chunk variables for review
+                with STAGE_DURATION.time(stage="diff_formatting"):
+                    chunk_variables = prepare_chunk_for_review(chunk, extracted_data, with_summary)
+                
+                logger.info(f"Generating review for chunk {chunk_index + 1} with LLM...")
+                llm_start_time = time.time()
+                review = await generate_chunked_review_response(chunk_variables, llm_service, with_summary)
+                review_usage = review.review_usage or {}
+                total_input_tokens += review_usage.get("input_tokens", 0)
+                total_output_tokens += review_usage.get("output_tokens", 0)
+                logger.info(f"Review usage for chunk {chunk_index + 1}: {review_usage}")
+                model_info = review.model_info or ""
+                llm_duration = time.time() - llm_start_time
+                logger.info(f"LLM review generated for chunk {chunk_index + 1} in {llm_duration:.2f}s")
+                if reviewed_summaries is not None and review.summary_section:
+                    section, metadata = self.metadata_service.from_review_section(review.summary_section)
+                    reviewed_summaries.append((
+                        [file_info.get("prFileName") for file_info in chunk["files"]],
+                        PRSummaryResponse(
+                            prNumber=str(extracted_data.get("prNumber", "0")),
+                            pr_line=1,
+                            pr_summary=section,
+                            summary_metadata=metadata.to_dict(),
+                            summary_usage={},
+                            model_info=model_info
+                        )
+                    ))
                 
-                try:
-                    # Prepare chunk variables for review
-                    chunk_variables = prepare_chunk_for_review(chunk, extracted_data)
-                    
-                    logger.info(f"Generating review for chunk {chunk_index + 1} with LLM...")
-                    llm_start_time = time.time()
-                    review = await generate_chunked_review_response(chunk_variables, llm_service)
-                    review_usage = review.review_usage or {}
-                    total_input_tokens += review_usage.get("input_tokens", 0)
-                    total_output_tokens += review_usage.get("output_tokens", 0)
-                    logger.info(f"Review usage for chunk {chunk_index + 1}: {review_usage}")
-                    model_info = review.model_info or ""
-                    llm_duration = time.time() - llm_start_time
-                    logger.info(f"LLM review generated for chunk {chunk_index + 1} in {llm_duration:.2f}s")
-                    
-                    logger.info(f"Parsing review response for chunk {chunk_index + 1}...")
-                    parse_start_time = time.time()
+                logger.info(f"Parsing review response for chunk {chunk_index + 1}...")
+                parse_start_time = time.time()
+                if review.review_items is not None:
+                    chunk_comments = build_chunked_review_comments(
+                        review.review_items,
+                        chunk["files"],
+                        minSeverity=extracted_data["minSeverity"]
+                    )
+                else:
                     chunk_comments = parse_chunked_review_response(
                         review.pr_review_and_suggestion, 
                         chunk["files"],
                         minSeverity=extracted_data["minSeverity"]
                     )
-                    parse_duration = time.time() - parse_start_time
-                    
-                    logger.info(f"Parsed {len(chunk_comments)} comments for chunk {chunk_index + 1} in {parse_duration:.2f}s")
-                    
-                    chunk_duration = time.time() - chunk_start_time
-                    logger.info(f"Completed processing review chunk {chunk_index + 1} in {chunk_duration:.2f}s")
+                if deduplicator:
+                    parsed_comment_count = len(chunk_comments)
+                    chunk_comments = deduplicator.add_comments(chunk_comments)
+                    if len(chunk_comments) != parsed_comment_count:
+                        logger.info(f"De-duplicated chunk {chunk_index + 1}: {parsed_comment_count} -> {len(chunk_comments)} comments")
+                parse_duration = time.time() - parse_start_time
+                STAGE_DURATION.observe(parse_duration, stage="review_parse")
+                
+                logger.info(f"Parsed {len(chunk_comments)} comments for chunk {chunk_index + 1} in {parse_duration:.2f}s")
+                
+                chunk_duration = time.time() - chunk_start_time
+                logger.info(f"Completed processing review chunk {chunk_index + 1} in {chunk_duration:.2f}s")
 
-                    review_usage = {
-                        "input_tokens": total_input_tokens,
-                        "output_tokens": total_output_tokens
-                    }
+                review_usage = {
+                    "input_tokens": total_input_tokens,
+                    "output_tokens": total_output_tokens
+                }
 
-                    logger.info(f"Total review usage: {review_usage}")
-                    logger.info(f"Total comments generated: {len(chunk_comments)}")
+                logger.info(f"Total review usage: {review_usage}")
+                logger.info(f"Total comments generated: {len(chunk_comments)}")
 
-                    model_information = {"model_name": model_info} if model_info else {}
-                    
-                    # Post this chunk's comments immediately
-                    review_payload = {
-                        "pullRequestAnalysisId": extracted_data["pullRequestAnalysisId"],
-                        "comments": chunk_comments,
-                        "modelInfo": model_information,
-                        "usageInfo": review_usage,
-                        "completed": 1 if chunk_index == total_chunks - 1 else 0
-                    }
+                model_information = {"model_name": model_info} if model_info else {}
+                
+                logger.info(f"Queueing {len(chunk_comments)} comments for chunk {chunk_index + 1}...")
+                comment_sink.add(chunk_comments, review_usage, model_information)
 
-                    logger.info(f"Posting {len(chunk_comments)} comments for chunk {chunk_index + 1} to backend...")
+                reviewed_comments.extend(chunk_comments)
+                reviewed_file_names.update(file_info.get("prFileName") for file_info in chunk["files"])
 
-                    try:
-                        post_start_time = time.time()
-                        response = await client.post(self.review_endpoint, json=review_payload)
-                        post_duration = time.time() - post_start_time
-                        
-                        if response.status_code == 200:
-                            logger.info(f"Review comments for chunk {chunk_index + 1} posted successfully in {post_duration:.2f}s")
-                        else:
-                            # Truncate response for cleaner logs
-                            response_text = response.text[:200] + "..." if len(response.text) > 200 else response.text
-                            logger.error(f"Failed to post review comments for chunk {chunk_index + 1}. Status: {response.status_code}, Response: {response_text}")
-                    
-                    except Exception as e:
-                        logger.error(f"Exception while posting review comments: {str(e)}")
+            except Exception as e:
+                record_error("review", e)
+                logger.error(f"Failed to process review chunk {chunk_index + 1}: {str(e)}")
+                failed_file_names.update(file_info.get("prFileName") for file_info in chunk["files"])
+                continue
+
+        if reviewed_summaries is not None:
+            # The summary goes out before the completed marker
+            await self._post_combined_summary(extracted_data, llm_service, reviewed_summaries)
+        comment_sink.complete(unchanged_file_names, extracted_data.get("excluded_files", []))
+
+        if deduplicator:
+            logger.info(
+                f"Comment de-duplication: {deduplicator.merged_count} merged at the same location, "
+                f"{deduplicator.collapsed_count} collapsed into occurrences, "
+                f"{len(deduplicator.suppressed_previous)} already posted by a previous analysis"
+            )
+            # Suppressed comments stay on record so the next analysis keeps suppressing them
+            reviewed_comments.extend(deduplicator.suppressed_previous)
+
+        if self.incremental_review_enabled:
+            # Files split across chunks only count as reviewed when every part succeeded
+            completed_files = [
+                file_info for file_info in review_files
+                if file_info.get("prFileName") in reviewed_file_names - failed_file_names
+            ]
+            self.fingerprint_store.record_review(extracted_data, completed_files, reviewed_comments, unchanged_files)
+
+    async def _post_combined_summary(
+        self,
+        extracted_data: Dict,
+        llm_service: ClaudeService,
+        reviewed_summaries: List[Tuple[List[str], PRSummaryResponse]]
+    ) -> None:
+        """
+        Assemble the PR summary from the review pass sections and post it.
+        Files the review pass did not summarize get a separate summary call.
         
-                except Exception as e:
-                    logger.error(f"Failed to process review chunk {chunk_index + 1}: {str(e)}")
-                    continue
\ No newline at end of file
+        Args:
+            extracted_data: PR data
+            llm_service: LLM service instance
+            reviewed_summaries: File names and summary section of each reviewed chunk
+        """
+        try:
+            summary_result = await self._process_summary(extracted_data, llm_service, reviewed_summaries)
+            logger.info(
+                f"Combined summary built from {len(reviewed_summaries)} review chunks, "
+                f"extra summary usage: {summary_result['usage']}"
+            )
+            await self._post_summary_to_backend(extracted_data, summary_result)
+        except Exception as e:
+            record_error("summary", e)
+            logger.error(f"Failed to build the combined summary: {str(e)}")
@@ -1,107 +1,179 @@
 import logging
-from typing import Tuple, Dict
+from typing import Tuple, Dict, List, Optional
 from app.models.pr_event import PRPayloadV2
 from app.utils.filter_files import filter_pr_files
-from app.utils.chunking_strategy import convert_hunks_to_unified_diff
+from app.services.blob_store import blob_store, MissingBlobsError
+from app.services.git_mirror import CLONE_URL_RE, SHA_RE
+from app.utils.parsed_diff import get_parsed_diff
+from app.utils.content_classifier import exclude_generated_files
+from app.utils.diff_analysis import analyze_pr_diffs
+from app.utils.chunking_strategy import estimate_file_tokens
+from config.settings import settings
+from app.utils.metrics import STAGE_DURATION
 from app.core.setup import setup_logger
 
 logger = setup_logger(__name__)
 
 
-def validate_and_extract_pr_data(payload: PRPayloadV2) -> Tuple[bool, str, Dict]:
+def validate_git_ingestion_payload(payload: PRPayloadV2) -> Tuple[bool, str]:
+    """
+    Validate a PR payload that names commits instead of sending files, before they are computed.
+    
+    Args:
+        payload: PR payload from the API request
+        
+    Returns:
+        Tuple of (is_valid, error_message)
+    """
+    pr = payload.pullRequest
+    missing_fields = [field for field in ["prNumber", "prTitle", "pullRequestAnalysisId"] if not getattr(pr, field)]
+    if missing_fields:
+        return False, f"Missing required fields: {', '.join(missing_fields)}"
+    if not settings.GIT_INGESTION_ENABLED:
+        return False, "Git ingestion is disabled, prFiles are required"
+    if not CLONE_URL_RE.match(pr.prRepoCloneUrl):
+        return False, "prRepoCloneUrl must be an https, ssh or user@host:path URL"
+    for field in ["prBaseSha", "prHeadSha"]:
+        if not SHA_RE.match(getattr(pr, field)):
+            return False, f"{field} is not a full commit SHA"
+    return True, ""
+
+
+def validate_and_extract_pr_data(payload: PRPayloadV2, computed_files: Optional[List[Dict]] = None) -> Tuple[bool, str, Dict]:
     """
     Validate PR payload and extract data in one go.
     
     Args:
         payload: PR payload from the API request
+        computed_files: Files computed by the agent from the repository, used instead of the payload's prFiles
         
     Returns:
         Tuple of (is_valid, error_message, extracted_data)
         - is_valid: Boolean indicating if validation passed
         - error_message: Error message if validation failed, empty string if successful
         - extracted_data: Dictionary containing extracted and processed PR data
+
+    Raises:
+        MissingBlobsError: If a file references a content that is no longer stored
     """
     try:
         pr = payload.pullRequest
-        if not pr:
-            return False, "No pullRequest data in payload", {}
         
-        # Check required fields
-        required_fields = ["prNumber", "prTitle"]
-        missing_fields = [field for field in required_fields if not pr.get(field)]
+        # Check required fields; callbacks are grouped and de-duplicated by the analysis id
+        required_fields = ["prNumber", "prTitle", "pullRequestAnalysisId"]
+        missing_fields = [field for field in required_fields if not getattr(pr, field)]
         if missing_fields:
             return False, f"Missing required fields: {', '.join(missing_fields)}", {}
         
         # Extract API key and model name (allow None/empty values)
-        api_key = pr.get("apiKey")
+        api_key = pr.apiKey
         if api_key is None or api_key.strip() == "":
             api_key = None
 
-        model_name = pr.get("modelName")
+        model_name = pr.modelName
         if model_name is None or model_name.strip() == "":
             model_name = None
 
         # Process files
-        pr_file_names = []
-        ignored_files = pr.get("ignore", [])
-        for file in pr.get("prFiles", []):
-            pr_file_names.append(file.get("prFileName"))
+        ignored_files = pr.ignore or []
+        if computed_files is None:
+            pr_file_names = [file.prFileName for file in pr.prFiles]
+        else:
+            pr_file_names = [file_info["prFileName"] for file_info in computed_files]
 
-        logger.info(f"Processing PR #{pr['prNumber']}: {len(pr_file_names)} files, {len(ignored_files)} ignored")
+        logger.info(f"Processing PR #{pr.prNumber}: {len(pr_file_names)} files, {len(ignored_files)} ignored")
         logger.info(f"Ignored files: {ignored_files}")
-        logger.info(f"PR file names: {pr_file_names}")
+        logger.debug(f"PR file names: {pr_file_names}")
 
         # Filter allowed files
-        pr_files_allowed = filter_pr_files(ignored_files, pr_file_names)
-        pr_files = []
-        for file in pr.get("prFiles", []):
-            if file.get("prFileName") in pr_files_allowed:
-                pr_files.append(file)
-
-        # Convert hunks to unified diff
-        for file in pr_files:
-            # Check if prFileDiffHunks exists and is not empty
-            if "prFileDiffHunks" not in file or not file.get("prFileDiffHunks"):
-                continue
-            file["prFileDiff"] = convert_hunks_to_unified_diff(
-                file["prFileDiffHunks"], 
-                file["prFileName"]
-            )
-
-        # Validate prFiles structure if present
-        if pr_files and not isinstance(pr_files, list):
-            return False, "prFiles must be a list", {}
+        with STAGE_DURATION.time(stage="filtering"):
+            pr_files_allowed = set(filter_pr_files(ignored_files, pr_file_names))
+        if computed_files is None:
+            # Contents referenced by hash are read from the blob store
+            pr_files = [blob_store.resolve_file(file.to_file_info()) for file in pr.prFiles if file.prFileName in pr_files_allowed]
+        else:
+            pr_files = [file_info for file_info in computed_files if file_info["prFileName"] in pr_files_allowed]
         
         # Check if files have required structure
         for i, file_info in enumerate(pr_files):
-            if not isinstance(file_info, dict):
-                return False, f"File {i} is not a valid object", {}
-            if "prFileName" not in file_info:
-                return False, f"File {i} missing prFileName", {}
             if "prFileDiff" not in file_info and "prFileDiffHunks" not in file_info:
                 return False, f"File {i} missing both prFileDiff and prFileDiffHunks", {}
         
         # Extract and normalize final data
         extracted_data = {
-            "provider": pr.get("provider", "unknown"),
-            "installation_id": pr.get("installationId", "0"),
-            "pullRequestAnalysisId": pr.get("pullRequestAnalysisId", "0"),
+            "provider": pr.provider or "unknown",
+            "installation_id": pr.installationId or "0",
+            "pullRequestAnalysisId": pr.pullRequestAnalysisId,
             "number_of_files": len(pr_files),
-            "prNumber": pr["prNumber"],
-            "prTitle": pr["prTitle"],
-            "prBody": pr.get("prBody", ""),
-            "author_name": pr.get("prUser", ""),
-            "repo_structure_summary": pr.get("prRepoName", ""),
+            "prNumber": pr.prNumber,
+            "prTitle": pr.prTitle,
+            "prBody": pr.prBody or "",
+            "author_name": pr.prUser or "",
+            "repo_structure_summary": pr.prRepoName or "",
             "prFiles": pr_files,
+            "excluded_files": [],
+            "diff_analysis": {},
             "api_key": api_key,
             "model_name": model_name,
-            "minSeverity": pr.get("minSeverity", "Major"),
-            "prFileDiffHunks": pr.get("prFileDiffHunks", [])
+            "minSeverity": pr.minSeverity or "Major",
+            "prFileDiffHunks": pr.prFileDiffHunks or []
         }
         
         logger.info(f"Validation successful: PR #{extracted_data['prNumber']}, {len(pr_files)} files")
         return True, "", extracted_data
         
+    except MissingBlobsError:
+        # Contents evicted since the request was checked; the backend must resend them inline
+        raise
     except Exception as e:
         logger.error(f"Validation failed: {str(e)}")
-        return False, f"Payload validation error: {str(e)}", {}
\ No newline at end of file
+        return False, f"Payload validation error: {str(e)}", {}
+
+
+def analyze_pr_files(extracted_data: Dict) -> None:
+    """
+    Parse the diffs of validated PR data, drop generated content and run diff analysis.
+    Runs after the request was answered; the work grows with the size of the PR.
+    
+    Args:
+        extracted_data: Data returned by validate_and_extract_pr_data(), updated in place
+    """
+    pr_files = extracted_data["prFiles"]
+    
+    # Parse every diff once; later stages read the shared parsed representation
+    total_additions = total_deletions = 0
+    for file in pr_files:
+        parsed_diff = get_parsed_diff(file)
+        if file.get("prFileDiffHunks"):
+            file["prFileDiff"] = parsed_diff.text
+        total_additions += parsed_diff.additions
+        total_deletions += parsed_diff.deletions
+    
+    # Drop generated, minified and vendored content before it reaches chunking
+    excluded_files = []
+    if settings.CONTENT_FILTER_ENABLED:
+        with STAGE_DURATION.time(stage="content_filter"):
+            pr_files, excluded_files = exclude_generated_files(pr_files)
+        for excluded in excluded_files:
+            logger.info(f"Excluding {excluded['fileName']} from review: {excluded['reason']}")
+    
+    # Replace whitespace-only changes, pure renames and moved code with one-line notes
+    diff_analysis = {}
+    if settings.DIFF_ANALYSIS_ENABLED:
+        with STAGE_DURATION.time(stage="diff_analysis"):
+            report = analyze_pr_diffs(pr_files, estimate_file_tokens)
+        diff_analysis = report.to_dict()
+        if report.notes:
+            logger.info(
+                f"Diff analysis: {report.whitespace_only_changes} whitespace-only changes, "
+                f"{report.rename_only_files} pure renames, {report.moved_blocks} moved blocks "
+                f"({report.moved_lines} lines), ~{report.tokens_saved} prompt tokens saved"
+            )
+    
+    extracted_data.update({
+        "prFiles": pr_files,
+        "number_of_files": len(pr_files),
+        "excluded_files": excluded_files,
+        "diff_analysis": diff_analysis
+    })
+    logger.info(f"Analyzed PR #{extracted_data['prNumber']}: {len(pr_files)} files, {len(excluded_files)} excluded by content, +{total_additions}/-{total_deletions} lines")
\ No newline at end of file
@@ -0,0 +1,166 @@
+"""
+Content codings of request and callback bodies.
+Compressed request bodies are decompressed piece by piece as they arrive, with a
+limit on the decompressed size; callback bodies to the backend are gzip-compressed
+once they are large enough to gain from it.
+"""
+
+import gzip
+import json
+import zlib
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:  # zstd request bodies are refused without it
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Most output produced from one decompression step, bounding what a small input can expand to
+DECOMPRESSED_PIECE_SIZE = 1 << 16
+CALLBACK_GZIP_LEVEL = 6
+
+
+class UnsupportedContentEncodingError(ValueError):
+    """Request body uses a content coding the agent cannot decode"""
+
+
+class PayloadTooLargeError(ValueError):
+    """Decompressed request body is larger than the configured limit"""
+
+
+class _BoundedSink:
+    """Collects decompressed pieces and stops decoding once the size limit is passed"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.pieces: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self.size += len(data)
+        if self.max_bytes and self.size > self.max_bytes:
+            raise PayloadTooLargeError(f"Decompressed request body exceeds {self.max_bytes} bytes")
+        if data:
+            self.pieces.append(bytes(data))
+        return len(data)
+
+    def close(self) -> None:
+        pass
+
+    def take(self) -> List[bytes]:
+        pieces, self.pieces = self.pieces, []
+        return pieces
+
+
+class _ZlibDecoder:
+    """gzip or deflate decoder writing bounded pieces to the next stage"""
+
+    def __init__(self, coding: str, target):
+        self.coding = coding
+        self.target = target
+        self._wbits = 16 + zlib.MAX_WBITS if coding == "gzip" else zlib.MAX_WBITS
+        self._decompressor = zlib.decompressobj(self._wbits)
+
+    def write(self, data: bytes) -> None:
+        try:
+            while True:
+                piece = self._decompressor.decompress(data, DECOMPRESSED_PIECE_SIZE)
+                self.target.write(piece)
+                data = self._decompressor.unconsumed_tail
+                if self._decompressor.eof and self._decompressor.unused_data:
+                    # Concatenated gzip members
+                    data = self._decompressor.unused_data
+                    self._decompressor = zlib.decompressobj(self._wbits)
+                elif not data and len(piece) < DECOMPRESSED_PIECE_SIZE:
+                    return
+        except zlib.error as e:
+            raise ValueError(f"Corrupt {self.coding} request body: {str(e)}")
+
+    def close(self) -> None:
+        self.target.write(self._decompressor.flush())
+        if not self._decompressor.eof:
+            raise ValueError(f"Request body ended inside the {self.coding} stream")
+        self.target.close()
+
+
+class _ZstdDecoder:
+    """zstd decoder; the writer hands output to the next stage in pieces of DECOMPRESSED_PIECE_SIZE"""
+
+    def __init__(self, target):
+        self.target = target
+        self._writer = zstandard.ZstdDecompressor().stream_writer(
+            target, write_size=DECOMPRESSED_PIECE_SIZE, closefd=False
+        )
+
+    def write(self, data: bytes) -> None:
+        try:
+            self._writer.write(data)
+        except zstandard.ZstdError as e:
+            raise ValueError(f"Corrupt zstd request body: {str(e)}")
+
+    def close(self) -> None:
+        self._writer.flush()
+        self.target.close()
+
+
+def _create_decoder(coding: str, target):
+    """Decoder undoing one content coding before the target stage"""
+    if coding in ("gzip", "x-gzip"):
+        return _ZlibDecoder("gzip", target)
+    if coding == "deflate":
+        return _ZlibDecoder("deflate", target)
+    if coding == "zstd" and zstandard is not None:
+        return _ZstdDecoder(target)
+    raise UnsupportedContentEncodingError(f"Unsupported Content-Encoding: {coding}")
+
+
+async def decompress_body_stream(body_stream, content_encoding: Optional[str], max_bytes: int) -> AsyncIterator[bytes]:
+    """
+    Undo the content codings of a request body while it arrives.
+
+    Args:
+        body_stream: Async iterator of body chunks, such as Request.stream()
+        content_encoding: Value of the Content-Encoding header, codings in the order they were applied
+        max_bytes: Largest decompressed body accepted, 0 for no limit
+
+    Returns:
+        Async iterator of decompressed body chunks
+    """
+    codings = [coding.strip().lower() for coding in (content_encoding or "").split(",")]
+    sink = _BoundedSink(max_bytes)
+    decoder = sink
+    # The first coding applied is undone last, so it sits next to the sink
+    for coding in codings:
+        if coding and coding != "identity":
+            decoder = _create_decoder(coding, decoder)
+
+    async for chunk in body_stream:
+        decoder.write(chunk)
+        for piece in sink.take():
+            yield piece
+    decoder.close()
+    for piece in sink.take():
+        yield piece
+
+
+def encode_json_body(payload: Any, compression: str = "gzip", min_bytes: int = 1024) -> Tuple[bytes, Dict[str, str]]:
+    """
+    Serialize a callback payload, compressing it when it is large enough.
+
+    Args:
+        payload: JSON-serializable payload
+        compression: "gzip" to compress bodies of at least min_bytes, "none" to send them as they are
+        min_bytes: Smallest serialized body worth compressing
+
+    Returns:
+        Tuple of (request body, request headers)
+    """
+    body = json.dumps(payload, ensure_ascii=False, separators=(",", ":"), allow_nan=False).encode("utf-8")
+    headers = {"Content-Type": "application/json"}
+    if compression == "gzip" and len(body) >= min_bytes:
+        body = gzip.compress(body, compresslevel=CALLBACK_GZIP_LEVEL, mtime=0)
+        headers["Content-Encoding"] = "gzip"
+    return body, headers
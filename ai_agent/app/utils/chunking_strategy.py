@@ -1,6 +1,11 @@
 from typing import List, Dict, Tuple, Any, Optional
 from dataclasses import dataclass
 from app.core.setup import setup_logger
+from app.utils.context_extractor import ContextExtractionService
+from app.utils.diff_formatter import format_parsed_diff
+from app.utils.parsed_diff import DiffHunk, get_parsed_diff, build_parsed_diff
+from app.utils.prompt_manager import PromptManager
+from config.settings import settings
 
 logger = setup_logger(__name__)
 
@@ -46,35 +51,52 @@ class ChunkingService:
             logger.error(f"Error sorting files: {str(e)}")
             return files  # Return unsorted if sorting fails
     
-    def estimate_file_tokens(self, file_info: Dict[str, Any]) -> int:
+    def estimate_file_tokens(self, file_info: Dict[str, Any], chunk_type: str = "review") -> int:
         """
-        Estimate total tokens for a file including diff and content.
+        Estimate the tokens a file adds to a prompt of the given chunk type.
+        
+        Summary prompts only carry the raw diff, while review prompts carry the
+        formatted diff plus the (possibly trimmed) before-change content, so each
+        chunk type is measured on what its prompt builder actually renders.
         
         Args:
             file_info: File information dictionary
+            chunk_type: Type of chunk ('summary' or 'review')
             
         Returns:
             Estimated token count
         """
         try:
-            file_diff = file_info.get("prFileDiff", "")
-            pr_file_content_before = file_info.get("prFileContentBefore", "")
-            
-            # Simple character-based token estimation (1 token ≈ 4 characters)
-            diff_tokens = len(file_diff) // 4
-            content_tokens = len(pr_file_content_before) // 4
-            
+            diff_tokens, content_tokens = self._measure_file_sections(file_info, chunk_type)
             return diff_tokens + content_tokens
         except Exception as e:
             logger.error(f"Error estimating tokens for file {file_info.get('prFileName', 'unknown')}: {str(e)}")
             return 0
     
-    def is_file_oversized(self, file_info: Dict[str, Any]) -> Tuple[bool, Optional[IgnoredFile]]:
+    def _measure_file_sections(self, file_info: Dict[str, Any], chunk_type: str) -> Tuple[int, int]:
+        """
+        Measure the rendered diff and before-content sections of a file.
+        
+        Returns:
+            Tuple of (diff_tokens, content_tokens)
+        """
+        # Simple character-based token estimation (1 token ≈ 4 characters)
+        if chunk_type == "summary":
+            return len(ChunkPreparationService.render_summary_diff(file_info)) // 4, 0
+        
+        diff_tokens = len(ChunkPreparationService.render_review_diff(file_info)) // 4
+        content_tokens = 0
+        if file_info.get("prFileContentBefore"):
+            content_tokens = len(ChunkPreparationService.render_content_before(file_info)) // 4
+        return diff_tokens, content_tokens
+    
+    def is_file_oversized(self, file_info: Dict[str, Any], chunk_type: str = "review") -> Tuple[bool, Optional[IgnoredFile]]:
         """
         Check if a file exceeds the maximum file token limit.
         
         Args:
             file_info: File information dictionary
+            chunk_type: Type of chunk ('summary' or 'review')
             
         Returns:
             Tuple of (is_oversized, ignored_file_info)
@@ -82,15 +104,10 @@ class ChunkingService:
         file_name = file_info.get("prFileName", "unknown")
         
         try:
-            file_diff = file_info.get("prFileDiff", "")
-            pr_file_content_before = file_info.get("prFileContentBefore", "")
-            
-            # Check if file is too large using simple character-based estimation
-            diff_tokens = len(file_diff) // 4
-            content_tokens = len(pr_file_content_before) // 4
+            diff_tokens, content_tokens = self._measure_file_sections(file_info, chunk_type)
             
             if diff_tokens > self.max_file_tokens or content_tokens > self.max_file_tokens:
-                token_count = self.estimate_file_tokens(file_info)
+                token_count = diff_tokens + content_tokens
                 ignored_file = IgnoredFile(
                     file_name=file_name,
                     reason=f"File exceeds {self.max_file_tokens} token limit",
@@ -110,6 +127,179 @@ class ChunkingService:
             )
             return True, ignored_file
     
+    def get_prompt_overhead_tokens(self, chunk_type: str) -> int:
+        """
+        Estimate the tokens taken by the prompt template itself.
+        
+        Args:
+            chunk_type: Type of chunk ('summary' or 'review'), matching a prompt name
+            
+        Returns:
+            Estimated template token count, 0 if the template cannot be loaded
+        """
+        try:
+            return len(PromptManager.get_prompt_template(chunk_type)) // 4
+        except Exception as e:
+            logger.warning(f"Could not measure {chunk_type} prompt overhead: {str(e)}")
+            return 0
+    
+    def split_hunk(self, hunk: DiffHunk, max_tokens: int) -> List[DiffHunk]:
+        """
+        Split a single hunk into smaller hunks at line boundaries.
+        Each piece gets a recomputed header so original line numbers are preserved.
+        
+        Args:
+            hunk: Parsed diff hunk
+            max_tokens: Maximum tokens per piece
+            
+        Returns:
+            List of hunks, the original hunk if it cannot be split
+        """
+        if len(hunk.text) // 4 <= max_tokens or not hunk.is_valid:
+            return [hunk]
+        
+        old_line = hunk.old_start
+        new_line = hunk.new_start
+        max_chars = max_tokens * 4
+        
+        pieces = []
+        body: List[str] = []
+        body_chars = 0
+        piece_old_start, piece_new_start = old_line, new_line
+        old_count = new_count = 0
+        
+        for line in hunk.lines:
+            if not line:
+                continue
+            
+            if body and body_chars + len(line) + 1 > max_chars:
+                pieces.append(self._make_piece(body, piece_old_start, old_count, piece_new_start, new_count))
+                body, body_chars = [], 0
+                piece_old_start, piece_new_start = old_line, new_line
+                old_count = new_count = 0
+            
+            body.append(line)
+            body_chars += len(line) + 1
+            
+            if line.startswith(' '):
+                old_line += 1
+                new_line += 1
+                old_count += 1
+                new_count += 1
+            elif line.startswith('-'):
+                old_line += 1
+                old_count += 1
+            elif line.startswith('+'):
+                new_line += 1
+                new_count += 1
+        
+        if body:
+            pieces.append(self._make_piece(body, piece_old_start, old_count, piece_new_start, new_count))
+        
+        return pieces
+    
+    @staticmethod
+    def _make_piece(body: List[str], old_start: int, old_count: int, new_start: int, new_count: int) -> DiffHunk:
+        """Build a hunk piece with a header matching its own line ranges"""
+        return DiffHunk(
+            f"@@ -{old_start},{old_count} +{new_start},{new_count} @@",
+            body,
+            old_start=old_start,
+            old_count=old_count,
+            new_start=new_start,
+            new_count=new_count
+        )
+    
+    def split_oversized_file(self, file_info: Dict[str, Any], chunk_type: str = "review") -> Tuple[List[Dict[str, Any]], List[IgnoredFile]]:
+        """
+        Split an oversized file into parts along hunk boundaries.
+        
+        Every part keeps the original prFileName and hunk headers, so comments produced
+        for a part anchor to the same lines as they would for the whole file. The original
+        content is shared by reference and trimmed to a local window around each part's hunks.
+        Pieces are measured with the same estimate create_chunks packs parts by.
+        
+        Args:
+            file_info: File information dictionary
+            chunk_type: Type of chunk ('summary' or 'review') the parts are sized for
+            
+        Returns:
+            Tuple of (parts, ignored_files)
+        """
+        file_name = file_info.get("prFileName", "unknown")
+        
+        try:
+            hunks = get_parsed_diff(file_info).hunks
+            if not hunks:
+                return [], [IgnoredFile(
+                    file_name=file_name,
+                    reason=f"File exceeds {self.max_file_tokens} token limit and has no hunks to split"
+                )]
+            
+            # Leave room for the context excerpt next to each piece of diff
+            hunk_budget = max(self.max_file_tokens // 2, 1)
+            pieces = []
+            for hunk in hunks:
+                # Splitting can leave a piece of context lines only, which has nothing to review
+                pieces.extend(
+                    piece for piece in self.split_hunk(hunk, hunk_budget)
+                    if any(line.startswith(('+', '-')) for line in piece.lines)
+                )
+            
+            groups: List[List[DiffHunk]] = []
+            ignored_files = []
+            current_group: List[DiffHunk] = []
+            current_tokens = 0
+            
+            for piece in pieces:
+                # A part's estimate is at most the sum of its pieces', whose context excerpts may overlap
+                piece_tokens = self.estimate_file_tokens(self._make_part(file_info, [piece], 0, 1), chunk_type)
+                
+                if piece_tokens > self.max_file_tokens:
+                    # A single line larger than the budget cannot be split any further
+                    ignored_files.append(IgnoredFile(
+                        file_name=file_name,
+                        reason=f"Hunk '{piece.header}' exceeds {self.max_file_tokens} token limit",
+                        token_count=piece_tokens
+                    ))
+                    continue
+                
+                if current_group and current_tokens + piece_tokens > self.max_file_tokens:
+                    groups.append(current_group)
+                    current_group, current_tokens = [], 0
+                
+                current_group.append(piece)
+                current_tokens += piece_tokens
+            
+            if current_group:
+                groups.append(current_group)
+            
+            parts = [self._make_part(file_info, group, part_index, len(groups)) for part_index, group in enumerate(groups)]
+            
+            logger.info(f"Split oversized file {file_name} into {len(parts)} parts from {len(pieces)} hunks")
+            return parts, ignored_files
+            
+        except Exception as e:
+            logger.error(f"Error splitting oversized file {file_name}: {str(e)}")
+            return [], [IgnoredFile(
+                file_name=file_name,
+                reason=f"Error splitting oversized file: {str(e)}"
+            )]
+    
+    @staticmethod
+    def _make_part(file_info: Dict[str, Any], hunks: List[DiffHunk], part_index: int, total: int) -> Dict[str, Any]:
+        """Build the file dictionary of one part of a split file"""
+        part = dict(file_info)
+        part.pop("renderedSections", None)
+        part["parsedDiff"] = build_parsed_diff(file_info.get("prFileName", "unknown"), hunks)
+        part["prFileDiffHunks"] = part["parsedDiff"].hunk_texts
+        part["prFileDiff"] = part["parsedDiff"].text
+        part["prFilePart"] = {"index": part_index + 1, "total": total}
+        if part_index > 0:
+            # Diff analysis notes describe the whole file; the first part carries them
+            part.pop("prFileNotes", None)
+        return part
+    
     def create_chunks(self, files: List[Dict[str, Any]], chunk_type: str = "review") -> Tuple[List[ChunkInfo], List[IgnoredFile]]:
         """
         Create chunks of files based on token limits.
@@ -127,6 +317,9 @@ class ChunkingService:
         
         logger.info(f"Starting {chunk_type} chunking for {len(files)} files")
         
+        # The prompt template shares the context window with the files
+        chunk_token_budget = self.max_chunk_tokens - self.get_prompt_overhead_tokens(chunk_type)
+        
         # Sort files by path for better context grouping
         sorted_files = self.sort_files_by_path(files)
         
@@ -135,20 +328,32 @@ class ChunkingService:
         current_chunk_tokens = 0
         ignored_files = []
         
+        # Oversized files are replaced by their hunk-level parts, kept next to each other
+        chunk_candidates = []
         for file_info in sorted_files:
-            file_name = file_info.get("prFileName", "unknown")
-            
-            # Check if file is oversized
-            is_oversized, ignored_file = self.is_file_oversized(file_info)
-            if is_oversized:
-                ignored_files.append(ignored_file)
+            is_oversized, _ = self.is_file_oversized(file_info, chunk_type)
+            if not is_oversized:
+                chunk_candidates.append(file_info)
                 continue
             
-            file_tokens = self.estimate_file_tokens(file_info)
+            parts, ignored_parts = self.split_oversized_file(file_info, chunk_type)
+            chunk_candidates.extend(parts)
+            ignored_files.extend(ignored_parts)
+        
+        for file_info in chunk_candidates:
+            file_name = file_info.get("prFileName", "unknown")
+            
+            file_tokens = self.estimate_file_tokens(file_info, chunk_type)
             logger.debug(f"Processing file {file_name} with {file_tokens} tokens")
             
+            # Parts of a split file go to separate chunks, otherwise the chunk holds the oversized file again
+            is_sibling_part = bool(file_info.get("prFilePart")) and any(
+                chunk_file.get("prFilePart") and chunk_file.get("prFileName") == file_name
+                for chunk_file in current_chunk_files
+            )
+            
             # Check if adding this file would exceed chunk limit
-            if current_chunk_tokens + file_tokens > self.max_chunk_tokens:
+            if is_sibling_part or current_chunk_tokens + file_tokens > chunk_token_budget:
                 # Current chunk is full, save it and start a new one
                 if current_chunk_files:
                     chunk = ChunkInfo(
@@ -182,11 +387,13 @@ class ChunkingService:
             logger.info(f"Created final {chunk_type} chunk {len(chunks)} with {len(current_chunk_files)} files, {current_chunk_tokens} tokens")
         
         # Log summary
-        total_files_processed = sum(len(chunk.files) for chunk in chunks)
+        total_files_processed = len({file_info.get("prFileName") for chunk in chunks for file_info in chunk.files})
         total_files_ignored = len(ignored_files)
+        total_additions = sum(get_parsed_diff(file_info).additions for chunk in chunks for file_info in chunk.files)
+        total_deletions = sum(get_parsed_diff(file_info).deletions for chunk in chunks for file_info in chunk.files)
         
         logger.info(f"{chunk_type.title()} chunking complete: {len(chunks)} chunks created")
-        logger.info(f"Files processed: {total_files_processed}, Files ignored: {total_files_ignored}")
+        logger.info(f"Files processed: {total_files_processed}, Files ignored: {total_files_ignored}, Lines changed: +{total_additions}/-{total_deletions}")
         
         if ignored_files:
             ignored_names = [f.file_name for f in ignored_files]
@@ -242,6 +449,11 @@ def sort_files_by_path(files: List[Dict]) -> List[Dict]:
     return _chunking_service.sort_files_by_path(files)
 
 
+def estimate_file_tokens(file_info: Dict, chunk_type: str = "review") -> int:
+    """Estimate the tokens a file adds to a prompt of the given chunk type"""
+    return _chunking_service.estimate_file_tokens(file_info, chunk_type)
+
+
 def create_chunks_for_review(files: List[Dict], max_chunk_tokens: int = 150000, max_file_tokens: int = 100000) -> Tuple[List[Dict], List[Dict]]:
     """
     Legacy function - Create chunks for review generation.
@@ -296,6 +508,16 @@ def create_review_chunks(files: List[Dict], max_chunk_tokens: int = 150000, max_
     return create_chunks_for_review(files, max_chunk_tokens, max_file_tokens)
 
 
+# How each diff render profile marks lines, explained once per review prompt
+DIFF_LEGENDS = {
+    "standard": "Each diff line shows its line number, then `+` (added), `-` (deleted, original line number) or blank (unchanged).",
+    "compact": (
+        "Each diff line is `<line number><marker> <code>`: `+` added and blank unchanged use the new line number, "
+        "`-` deleted uses the original line number. `... (lines a-b unchanged)` marks skipped unchanged lines."
+    ),
+}
+
+
 class ChunkPreparationService:
     """Service for preparing chunks with metadata for LLM processing"""
     
@@ -317,9 +539,9 @@ class ChunkPreparationService:
             
             for file_info in chunk["files"]:
                 file_name = file_info.get("prFileName", "unknown")
-                changed_files.append(file_name)
-                file_diff = file_info.get("prFileDiff", "")
-                pr_diff += f"\n\n--- File: {file_name} ---\n{file_diff}"
+                if file_name not in changed_files:
+                    changed_files.append(file_name)
+                pr_diff += ChunkPreparationService.render_summary_diff(file_info)
             
             # Create severity list based on minSeverity
             severity_list = ["Info", "Minor", "Major", "Critical", "Blocker"]
@@ -353,13 +575,150 @@ class ChunkPreparationService:
             raise
     
     @staticmethod
-    def prepare_chunk_for_review(chunk: Dict[str, Any], pr_metadata: Dict[str, Any]) -> Dict[str, Any]:
+    def get_rendered_section(file_info: Dict[str, Any], section: str, render) -> str:
+        """
+        Render a prompt section of a file once and reuse it for token estimates and prompts.
+        
+        The rendered sections are kept under "renderedSections" next to "parsedDiff" and
+        are rendered again once diff analysis replaces the parsed diff or adds notes.
+        
+        Args:
+            file_info: File information dictionary
+            section: Name of the section
+            render: Function rendering the section from the file information
+        
+        Returns:
+            Rendered section
+        """
+        parsed_diff = get_parsed_diff(file_info)
+        notes_count = len(file_info.get("prFileNotes") or [])
+        cache = file_info.get("renderedSections")
+        if cache is None or cache["parsedDiff"] is not parsed_diff or cache["notesCount"] != notes_count:
+            cache = file_info["renderedSections"] = {"parsedDiff": parsed_diff, "notesCount": notes_count}
+        if section not in cache:
+            cache[section] = render(file_info)
+        return cache[section]
+    
+    @staticmethod
+    def render_summary_diff(file_info: Dict[str, Any]) -> str:
+        """
+        Render the diff section of a file for the summary prompt.
+        
+        Args:
+            file_info: File information dictionary
+        
+        Returns:
+            Prompt section for the file
+        """
+        return ChunkPreparationService.get_rendered_section(file_info, "summaryDiff", ChunkPreparationService._render_summary_diff)
+    
+    @staticmethod
+    def _render_summary_diff(file_info: Dict[str, Any]) -> str:
+        file_name = file_info.get("prFileName", "unknown")
+        notes = ChunkPreparationService.render_file_notes(file_info)
+        return f"\n\n--- File: {file_name} ---\n{notes}{get_parsed_diff(file_info).text}"
+    
+    @staticmethod
+    def render_review_diff(file_info: Dict[str, Any]) -> str:
+        """
+        Render the LLM-formatted diff section of a file for the review prompt.
+        
+        Args:
+            file_info: File information dictionary
+        
+        Returns:
+            Prompt section for the file
+        """
+        return ChunkPreparationService.get_rendered_section(file_info, "reviewDiff", ChunkPreparationService._render_review_diff)
+    
+    @staticmethod
+    def _render_review_diff(file_info: Dict[str, Any]) -> str:
+        file_name = file_info.get("prFileName", "unknown")
+        notes = ChunkPreparationService.render_file_notes(file_info)
+        parsed_diff = get_parsed_diff(file_info)
+        if notes and not parsed_diff.hunks:
+            # Everything in the file was replaced by notes during diff analysis
+            return f"\n\n--- File: {file_name} ---\n{notes}"
+        try:
+            pr_diff_processed = format_parsed_diff(parsed_diff, settings.DIFF_RENDER_PROFILE)
+        except Exception as e:
+            logger.warning(f"Error formatting diff for {file_name}: {str(e)}, using raw diff")
+            pr_diff_processed = file_info.get('prFileDiff', '')
+        return f"\n\n--- File: {file_name} ---\n{notes}{pr_diff_processed}"
+    
+    @staticmethod
+    def render_file_notes(file_info: Dict[str, Any]) -> str:
+        """
+        Render the notes left by diff analysis for content removed from a file's diff.
+        
+        Args:
+            file_info: File information dictionary
+        
+        Returns:
+            One "Note:" line per note, empty string if the file has none
+        """
+        return "".join(f"Note: {note}\n" for note in file_info.get("prFileNotes", []))
+    
+    @staticmethod
+    def render_content_before(file_info: Dict[str, Any]) -> str:
+        """
+        Render the before-change content of a file for the review prompt.
+        
+        In "window" context mode only the lines around each hunk are kept, with their
+        original line numbers and elision markers. "symbols" mode also keeps the enclosing
+        functions/classes and the definitions referenced by changed lines, within
+        REVIEW_CONTEXT_TOKEN_BUDGET. Parts of an oversized file are always trimmed.
+        
+        Args:
+            file_info: File information dictionary
+        
+        Returns:
+            Prompt section for the file, empty string if there is nothing to include
+        """
+        return ChunkPreparationService.get_rendered_section(file_info, "contentBefore", ChunkPreparationService._render_content_before)
+    
+    @staticmethod
+    def _render_content_before(file_info: Dict[str, Any]) -> str:
+        file_name = file_info.get("prFileName", "unknown")
+        content_before = file_info.get("prFileContentBefore", "")
+        part = file_info.get("prFilePart")
+        
+        if not part and settings.REVIEW_CONTEXT_MODE == "full":
+            return f"\n\n--- File: {file_name} (Before Changes) ---\n{content_before}"
+        
+        hunks = get_parsed_diff(file_info).hunks
+        if settings.REVIEW_CONTEXT_MODE == "symbols":
+            excerpt = _review_context_extractor.extract_symbol_context(
+                file_name, content_before, hunks, settings.REVIEW_CONTEXT_TOKEN_BUDGET
+            )
+        else:
+            excerpt = _review_context_extractor.extract_context(content_before, hunks)
+        if not excerpt:
+            return ""
+        
+        part_label = f"part {part['index']} of {part['total']}, " if part else ""
+        return f"\n\n--- File: {file_name} (Before Changes, {part_label}excerpt with original line numbers) ---\n{excerpt}"
+    
+    @staticmethod
+    def get_response_format() -> str:
+        """
+        Get the response format section of the review prompt for REVIEW_OUTPUT_SCHEMA.
+        
+        Returns:
+            Format description and example response
+        """
+        formats = PromptManager.get_prompt_template("review_response_formats")
+        return formats.get(settings.REVIEW_OUTPUT_SCHEMA, formats["standard"])
+    
+    @staticmethod
+    def prepare_chunk_for_review(chunk: Dict[str, Any], pr_metadata: Dict[str, Any], with_summary: bool = False) -> Dict[str, Any]:
         """
         Prepare a chunk for review generation by creating the necessary variables.
         
         Args:
             chunk: Chunk containing files and metadata
             pr_metadata: PR metadata (title, body, etc.)
+            with_summary: Whether the review also returns the chunk's summary section
         
         Returns:
             Variables ready for review generation
@@ -371,26 +730,15 @@ class ChunkPreparationService:
             
             for file_info in chunk["files"]:
                 file_name = file_info.get("prFileName", "unknown")
-                changed_files.append(file_name)
+                if file_name not in changed_files:
+                    changed_files.append(file_name)
                 
                 # Format diff for LLM
-                try:
-                    from .diff_formatter import format_diff_for_llm, format_diff_for_llm_raw_diff
-                    pr_diff_hunks = file_info.get("prFileDiffHunks", [])
-                    if pr_diff_hunks==[]:
-                        logger.info(f"No diff hunks found for {file_name}, using raw diff")
-                        pr_diff_processed = format_diff_for_llm_raw_diff(file_info.get('prFileDiff', ''), file_name)
-                        pr_diff_chunk += f"\n\n--- File: {file_name} ---\n{pr_diff_processed}"
-                    else:
-                        pr_diff_processed = format_diff_for_llm(pr_diff_hunks, file_name)
-                        pr_diff_chunk += f"\n\n--- File: {file_name} ---\n{pr_diff_processed}"
-                except Exception as e:
-                    logger.warning(f"Error formatting diff for {file_name}: {str(e)}, using raw diff")
-                    pr_diff_chunk += f"\n\n--- File: {file_name} ---\n{file_info.get('prFileDiff', '')}"
+                pr_diff_chunk += ChunkPreparationService.render_review_diff(file_info)
                 
                 # Collect file content before changes if available
                 if file_info.get("prFileContentBefore"):
-                    pr_file_content_before += f"\n\n--- File: {file_name} (Before Changes) ---\n{file_info['prFileContentBefore']}"
+                    pr_file_content_before += ChunkPreparationService.render_content_before(file_info)
 
             # Create severity list based on minSeverity
             severity_list = ["Info", "Minor", "Major", "Critical", "Blocker"]
@@ -411,6 +759,9 @@ class ChunkPreparationService:
                 "repo_structure_summary": pr_metadata.get("repo_structure_summary", ""),
                 "prFileContentBefore": pr_file_content_before,
                 "pr_diff": pr_diff_chunk,
+                "diff_legend": DIFF_LEGENDS.get(settings.DIFF_RENDER_PROFILE, DIFF_LEGENDS["standard"]),
+                "response_format": ChunkPreparationService.get_response_format(),
+                "summary_request": PromptManager.get_prompt_template("review_summary_request") if with_summary else "",
                 "severity_list": str(filtered_severity_list),
                 "chunk_info": {
                     "index": chunk.get('chunk_index', 0) + 1,
@@ -425,6 +776,7 @@ class ChunkPreparationService:
 
 # Global service instances
 _chunk_preparation_service = ChunkPreparationService()
+_review_context_extractor = ContextExtractionService(window_lines=settings.REVIEW_CONTEXT_WINDOW_LINES)
 
 
 # Legacy functions for backward compatibility
@@ -433,9 +785,9 @@ def prepare_chunk_for_summary(chunk: Dict, pr_metadata: Dict) -> Dict:
     return _chunk_preparation_service.prepare_chunk_for_summary(chunk, pr_metadata)
 
 
-def prepare_chunk_for_review(chunk: Dict, pr_metadata: Dict) -> Dict:
+def prepare_chunk_for_review(chunk: Dict, pr_metadata: Dict, with_summary: bool = False) -> Dict:
     """Legacy function - use ChunkPreparationService.prepare_chunk_for_review() for new code"""
-    return _chunk_preparation_service.prepare_chunk_for_review(chunk, pr_metadata)
+    return _chunk_preparation_service.prepare_chunk_for_review(chunk, pr_metadata, with_summary)
 
 
 def convert_hunks_to_unified_diff(hunks: List[str], file_name: str) -> str:
@@ -0,0 +1,240 @@
+"""
+De-duplication of review comments across chunks and across analyses of a PR.
+Comments are compared on normalized issue text, exactly through a fingerprint
+and approximately through MinHash signatures bucketed with LSH.
+"""
+
+import re
+import random
+import hashlib
+import logging
+from typing import List, Dict, Any, Optional, Tuple
+from dataclasses import dataclass, field
+from app.api.review_parser import SeverityManager
+
+logger = logging.getLogger(__name__)
+
+ISSUE_RE = re.compile(r"\*\*Issue\*\*:\s*(.*?)(?:\n\n\*\*Suggestion\*\*:|$)", re.DOTALL)
+QUOTED_RE = re.compile(r"`[^`\n]*`|'[^'\n]*'|\"[^\"\n]*\"")
+NUMBER_RE = re.compile(r"\b\d+\b")
+WORD_RE = re.compile(r"[a-z_][a-z0-9_]*|<q>|<n>")
+
+MERSENNE_PRIME = (1 << 61) - 1
+
+
+@dataclass
+class IndexedComment:
+    """A comment kept by the index with its fingerprint and MinHash signature"""
+    comment: Dict[str, Any]
+    fingerprint: str
+    signature: Tuple[int, ...]
+    words: frozenset
+    occurrences: List[Dict[str, Any]] = field(default_factory=list)
+    previous: bool = False
+
+
+class CommentDeduplicationService:
+    """
+    Per-PR index of review comments that collapses repeated issues.
+    Comments at different locations are compared on MinHash signatures of word pairs,
+    comments on the same lines on the Jaccard similarity of their word sets.
+
+    Scopes:
+    - Same file with overlapping lines: near-duplicates are merged into the more severe comment.
+    - Same PR, other locations: near-duplicates are collapsed into one comment listing its occurrences.
+    - Previous analysis: comments matching one already posted for the same file are suppressed.
+    """
+
+    NUM_PERMUTATIONS = 64
+    BANDS = 16
+    SHINGLE_WORDS = 2
+    LINE_SLACK = 3
+    SAME_LOCATION_SIMILARITY = 0.5
+
+    def __init__(self, similarity_threshold: float = 0.7, previous_comments: Optional[List[Dict[str, Any]]] = None):
+        """
+        Initialize the index for one PR analysis.
+
+        Args:
+            similarity_threshold: Estimated Jaccard similarity above which comments at different locations are duplicates
+            previous_comments: Comments posted by earlier analyses of the same PR
+        """
+        self.similarity_threshold = similarity_threshold
+        self.rows_per_band = self.NUM_PERMUTATIONS // self.BANDS
+        seeded = random.Random(0x5EED)
+        self._permutations = [
+            (seeded.randrange(1, MERSENNE_PRIME), seeded.randrange(0, MERSENNE_PRIME))
+            for _ in range(self.NUM_PERMUTATIONS)
+        ]
+        self._entries: List[IndexedComment] = []
+        self._by_fingerprint: Dict[str, List[int]] = {}
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], List[int]] = {}
+        self.suppressed_previous: List[Dict[str, Any]] = []
+        self.collapsed_count = 0
+        self.merged_count = 0
+
+        for comment in previous_comments or []:
+            self._add_entry(comment, previous=True)
+
+    def add_comments(self, comments: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Add a chunk's comments to the index.
+
+        Args:
+            comments: UI-ready comments of one chunk
+
+        Returns:
+            Comments to post: new issues, with occurrences of duplicates from the same chunk folded in
+        """
+        chunk_entries: List[IndexedComment] = []
+        for comment in comments:
+            entry, duplicate_of = self._match(comment)
+            if duplicate_of is None:
+                chunk_entries.append(self._add_entry(comment, entry=entry))
+                continue
+
+            if duplicate_of.previous:
+                self.suppressed_previous.append(comment)
+                logger.debug(f"Suppressing comment on {comment.get('filePath')}:{comment.get('lineStart')} posted by a previous analysis")
+            elif self._same_location(duplicate_of.comment, comment):
+                self.merged_count += 1
+                if duplicate_of in chunk_entries and self._is_more_severe(comment, duplicate_of.comment):
+                    duplicate_of.comment = {**comment, "metadata": duplicate_of.comment.get("metadata", {})}
+            else:
+                self.collapsed_count += 1
+                duplicate_of.occurrences.append({
+                    "filePath": comment.get("filePath"),
+                    "lineStart": comment.get("lineStart"),
+                    "lineEnd": comment.get("lineEnd")
+                })
+                if duplicate_of not in chunk_entries:
+                    logger.info(
+                        f"Dropping repeat of an already posted comment: {comment.get('filePath')}:{comment.get('lineStart')} "
+                        f"duplicates {duplicate_of.comment.get('filePath')}:{duplicate_of.comment.get('lineStart')}"
+                    )
+
+        return [self._render(entry) for entry in chunk_entries]
+
+    def _match(self, comment: Dict[str, Any]) -> Tuple[IndexedComment, Optional[IndexedComment]]:
+        """Find the indexed comment a new comment duplicates, if any"""
+        entry = self._index_entry(comment)
+        candidates = list(self._by_fingerprint.get(entry.fingerprint, []))
+        for band_key in self._band_keys(entry.signature):
+            candidates.extend(self._buckets.get(band_key, []))
+        # Same-location duplicates may share fewer shingles than LSH buckets reliably catch
+        candidates.extend(
+            index for index, other in enumerate(self._entries)
+            if self._same_location(other.comment, comment)
+        )
+
+        best, best_similarity = None, 0.0
+        for index in dict.fromkeys(candidates):
+            other = self._entries[index]
+            if other.fingerprint == entry.fingerprint:
+                similarity = 1.0
+            elif self._same_location(other.comment, comment):
+                # Comments on the same lines are compared on exact word sets, which tolerates rephrasing
+                similarity = len(other.words & entry.words) / max(len(other.words | entry.words), 1)
+            else:
+                similarity = self._similarity(other.signature, entry.signature)
+            same_file = other.comment.get("filePath") == comment.get("filePath") or any(
+                occurrence.get("filePath") == comment.get("filePath") for occurrence in other.occurrences
+            )
+            if other.previous:
+                required = self.similarity_threshold if same_file else None
+            elif self._same_location(other.comment, comment):
+                required = self.SAME_LOCATION_SIMILARITY
+            else:
+                required = self.similarity_threshold if other.comment.get("category") == comment.get("category") else None
+            if required is not None and similarity >= required and similarity > best_similarity:
+                best, best_similarity = other, similarity
+
+        return entry, best
+
+    def _add_entry(self, comment: Dict[str, Any], previous: bool = False, entry: Optional[IndexedComment] = None) -> IndexedComment:
+        """Store a comment in the fingerprint map and LSH buckets"""
+        entry = entry or self._index_entry(comment)
+        entry.previous = previous
+        entry.occurrences = list(comment.get("metadata", {}).get("occurrences", [])) if previous else []
+        index = len(self._entries)
+        self._entries.append(entry)
+        self._by_fingerprint.setdefault(entry.fingerprint, []).append(index)
+        for band_key in self._band_keys(entry.signature):
+            self._buckets.setdefault(band_key, []).append(index)
+        return entry
+
+    def _index_entry(self, comment: Dict[str, Any]) -> IndexedComment:
+        """Compute the fingerprint and signature of a comment"""
+        words = self.normalize(self._issue_text(comment))
+        fingerprint = hashlib.sha256(" ".join(words).encode("utf-8")).hexdigest()
+        return IndexedComment(comment, fingerprint, self._minhash(words), frozenset(words))
+
+    @staticmethod
+    def _issue_text(comment: Dict[str, Any]) -> str:
+        """Get the issue part of a formatted comment"""
+        content = comment.get("content", "") or ""
+        match = ISSUE_RE.search(content)
+        return match.group(1) if match else content
+
+    @staticmethod
+    def normalize(text: str) -> List[str]:
+        """
+        Normalize issue text into comparable words.
+        Quoted identifiers and numbers differ between occurrences of the same issue, so they become placeholders.
+        """
+        text = QUOTED_RE.sub(" <q> ", text.lower())
+        text = NUMBER_RE.sub(" <n> ", text)
+        return WORD_RE.findall(text)
+
+    def _minhash(self, words: List[str]) -> Tuple[int, ...]:
+        """MinHash signature over word shingles"""
+        size = self.SHINGLE_WORDS
+        shingles = {" ".join(words[i:i + size]) for i in range(max(len(words) - size + 1, 1))}
+        hashes = [int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big") for shingle in shingles]
+        return tuple(
+            min((a * value + b) % MERSENNE_PRIME for value in hashes)
+            for a, b in self._permutations
+        )
+
+    def _band_keys(self, signature: Tuple[int, ...]) -> List[Tuple[int, Tuple[int, ...]]]:
+        """LSH bucket keys of a signature"""
+        rows = self.rows_per_band
+        return [(band, signature[band * rows:(band + 1) * rows]) for band in range(self.BANDS)]
+
+    @staticmethod
+    def _similarity(first: Tuple[int, ...], second: Tuple[int, ...]) -> float:
+        """Estimated Jaccard similarity of two signatures"""
+        return sum(1 for a, b in zip(first, second) if a == b) / len(first)
+
+    def _same_location(self, first: Dict[str, Any], second: Dict[str, Any]) -> bool:
+        """Whether two comments are on the same file with overlapping (or adjacent) lines"""
+        if first.get("filePath") != second.get("filePath"):
+            return False
+        first_start = first.get("lineStart") or 0
+        second_start = second.get("lineStart") or 0
+        first_end = first.get("lineEnd") or first_start
+        second_end = second.get("lineEnd") or second_start
+        return first_start <= second_end + self.LINE_SLACK and second_start <= first_end + self.LINE_SLACK
+
+    @staticmethod
+    def _is_more_severe(first: Dict[str, Any], second: Dict[str, Any]) -> bool:
+        """Whether the first comment has a strictly higher severity"""
+        levels = SeverityManager.SEVERITY_LEVELS
+        first_severity = first.get("severity")
+        second_severity = second.get("severity")
+        if first_severity not in levels or second_severity not in levels:
+            return False
+        return levels.index(first_severity) > levels.index(second_severity)
+
+    @staticmethod
+    def _render(entry: IndexedComment) -> Dict[str, Any]:
+        """Final comment with its occurrences listed in the content and metadata"""
+        if not entry.occurrences:
+            return entry.comment
+        locations = ", ".join(
+            f"`{occurrence['filePath']}:{occurrence['lineStart']}`" for occurrence in entry.occurrences
+        )
+        comment = dict(entry.comment)
+        comment["content"] = f"{comment.get('content', '')}\n\n**Also found in**: {locations}"
+        comment["metadata"] = {**(comment.get("metadata") or {}), "occurrences": entry.occurrences}
+        return comment
@@ -0,0 +1,228 @@
+"""
+Content-based detection of generated, minified and vendored files.
+Complements FileFilterService, which only looks at file names, by inspecting
+the changed lines and file headers before anything is sent to the LLM.
+"""
+
+import re
+import math
+import logging
+from collections import Counter
+from typing import List, Dict, Any, Optional, Tuple
+from dataclasses import dataclass
+from app.utils.parsed_diff import get_parsed_diff
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ContentClassification:
+    """Why a file's content should not be reviewed"""
+    kind: str  # 'generated', 'minified', 'encoded', 'vendored', 'snapshot', 'sql_dump'
+    reason: str
+
+
+class ContentClassifierService:
+    """Service for classifying PR files as generated, minified or vendored from their content"""
+
+    # Markers that tools put in the first lines of the files they write
+    GENERATED_HEADER_RE = re.compile(
+        r"@generated\b|\bDO NOT EDIT\b|<auto-generated|\bTHIS IS A GENERATED FILE\b"
+        r"|^[\s#/*;<!\-\"']*(?:(?:this|the) (?:\w+ )?(?:file|code|module|class) (?:is|was|has been) |code |file )?"
+        r"(?:auto-?|automatically )?generated (?:by|from|using)\b",
+        re.IGNORECASE | re.MULTILINE
+    )
+
+    HAND_EDITED_GENERATED_RE = re.compile(r"Generated by Django")
+
+    COMMENT_PREFIXES = ("#", "//", "/*", "*", "--", "<!--", ";", '"""', "'''")
+
+    # Signatures of common code generators, matched in the comment lines of the header
+    CODEGEN_SIGNATURES: List[Tuple[re.Pattern, str]] = [
+        (re.compile(r"protocol buffer compiler|protoc-gen-|google\.protobuf\.internal"), "protobuf"),
+        (re.compile(r"OpenAPI Generator|openapi-generator|swagger-codegen|Swagger Codegen"), "OpenAPI client"),
+        (re.compile(r"graphql-codegen|@graphql-codegen"), "GraphQL codegen"),
+        (re.compile(r"Generated by the gRPC|grpc_tools|grpc\.tools"), "gRPC"),
+        (re.compile(r"by Cargo\.|by bindgen|cbindgen"), "Rust codegen"),
+        (re.compile(r"Autogenerated by Thrift|thrift compiler"), "Thrift"),
+        (re.compile(r"Generated by (?:the )?(?:Flatbuffers|flatc)", re.IGNORECASE), "FlatBuffers"),
+    ]
+
+    # License banners of bundled third-party libraries ("/*! jQuery v3.6.0 | (c) ...")
+    VENDOR_BANNER_RE = re.compile(r"^\s*/\*[!*]\s*[\w.@/-]+\s+v?\d+\.\d+(?:\.\d+)?\b|@license\b|\(c\)\s*\d{4}.*\|\s*(?:MIT|BSD|Apache)", re.IGNORECASE)
+
+    SNAPSHOT_HEADER_RE = re.compile(r"^// Jest Snapshot v\d|^# serializer version: \d|^# name: test_", re.MULTILINE)
+    SNAPSHOT_PATH_RE = re.compile(r"(?:^|/)__snapshots__/|\.snap$|\.ambr$")
+
+    SQL_DUMP_HEADER_RE = re.compile(r"^-- (?:MySQL dump|PostgreSQL database dump|Dump completed|MariaDB dump)|^PRAGMA foreign_keys", re.MULTILINE)
+    SQL_BULK_LINE_RE = re.compile(r"^\s*(?:INSERT INTO|COPY \S+ .*FROM stdin|VALUES\s*\()", re.IGNORECASE)
+
+    HEADER_LINES = 20
+    MAX_SAMPLE_CHARS = 200_000
+    MIN_SAMPLE_CHARS = 2_000
+    LONG_LINE_CHARS = 500
+    MINIFIED_AVERAGE_LINE_CHARS = 250
+    MINIFIED_WHITESPACE_RATIO = 0.08
+    ENCODED_ENTROPY_BITS = 5.5
+    SQL_BULK_RATIO = 0.6
+    SQL_BULK_MIN_LINES = 50
+
+    def classify(self, file_info: Dict[str, Any]) -> Optional[ContentClassification]:
+        """
+        Classify a PR file from its changed lines and header.
+
+        Args:
+            file_info: File information dictionary
+
+        Returns:
+            ContentClassification if the file should be skipped, None otherwise
+        """
+        file_name = file_info.get("prFileName", "")
+        try:
+            lines = self._sample_changed_lines(file_info)
+            header = self._header_lines(file_info, lines)
+            header_text = "\n".join(header)
+
+            if self.SNAPSHOT_PATH_RE.search(file_name) or self.SNAPSHOT_HEADER_RE.search(header_text):
+                return ContentClassification("snapshot", "Test snapshot file")
+
+            # Generator names also appear in ordinary code ("from grpc_tools import protoc"), so only comments count
+            comment_text = "\n".join(self._comment_lines(header))
+            for pattern, generator in self.CODEGEN_SIGNATURES:
+                if pattern.search(comment_text):
+                    return ContentClassification("generated", f"Generated {generator} code")
+
+            marker = self.GENERATED_HEADER_RE.search(comment_text)
+            # Django migrations start with a "Generated by Django" line but are routinely edited by hand
+            if marker and not self.HAND_EDITED_GENERATED_RE.search(comment_text):
+                return ContentClassification("generated", f"Generated file (header marker '{marker.group(0)}')")
+
+            if self.SQL_DUMP_HEADER_RE.search(header_text):
+                return ContentClassification("sql_dump", "SQL dump")
+            if len(lines) >= self.SQL_BULK_MIN_LINES:
+                bulk_lines = sum(1 for line in lines if self.SQL_BULK_LINE_RE.match(line))
+                if bulk_lines / len(lines) >= self.SQL_BULK_RATIO:
+                    return ContentClassification("sql_dump", f"SQL data dump ({bulk_lines * 100 // len(lines)}% of changed lines are bulk inserts)")
+
+            return self._classify_line_shape(lines, header)
+
+        except Exception as e:
+            logger.error(f"Error classifying content of {file_name}: {str(e)}")
+            return None
+
+    def _comment_lines(self, header: List[str]) -> List[str]:
+        """Get the header lines that are comments, including the inside of block comments and docstrings"""
+        comment_lines = []
+        block_end = None
+        for line in header:
+            stripped = line.strip()
+            if block_end:
+                comment_lines.append(line)
+                if block_end in stripped:
+                    block_end = None
+                continue
+            if not stripped.startswith(self.COMMENT_PREFIXES):
+                continue
+            comment_lines.append(line)
+            for start, end in (("/*", "*/"), ('"""', '"""'), ("'''", "'''"), ("<!--", "-->")):
+                if stripped.startswith(start) and end not in stripped[len(start):]:
+                    block_end = end
+                    break
+        return comment_lines
+
+    def _classify_line_shape(self, lines: List[str], header: List[str]) -> Optional[ContentClassification]:
+        """Detect minified, encoded and bundled vendor content from line-length and character statistics"""
+        total_chars = sum(len(line) for line in lines)
+        if total_chars < self.MIN_SAMPLE_CHARS:
+            return None
+
+        long_lines = [line for line in lines if len(line) >= self.LONG_LINE_CHARS]
+        long_chars = sum(len(line) for line in long_lines)
+        average_length = total_chars / len(lines)
+        if average_length < self.MINIFIED_AVERAGE_LINE_CHARS and long_chars < total_chars / 2:
+            return None
+
+        sample = "".join(long_lines or lines)[:self.MAX_SAMPLE_CHARS]
+        whitespace_ratio = sum(1 for char in sample if char.isspace()) / len(sample)
+        entropy = self._shannon_entropy(sample)
+
+        if any(self.VENDOR_BANNER_RE.search(line[:300]) for line in header[:3]):
+            return ContentClassification("vendored", f"Bundled third-party library (license banner, average line length {average_length:.0f} chars)")
+        if entropy >= self.ENCODED_ENTROPY_BITS and whitespace_ratio < self.MINIFIED_WHITESPACE_RATIO:
+            return ContentClassification("encoded", f"Encoded data ({entropy:.1f} bits/char, {len(long_lines)} lines over {self.LONG_LINE_CHARS} chars)")
+        if whitespace_ratio < self.MINIFIED_WHITESPACE_RATIO:
+            return ContentClassification("minified", f"Minified content (average line length {average_length:.0f} chars, {whitespace_ratio:.0%} whitespace)")
+        return None
+
+    def _sample_changed_lines(self, file_info: Dict[str, Any]) -> List[str]:
+        """Get the added lines of a file (deleted lines for pure deletions), capped in size"""
+        parsed = get_parsed_diff(file_info)
+        marker = '+' if parsed.additions else '-'
+        lines = []
+        sampled_chars = 0
+        for hunk in parsed.hunks:
+            for line in hunk.lines:
+                if line.startswith(marker):
+                    lines.append(line[1:])
+                    sampled_chars += len(line)
+                    if sampled_chars >= self.MAX_SAMPLE_CHARS:
+                        return lines
+        return lines
+
+    def _header_lines(self, file_info: Dict[str, Any], changed_lines: List[str]) -> List[str]:
+        """Get the first lines of the file, from its content if available or from a hunk starting at line 1"""
+        for key in ("prFileContentAfter", "prFileContentBefore"):
+            content = file_info.get(key)
+            if content and content != "File not found in base branch":
+                return content[:self.MAX_SAMPLE_CHARS].split("\n", self.HEADER_LINES)[:self.HEADER_LINES]
+
+        parsed = get_parsed_diff(file_info)
+        if parsed.hunks and parsed.hunks[0].new_start <= 1:
+            return changed_lines[:self.HEADER_LINES]
+        return []
+
+    @staticmethod
+    def _shannon_entropy(text: str) -> float:
+        """Shannon entropy of the character distribution, in bits per character"""
+        if not text:
+            return 0.0
+        total = len(text)
+        return -sum(count / total * math.log2(count / total) for count in Counter(text).values())
+
+    def partition_files(self, pr_files: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, str]]]:
+        """
+        Split PR files into reviewable files and files excluded by content.
+
+        Args:
+            pr_files: List of file dictionaries
+
+        Returns:
+            Tuple of (kept files, excluded files as {"fileName", "kind", "reason"})
+        """
+        kept_files = []
+        excluded_files = []
+        for file_info in pr_files:
+            classification = self.classify(file_info)
+            if classification:
+                excluded_files.append({
+                    "fileName": file_info.get("prFileName", "unknown"),
+                    "kind": classification.kind,
+                    "reason": classification.reason
+                })
+            else:
+                kept_files.append(file_info)
+        return kept_files, excluded_files
+
+
+# Global service instance
+_content_classifier = ContentClassifierService()
+
+
+def classify_file_content(file_info: Dict[str, Any]) -> Optional[ContentClassification]:
+    """Classify a PR file as generated, minified or vendored from its content"""
+    return _content_classifier.classify(file_info)
+
+
+def exclude_generated_files(pr_files: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, str]]]:
+    """Split PR files into reviewable files and files excluded by content"""
+    return _content_classifier.partition_files(pr_files)
@@ -0,0 +1,252 @@
+"""
+Context extraction utilities for trimming before-change file content.
+Keeps only line-numbered windows of a file around the regions touched by its diff hunks.
+"""
+
+import logging
+from typing import List, Tuple, Optional
+from dataclasses import dataclass
+from app.utils.parsed_diff import DiffHunk, parse_hunks
+from app.utils.symbol_index import Symbol, get_symbol_index, extract_identifiers
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ContextWindow:
+    """A contiguous range of before-change lines kept for the prompt (1-based, inclusive)"""
+    start: int
+    end: int
+
+
+class ContextExtractionService:
+    """Service for extracting line-numbered context windows around diff hunks"""
+
+    def __init__(self, window_lines: int = 20):
+        """
+        Initialize the context extraction service.
+
+        Args:
+            window_lines: Number of lines to keep above and below each changed region
+        """
+        self.window_lines = window_lines
+
+    def get_hunk_ranges(self, diff_hunks: List[DiffHunk]) -> List[Tuple[int, int]]:
+        """
+        Get the before-change line range touched by each hunk.
+
+        Args:
+            diff_hunks: Parsed diff hunks
+
+        Returns:
+            List of (start, end) line ranges in the original file
+        """
+        return [hunk.old_range for hunk in diff_hunks if hunk.is_valid]
+
+    def build_windows(self, ranges: List[Tuple[int, int]], total_lines: int, window_lines: Optional[int] = None) -> List[ContextWindow]:
+        """
+        Expand line ranges by the window size and merge overlapping or adjacent windows.
+
+        Args:
+            ranges: List of (start, end) line ranges
+            total_lines: Number of lines in the file
+            window_lines: Override for the configured window size
+
+        Returns:
+            Sorted list of non-overlapping windows
+        """
+        if total_lines <= 0 or not ranges:
+            return []
+
+        window = self.window_lines if window_lines is None else window_lines
+        windows: List[ContextWindow] = []
+
+        for start, end in sorted(ranges):
+            start = max(1, start - window)
+            end = min(total_lines, end + window)
+            if start > end:
+                continue
+            if windows and start <= windows[-1].end + 1:
+                windows[-1].end = max(windows[-1].end, end)
+            else:
+                windows.append(ContextWindow(start, end))
+
+        return windows
+
+    def render_windows(self, lines: List[str], windows: List[ContextWindow]) -> str:
+        """
+        Render windows with their real line numbers and elision markers between them.
+
+        Args:
+            lines: File content split into lines
+            windows: Windows to keep
+
+        Returns:
+            Rendered excerpt
+        """
+        output = []
+        previous_end = 0
+
+        for window in windows:
+            if window.start > previous_end + 1:
+                output.append(f"... (lines {previous_end + 1}-{window.start - 1} omitted) ...")
+            for line_num in range(window.start, window.end + 1):
+                output.append(f"{line_num:4d} | {lines[line_num - 1]}")
+            previous_end = window.end
+
+        if previous_end < len(lines):
+            output.append(f"... (lines {previous_end + 1}-{len(lines)} omitted) ...")
+
+        return "\n".join(output)
+
+    def extract_context(self, file_content: str, diff_hunks: List[DiffHunk], window_lines: Optional[int] = None) -> str:
+        """
+        Extract line-numbered windows of the original file around every hunk.
+
+        Args:
+            file_content: Original file content before changes
+            diff_hunks: Parsed diff hunks
+            window_lines: Override for the configured window size
+
+        Returns:
+            Excerpt of the file, empty string if nothing can be extracted
+        """
+        try:
+            if not file_content:
+                return ""
+
+            lines = split_content_lines(file_content)
+            windows = self.build_windows(self.get_hunk_ranges(diff_hunks), len(lines), window_lines)
+            if not windows:
+                return ""
+
+            return self.render_windows(lines, windows)
+
+        except Exception as e:
+            logger.error(f"Error extracting context windows: {str(e)}")
+            return ""
+
+    def extract_symbol_context(
+        self,
+        file_name: str,
+        file_content: str,
+        diff_hunks: List[DiffHunk],
+        token_budget: int,
+        window_lines: Optional[int] = None
+    ) -> str:
+        """
+        Extract hunk windows plus the symbols that enclose the changes and the
+        definitions referenced by changed lines, within a token budget.
+
+        Hunk windows are always kept. Enclosing symbols are added innermost first,
+        then referenced definitions in order of first use. A symbol whose body does
+        not fit the remaining budget is reduced to its signature line.
+
+        Args:
+            file_name: Path of the file, used to pick the symbol indexing strategy
+            file_content: Original file content before changes
+            diff_hunks: Parsed diff hunks
+            token_budget: Maximum tokens for the excerpt (hunk windows may exceed it on their own)
+            window_lines: Override for the configured window size
+
+        Returns:
+            Excerpt of the file, empty string if nothing can be extracted
+        """
+        try:
+            if not file_content:
+                return ""
+
+            lines = split_content_lines(file_content)
+            hunk_ranges = self.get_hunk_ranges(diff_hunks)
+            windows = self.build_windows(hunk_ranges, len(lines), window_lines)
+            if not windows:
+                return ""
+
+            index = get_symbol_index(file_name, file_content)
+            covered = bytearray(len(lines) + 1)
+            kept_ranges = []
+            used_chars = 0
+            for window in windows:
+                used_chars += self._cover(lines, covered, window.start, window.end)
+                kept_ranges.append((window.start, window.end))
+
+            enclosing: List[Symbol] = []
+            for start, end in hunk_ranges:
+                for symbol in reversed(index.enclosing(start, end)):
+                    if symbol not in enclosing:
+                        enclosing.append(symbol)
+
+            changed_lines = [
+                line[1:] for hunk in diff_hunks for line in hunk.lines
+                if line.startswith(('+', '-'))
+            ]
+            referenced = [
+                symbol for name in extract_identifiers(changed_lines)
+                for symbol in index.definitions(name) if symbol not in enclosing
+            ]
+
+            budget_chars = token_budget * 4
+            notes = []
+            for label, symbol in [("enclosing", s) for s in enclosing] + [("referenced", s) for s in referenced]:
+                symbol_end = min(symbol.end, len(lines))
+                if symbol.start > symbol_end:
+                    continue
+                description = f"{label} {symbol.kind} `{symbol.qualified_name or symbol.name}` (lines {symbol.start}-{symbol_end})"
+
+                extra_chars = self._uncovered_chars(lines, covered, symbol.start, symbol_end)
+                if used_chars + extra_chars <= budget_chars:
+                    used_chars += self._cover(lines, covered, symbol.start, symbol_end)
+                    kept_ranges.append((symbol.start, symbol_end))
+                    notes.append(description)
+                    continue
+
+                signature_chars = self._uncovered_chars(lines, covered, symbol.start, symbol.start)
+                if used_chars + signature_chars <= budget_chars:
+                    used_chars += self._cover(lines, covered, symbol.start, symbol.start)
+                    kept_ranges.append((symbol.start, symbol.start))
+                    notes.append(f"{description}, signature only")
+
+            excerpt = self.render_windows(lines, self.build_windows(kept_ranges, len(lines), window_lines=0))
+            if notes:
+                return "Symbols: " + "; ".join(notes) + "\n" + excerpt
+            return excerpt
+
+        except Exception as e:
+            logger.error(f"Error extracting symbol context for {file_name}: {str(e)}")
+            return self.extract_context(file_content, diff_hunks, window_lines)
+
+    @staticmethod
+    def _uncovered_chars(lines: List[str], covered: bytearray, start: int, end: int) -> int:
+        """Rendered size of the lines in a range that are not kept yet"""
+        return sum(len(lines[line_num - 1]) + 7 for line_num in range(start, end + 1) if not covered[line_num])
+
+    @staticmethod
+    def _cover(lines: List[str], covered: bytearray, start: int, end: int) -> int:
+        """Mark a range as kept and return the rendered size it added"""
+        added_chars = 0
+        for line_num in range(start, end + 1):
+            if not covered[line_num]:
+                covered[line_num] = 1
+                added_chars += len(lines[line_num - 1]) + 7
+        return added_chars
+
+
+def split_content_lines(file_content: str) -> List[str]:
+    """Split file content into lines using git's line numbering"""
+    lines = file_content.split('\n')
+    if lines and lines[-1] == "":
+        lines.pop()
+    return lines
+
+
+# Global service instance
+_context_service = ContextExtractionService()
+
+
+# Legacy functions for backward compatibility
+def extract_context_windows(file_content: str, diff_hunks: List[str], window_lines: int = 20) -> str:
+    """
+    Legacy function - Extract line-numbered context windows around diff hunks.
+    Use ContextExtractionService.extract_context() for new code.
+    """
+    return _context_service.extract_context(file_content, parse_hunks("", diff_hunks).hunks, window_lines)
@@ -0,0 +1,400 @@
+"""
+Diff analysis for changes that need no review.
+Detects whitespace-only changes, renames without content changes and code moved
+verbatim within or across files, drops that content from the parsed diffs and
+leaves one-line notes in its place.
+"""
+
+import re
+import logging
+from typing import List, Dict, Any, Tuple, Optional
+from dataclasses import dataclass, field
+from app.utils.parsed_diff import DiffHunk, ParsedDiff, get_parsed_diff, build_parsed_diff
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Whitespace between two word characters separates tokens and is kept as one space, other whitespace is dropped
+CODE_WHITESPACE_RE = re.compile(r"(?P<gap>(?<=\w)\s+(?=\w))|\s+")
+# Quoted literals are compared verbatim; an unterminated quote runs to the end of the line
+STRING_LITERAL_RE = re.compile(r'"(?:\\.|[^"\\])*(?:"|$)|\'(?:\\.|[^\'\\])*(?:\'|$)|`(?:\\.|[^`\\])*(?:`|$)')
+
+
+def _token_gap(match: re.Match) -> str:
+    """Replacement for CODE_WHITESPACE_RE"""
+    return " " if match.group("gap") else ""
+
+
+@dataclass
+class DiffAnalysisReport:
+    """What the analysis removed from a PR's diffs"""
+    whitespace_only_changes: int = 0
+    rename_only_files: int = 0
+    moved_blocks: int = 0
+    moved_lines: int = 0
+    tokens_saved: int = 0
+    notes: Dict[str, List[str]] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, int]:
+        """Counters in the camelCase shape used for backend payloads"""
+        return {
+            "whitespaceOnlyChanges": self.whitespace_only_changes,
+            "renameOnlyFiles": self.rename_only_files,
+            "movedBlocks": self.moved_blocks,
+            "movedLines": self.moved_lines,
+            "tokensSaved": self.tokens_saved
+        }
+
+
+@dataclass
+class _ChangeRun:
+    """A run of consecutive added or deleted lines inside one hunk"""
+    file_name: str
+    hunk_index: int
+    first_line_index: int  # index into hunk.lines
+    first_line_num: int  # line number on the run's own side
+    normalized: List[str]
+
+
+class DiffAnalysisService:
+    """Service for removing whitespace-only, rename-only and moved content from PR diffs"""
+
+    # Languages where indentation changes alter meaning, so leading whitespace is kept when comparing
+    INDENT_SENSITIVE_EXTENSIONS = {".py", ".pyi", ".yaml", ".yml", ".haml", ".pug", ".sass", ".coffee", ".nim", ".fs"}
+    INDENT_SENSITIVE_FILES = {"Makefile", "makefile", "GNUmakefile"}
+
+    # Windows made of braces and blank lines match everywhere; a moved block needs real content
+    MIN_MOVED_WINDOW_CHARS = 40
+    MAX_LISTED_RANGES = 5
+
+    def __init__(self, min_moved_lines: Optional[int] = None):
+        """
+        Initialize the diff analysis service.
+
+        Args:
+            min_moved_lines: Minimum number of non-blank lines for a block to count as moved
+        """
+        self.min_moved_lines = max(min_moved_lines or settings.DIFF_MOVED_CODE_MIN_LINES, 1)
+
+    def analyze(self, pr_files: List[Dict[str, Any]], measure_tokens=None) -> DiffAnalysisReport:
+        """
+        Analyze PR files and replace content that needs no review with notes.
+
+        Each file's "parsedDiff" is replaced by the reduced diff and its notes are
+        stored under "prFileNotes". Removed lines are cut out by splitting hunks, so
+        every remaining line keeps its exact line number.
+
+        Args:
+            pr_files: List of file dictionaries
+            measure_tokens: Optional callable returning the prompt tokens of a file, used for the savings report
+
+        Returns:
+            DiffAnalysisReport with counters and notes per file
+        """
+        report = DiffAnalysisReport()
+        tokens_before = {id(file_info): measure_tokens(file_info) for file_info in pr_files} if measure_tokens else {}
+        drop_masks: Dict[str, List[List[bool]]] = {}
+
+        for file_info in pr_files:
+            file_name = file_info.get("prFileName", "unknown")
+            parsed = get_parsed_diff(file_info)
+            drop_masks[file_name] = [[False] * len(hunk.lines) for hunk in parsed.hunks]
+
+            if self._is_rename_only(file_info, parsed):
+                previous_name = file_info.get("prFilePreviousName")
+                note = f"Renamed from {previous_name} without content changes" if previous_name else "Renamed without content changes"
+                self._add_note(report, file_info, note)
+                report.rename_only_files += 1
+                continue
+
+            whitespace_ranges = []
+            indent_sensitive = self._is_indent_sensitive(file_name)
+            for hunk_index, hunk in enumerate(parsed.hunks):
+                for first, end, new_first, new_last in self._find_whitespace_only_changes(hunk, indent_sensitive):
+                    drop_masks[file_name][hunk_index][first:end] = [True] * (end - first)
+                    whitespace_ranges.append(f"{new_first}-{new_last}" if new_last > new_first else str(new_first))
+                    report.whitespace_only_changes += 1
+            if len(whitespace_ranges) > self.MAX_LISTED_RANGES:
+                first_line = whitespace_ranges[0].split("-")[0]
+                last_line = whitespace_ranges[-1].split("-")[-1]
+                self._add_note(report, file_info, f"{len(whitespace_ranges)} whitespace-only changes omitted between lines {first_line} and {last_line}")
+            elif whitespace_ranges:
+                self._add_note(report, file_info, f"Whitespace-only changes omitted at lines {', '.join(whitespace_ranges)}")
+
+        self._mark_moved_code(pr_files, drop_masks, report)
+
+        for file_info in pr_files:
+            file_name = file_info.get("prFileName", "unknown")
+            masks = drop_masks.get(file_name, [])
+            if not any(any(mask) for mask in masks):
+                continue
+            parsed = get_parsed_diff(file_info)
+            hunks: List[DiffHunk] = []
+            for hunk, mask in zip(parsed.hunks, masks):
+                hunks.extend(self._drop_lines(hunk, mask) if any(mask) else [hunk])
+            file_info["parsedDiff"] = build_parsed_diff(file_name, hunks)
+
+        if measure_tokens:
+            report.tokens_saved = sum(
+                max(tokens_before[id(file_info)] - measure_tokens(file_info), 0) for file_info in pr_files
+            )
+
+        return report
+
+    def _is_rename_only(self, file_info: Dict[str, Any], parsed: ParsedDiff) -> bool:
+        """A renamed file whose diff has no added or deleted lines"""
+        return file_info.get("prFileStatus") == "renamed" and parsed.additions == 0 and parsed.deletions == 0
+
+    def _is_indent_sensitive(self, file_name: str) -> bool:
+        """Whether leading whitespace is significant for a file"""
+        base_name = file_name.rsplit("/", 1)[-1]
+        extension = ("." + base_name.rsplit(".", 1)[-1].lower()) if "." in base_name else ""
+        return extension in self.INDENT_SENSITIVE_EXTENSIONS or base_name in self.INDENT_SENSITIVE_FILES
+
+    def _find_whitespace_only_changes(self, hunk: DiffHunk, indent_sensitive: bool) -> List[Tuple[int, int, int, int]]:
+        """
+        Find change blocks whose deleted and added lines match once whitespace is normalized.
+        A change block is a run of consecutive added/deleted lines between context lines.
+        Leading indentation is kept for indentation-sensitive languages.
+
+        Returns:
+            List of (first line index, end line index, first new line, last new line)
+        """
+        if not hunk.is_valid:
+            return []
+
+        blocks = []
+        new_line_num = hunk.new_start
+        block_start = None
+        block_new_start = new_line_num
+        deleted: List[str] = []
+        added: List[str] = []
+
+        for line_index, line in enumerate(hunk.lines + [" "]):
+            marker = line[:1]
+            if marker in ('+', '-'):
+                if block_start is None:
+                    block_start, block_new_start = line_index, new_line_num
+                    deleted, added = [], []
+                normalized = self._normalize_whitespace(line[1:], indent_sensitive)
+                if normalized:
+                    (deleted if marker == '-' else added).append(normalized)
+                if marker == '+':
+                    new_line_num += 1
+                continue
+
+            if block_start is not None and deleted == added:
+                blocks.append((block_start, line_index, block_new_start, max(new_line_num - 1, block_new_start)))
+            block_start = None
+            if marker == ' ':
+                new_line_num += 1
+
+        return blocks
+
+    @staticmethod
+    def _normalize_whitespace(content: str, keep_indent: bool) -> str:
+        """
+        Normalize a line for whitespace-insensitive comparison.
+
+        Whitespace outside quoted literals is dropped, except between two word characters
+        where it becomes one space; quoted literals are kept verbatim.
+        """
+        body = content.strip()
+        if not body:
+            return ""
+        indent = content[:len(content) - len(content.lstrip())] if keep_indent else ""
+        parts = []
+        position = 0
+        for match in STRING_LITERAL_RE.finditer(body):
+            parts.append(CODE_WHITESPACE_RE.sub(_token_gap, body[position:match.start()]))
+            parts.append(match.group(0))
+            position = match.end()
+        parts.append(CODE_WHITESPACE_RE.sub(_token_gap, body[position:]))
+        return indent + "".join(parts)
+
+    def _mark_moved_code(
+        self,
+        pr_files: List[Dict[str, Any]],
+        drop_masks: Dict[str, List[List[bool]]],
+        report: DiffAnalysisReport
+    ) -> None:
+        """
+        Find deleted blocks that reappear verbatim as added blocks and mark both sides for removal.
+
+        Blocks are compared on stripped lines, keeping the indentation of indentation-sensitive
+        files; a window of min_moved_lines lines is indexed for every added run and matches
+        are extended greedily line by line.
+        """
+        deleted_runs: List[_ChangeRun] = []
+        added_runs: List[_ChangeRun] = []
+        files_by_name = {}
+
+        for file_info in pr_files:
+            file_name = file_info.get("prFileName", "unknown")
+            files_by_name[file_name] = file_info
+            indent_sensitive = self._is_indent_sensitive(file_name)
+            for hunk_index, hunk in enumerate(get_parsed_diff(file_info).hunks):
+                if not hunk.is_valid:
+                    continue
+                for run in self._collect_runs(file_name, hunk_index, hunk, drop_masks[file_name][hunk_index], indent_sensitive):
+                    (deleted_runs if run[0] == '-' else added_runs).append(run[1])
+
+        window = self.min_moved_lines
+        index: Dict[Tuple[str, ...], List[Tuple[int, int]]] = {}
+        for run_index, run in enumerate(added_runs):
+            for start in range(len(run.normalized) - window + 1):
+                key = tuple(run.normalized[start:start + window])
+                if sum(len(line.strip()) for line in key) >= self.MIN_MOVED_WINDOW_CHARS:
+                    index.setdefault(key, []).append((run_index, start))
+
+        used_added = [[False] * len(run.normalized) for run in added_runs]
+        for deleted_run in deleted_runs:
+            position = 0
+            while position + window <= len(deleted_run.normalized):
+                match = None
+                for run_index, start in index.get(tuple(deleted_run.normalized[position:position + window]), []):
+                    if not any(used_added[run_index][start:start + window]):
+                        match = (run_index, start)
+                        break
+                if not match:
+                    position += 1
+                    continue
+
+                run_index, start = match
+                added_run = added_runs[run_index]
+                length = window
+                while (position + length < len(deleted_run.normalized)
+                       and start + length < len(added_run.normalized)
+                       and not used_added[run_index][start + length]
+                       and deleted_run.normalized[position + length] == added_run.normalized[start + length]):
+                    length += 1
+
+                for offset in range(length):
+                    used_added[run_index][start + offset] = True
+                self._drop_run_lines(drop_masks, deleted_run, position, length)
+                self._drop_run_lines(drop_masks, added_run, start, length)
+
+                old_first = deleted_run.first_line_num + position
+                new_first = added_run.first_line_num + start
+                old_range = f"{old_first}-{old_first + length - 1}"
+                new_range = f"{new_first}-{new_first + length - 1}"
+                self._add_note(report, files_by_name[deleted_run.file_name],
+                               f"Original lines {old_range} moved unchanged to {added_run.file_name} lines {new_range}")
+                self._add_note(report, files_by_name[added_run.file_name],
+                               f"Lines {new_range} moved unchanged from {deleted_run.file_name} original lines {old_range}")
+                report.moved_blocks += 1
+                report.moved_lines += length
+                position += length
+
+    @staticmethod
+    def _collect_runs(
+        file_name: str,
+        hunk_index: int,
+        hunk: DiffHunk,
+        mask: List[bool],
+        keep_indent: bool
+    ) -> List[Tuple[str, _ChangeRun]]:
+        """Split a hunk into runs of consecutive added or deleted lines, keeping indentation if it is significant"""
+        runs: List[Tuple[str, _ChangeRun]] = []
+        old_line_num = hunk.old_start
+        new_line_num = hunk.new_start
+        current_marker = None
+
+        for line_index, line in enumerate(hunk.lines):
+            marker = line[:1]
+            if marker not in ('+', '-') or mask[line_index]:
+                current_marker = None
+            elif marker != current_marker:
+                current_marker = marker
+                runs.append((marker, _ChangeRun(
+                    file_name, hunk_index, line_index,
+                    old_line_num if marker == '-' else new_line_num, []
+                )))
+            if marker in ('+', '-') and not mask[line_index]:
+                runs[-1][1].normalized.append(line[1:].rstrip() if keep_indent else line[1:].strip())
+
+            if marker == ' ':
+                old_line_num += 1
+                new_line_num += 1
+            elif marker == '-':
+                old_line_num += 1
+            elif marker == '+':
+                new_line_num += 1
+
+        return runs
+
+    @staticmethod
+    def _drop_run_lines(drop_masks: Dict[str, List[List[bool]]], run: _ChangeRun, start: int, length: int) -> None:
+        """Mark part of a change run for removal"""
+        mask = drop_masks[run.file_name][run.hunk_index]
+        for offset in range(start, start + length):
+            mask[run.first_line_index + offset] = True
+
+    @staticmethod
+    def _drop_lines(hunk: DiffHunk, mask: List[bool]) -> List[DiffHunk]:
+        """
+        Remove lines from a hunk, splitting it where lines were removed.
+
+        Every piece gets a header computed from its own first line, so line numbers
+        stay exact. Pieces without any added or deleted line are discarded.
+        """
+        pieces: List[DiffHunk] = []
+        body: List[str] = []
+        old_line_num = hunk.old_start
+        new_line_num = hunk.new_start
+        piece_old_start, piece_new_start = old_line_num, new_line_num
+        old_count = new_count = 0
+
+        def close_piece() -> None:
+            if any(line.startswith(('+', '-')) for line in body):
+                pieces.append(DiffHunk(
+                    f"@@ -{piece_old_start},{old_count} +{piece_new_start},{new_count} @@",
+                    list(body),
+                    old_start=piece_old_start,
+                    old_count=old_count,
+                    new_start=piece_new_start,
+                    new_count=new_count
+                ))
+
+        for line, dropped in zip(hunk.lines, mask):
+            marker = line[:1]
+            if dropped:
+                if body:
+                    close_piece()
+                    body.clear()
+            else:
+                if not body:
+                    piece_old_start, piece_new_start = old_line_num, new_line_num
+                    old_count = new_count = 0
+                if marker in (' ', '-', '+'):
+                    body.append(line)
+                    old_count += marker != '+'
+                    new_count += marker != '-'
+
+            if marker == ' ':
+                old_line_num += 1
+                new_line_num += 1
+            elif marker == '-':
+                old_line_num += 1
+            elif marker == '+':
+                new_line_num += 1
+
+        if body:
+            close_piece()
+
+        return pieces
+
+    @staticmethod
+    def _add_note(report: DiffAnalysisReport, file_info: Dict[str, Any], note: str) -> None:
+        """Attach a note to a file and to the report"""
+        file_info.setdefault("prFileNotes", []).append(note)
+        report.notes.setdefault(file_info.get("prFileName", "unknown"), []).append(note)
+
+
+# Global service instance
+_diff_analysis_service = DiffAnalysisService()
+
+
+def analyze_pr_diffs(pr_files: List[Dict[str, Any]], measure_tokens=None) -> DiffAnalysisReport:
+    """Replace whitespace-only, rename-only and moved content in PR files with notes"""
+    return _diff_analysis_service.analyze(pr_files, measure_tokens)
@@ -3,23 +3,15 @@ Git diff formatting utilities for LLM-friendly code review.
 Provides both service-oriented and legacy interfaces for backward compatibility.
 """
 
-import re
 import logging
-from typing import List, Dict, Tuple, Optional, Any
+from typing import List, Dict, Any
 from dataclasses import dataclass
+from app.utils.parsed_diff import HUNK_HEADER_RE, DiffHunk, ParsedDiff, parse_hunks, parse_raw_diff
+from config.settings import settings
 
 logger = logging.getLogger(__name__)
 
 
-@dataclass
-class DiffLine:
-    """Represents a single line in a diff"""
-    line_num: int
-    content: str
-    line_type: str  # 'context', 'added', 'deleted'
-    marker: str  # '  ', '+ ', '- '
-
-
 @dataclass
 class ParsedHunk:
     """Represents a parsed diff hunk with structured data"""
@@ -55,7 +47,7 @@ class DiffFormatterService:
             lines = hunk.split('\n')
             
             # Extract hunk header (e.g., "@@ -0,0 +1,923 @@")
-            header_match = re.match(r'@@ -(\d+),?(\d*) \+(\d+),?(\d*) @@', lines[0])
+            header_match = HUNK_HEADER_RE.match(lines[0])
             if not header_match:
                 return ParsedHunk(
                     0, 0, 0, 0, [], [], [],
@@ -124,218 +116,253 @@ class DiffFormatterService:
                 error_message=f"Parse error: {str(e)}"
             )
     
-    def format_diff_for_llm(self, diff_hunks: List[str], file_path: str = "") -> str:
+    def format_parsed_diff(self, parsed: ParsedDiff, profile: str = "standard") -> str:
         """
-        Format git diff hunks into LLM-friendly format with clear line numbers.
+        Format a parsed diff into LLM-friendly format with clear line numbers.
         
         Args:
-            diff_hunks: List of raw diff hunk strings
-            file_path: Path to the file being reviewed
+            parsed: Parsed diff of the file being reviewed
+            profile: "standard" for the annotated markdown layout, "compact" for the token-lean layout
             
         Returns:
             Formatted diff for LLM review
         """
+        if profile == "compact":
+            return self.format_compact(parsed)
+        
+        file_path = parsed.file_name
         try:
-            if not diff_hunks:
+            if not parsed.hunks:
                 return f"# File: {file_path}\n\nNo changes found in this file.\n"
             
-            formatted_output = []
-            formatted_output.append(f"# File: {file_path}")
-            formatted_output.append("=" * 80)
-            formatted_output.append("")
+            output = [f"# File: {file_path}", "=" * 80, ""]
             
-            for hunk_index, hunk in enumerate(diff_hunks):
-                parsed = self.parse_diff_hunk(hunk)
-                
-                if not parsed.is_valid:
-                    formatted_output.append(f"## Hunk {hunk_index + 1} - Error")
-                    formatted_output.append(f"Error: {parsed.error_message}")
-                    formatted_output.append("")
-                    continue
-                
-                # Hunk header
-                formatted_output.append(f"## Hunk {hunk_index + 1}")
-                old_end = parsed.old_start + parsed.old_count - 1 if parsed.old_count > 0 else parsed.old_start
-                new_end = parsed.new_start + parsed.new_count - 1 if parsed.new_count > 0 else parsed.new_start
-                formatted_output.append(f"**Changes:** Lines {parsed.old_start}-{old_end} → {parsed.new_start}-{new_end}")
-                formatted_output.append("")
-                
-                # Combine all lines and sort by line number
-                all_lines = self._combine_and_sort_diff_lines(parsed)
-                
-                # Format lines
-                formatted_output.append("```diff")
-                for diff_line in all_lines:
-                    line_num = f"{diff_line.line_num:4d}"
-                    formatted_output.append(f"{line_num} {diff_line.marker}{diff_line.content}")
-                
-                formatted_output.append("```")
-                formatted_output.append("")
-                
-                # Summary of changes in this hunk
-                if parsed.old_lines or parsed.new_lines:
-                    formatted_output.append("**Summary of changes in this hunk:**")
-                    if parsed.old_lines:
-                        formatted_output.append(f"- {len(parsed.old_lines)} line(s) deleted")
-                    if parsed.new_lines:
-                        formatted_output.append(f"- {len(parsed.new_lines)} line(s) added")
-                    formatted_output.append("")
+            for hunk_index, hunk in enumerate(parsed.hunks):
+                mark = len(output)
+                try:
+                    self._write_hunk(output, hunk, hunk_index)
+                except Exception as e:
+                    logger.error(f"Error parsing diff hunk: {str(e)}")
+                    del output[mark:]
+                    output.extend([f"## Hunk {hunk_index + 1} - Error", f"Error: Parse error: {str(e)}", ""])
             
-            return "\n".join(formatted_output)
+            return "\n".join(output)
             
         except Exception as e:
             logger.error(f"Error formatting diff for LLM: {str(e)}")
             return f"# File: {file_path}\n\nError formatting diff: {str(e)}\n"
-
-    def format_diff_for_llm_raw_diff(self, pr_diff: str, file_path: str = "") -> str:
+    
+    def format_compact(self, parsed: ParsedDiff) -> str:
         """
-        Format raw git diff string into LLM-friendly format with clear line numbers.
+        Format a parsed diff with as few non-code tokens as possible.
+        
+        Hunks keep their raw header and lines stay in diff order, each written as
+        "<line number><marker> <code>" with trailing whitespace stripped. Added and
+        context lines carry their new line number, deleted lines their old one.
+        Unchanged runs longer than twice DIFF_COMPACT_CONTEXT_LINES are collapsed to
+        a note naming the skipped line range.
         
         Args:
-            pr_diff: Raw git diff string (like prFileDiff from test.json)
-            file_path: Path to the file being reviewed
+            parsed: Parsed diff of the file being reviewed
             
         Returns:
-            Formatted diff for LLM review
+            Compact diff for LLM review
         """
         try:
-            if not pr_diff or not pr_diff.strip():
-                return f"# File: {file_path}\n\nNo changes found in this file.\n"
+            if not parsed.hunks:
+                return "No changes found in this file."
             
-            # Split the raw diff into individual hunks
-            diff_hunks = self._split_diff_into_hunks(pr_diff)
-            
-            if not diff_hunks:
-                return f"# File: {file_path}\n\nNo changes found in this file.\n"
-            
-            formatted_output = []
-            formatted_output.append(f"# File: {file_path}")
-            formatted_output.append("=" * 80)
-            formatted_output.append("")
-            
-            for hunk_index, hunk in enumerate(diff_hunks):
-                parsed = self.parse_diff_hunk(hunk)
-                
-                if not parsed.is_valid:
-                    formatted_output.append(f"## Hunk {hunk_index + 1} - Error")
-                    formatted_output.append(f"Error: {parsed.error_message}")
-                    formatted_output.append("")
+            output: List[str] = []
+            for hunk in parsed.hunks:
+                if not hunk.is_valid:
+                    output.append(f"{hunk.header.rstrip()} (invalid hunk header)")
                     continue
-                
-                # Hunk header
-                formatted_output.append(f"## Hunk {hunk_index + 1}")
-                old_end = parsed.old_start + parsed.old_count - 1 if parsed.old_count > 0 else parsed.old_start
-                new_end = parsed.new_start + parsed.new_count - 1 if parsed.new_count > 0 else parsed.new_start
-                formatted_output.append(f"**Changes:** Lines {parsed.old_start}-{old_end} → {parsed.new_start}-{new_end}")
-                formatted_output.append("")
-                
-                # Combine all lines and sort by line number
-                all_lines = self._combine_and_sort_diff_lines(parsed)
-                
-                # Format lines
-                formatted_output.append("```diff")
-                for diff_line in all_lines:
-                    line_num = f"{diff_line.line_num:4d}"
-                    formatted_output.append(f"{line_num} {diff_line.marker}{diff_line.content}")
-                
-                formatted_output.append("```")
-                formatted_output.append("")
-                
-                # Summary of changes in this hunk
-                if parsed.old_lines or parsed.new_lines:
-                    formatted_output.append("**Summary of changes in this hunk:**")
-                    if parsed.old_lines:
-                        formatted_output.append(f"- {len(parsed.old_lines)} line(s) deleted")
-                    if parsed.new_lines:
-                        formatted_output.append(f"- {len(parsed.new_lines)} line(s) added")
-                    formatted_output.append("")
+                self._write_compact_hunk(output, hunk, settings.DIFF_COMPACT_CONTEXT_LINES)
             
-            return "\n".join(formatted_output)
+            return "\n".join(output)
             
         except Exception as e:
-            logger.error(f"Error formatting diff for LLM: {str(e)}")
-            return f"# File: {file_path}\n\nError formatting diff: {str(e)}\n"
+            logger.error(f"Error formatting compact diff for {parsed.file_name}: {str(e)}")
+            return f"Error formatting diff: {str(e)}"
     
-    def _split_diff_into_hunks(self, pr_diff: str) -> List[str]:
+    @staticmethod
+    def _write_compact_hunk(output: List[str], hunk: DiffHunk, keep_lines: int) -> None:
         """
-        Split a raw git diff string into individual hunks.
+        Append one hunk in compact layout to the output buffer.
         
         Args:
-            pr_diff: Raw git diff string
+            output: Output buffer
+            hunk: Parsed hunk
+            keep_lines: Unchanged lines kept next to each change when collapsing a run
+        """
+        output.append(hunk.header.rstrip())
+        
+        # Pending unchanged run: formatted lines plus the new line number of its first line
+        run: List[str] = []
+        run_start = hunk.new_start
+        seen_change = False
+        old_line_num = hunk.old_start
+        new_line_num = hunk.new_start
+        
+        def flush_run(trailing: bool) -> None:
+            head = keep_lines if seen_change else 0
+            tail = 0 if trailing else keep_lines
+            if len(run) <= head + tail + 1:
+                output.extend(run)
+            else:
+                output.extend(run[:head])
+                output.append(f"... (lines {run_start + head}-{run_start + len(run) - tail - 1} unchanged)")
+                if tail:
+                    output.extend(run[-tail:])
+            run.clear()
+        
+        for line in hunk.lines:
+            if not line:
+                continue
+            first = line[0]
+            if first == ' ':
+                if not run:
+                    run_start = new_line_num
+                run.append(f"{new_line_num}  {line[1:].rstrip()}")
+                old_line_num += 1
+                new_line_num += 1
+            elif first == '-' or first == '+':
+                if run:
+                    flush_run(trailing=False)
+                seen_change = True
+                if first == '-':
+                    output.append(f"{old_line_num}- {line[1:].rstrip()}")
+                    old_line_num += 1
+                else:
+                    output.append(f"{new_line_num}+ {line[1:].rstrip()}")
+                    new_line_num += 1
+        
+        if run:
+            flush_run(trailing=True)
+    
+    def format_diff_for_llm(self, diff_hunks: List[str], file_path: str = "") -> str:
+        """
+        Format git diff hunks into LLM-friendly format with clear line numbers.
+        
+        Args:
+            diff_hunks: List of raw diff hunk strings
+            file_path: Path to the file being reviewed
             
         Returns:
-            List of individual hunk strings
+            Formatted diff for LLM review
         """
-        try:
-            lines = pr_diff.split('\n')
-            hunks = []
-            current_hunk = []
-            
-            for line in lines:
-                # Check if this line starts a new hunk
-                if line.startswith('@@'):
-                    # If we have a current hunk, save it
-                    if current_hunk:
-                        hunks.append('\n'.join(current_hunk))
-                        current_hunk = []
-                    # Start new hunk with the header line
-                    current_hunk.append(line)
-                elif current_hunk:  # We're inside a hunk
-                    current_hunk.append(line)
-                # Skip lines before the first hunk (like diff --git, index, ---, +++)
-            
-            # Don't forget the last hunk
-            if current_hunk:
-                hunks.append('\n'.join(current_hunk))
-            
-            return hunks
-            
-        except Exception as e:
-            logger.error(f"Error splitting diff into hunks: {str(e)}")
-            return []
-    
-    def _combine_and_sort_diff_lines(self, parsed: ParsedHunk) -> List[DiffLine]:
+        return self.format_parsed_diff(parse_hunks(file_path, diff_hunks or []))
+
+    def format_diff_for_llm_raw_diff(self, pr_diff: str, file_path: str = "") -> str:
         """
-        Combine and sort all diff lines by line number.
+        Format raw git diff string into LLM-friendly format with clear line numbers.
         
         Args:
-            parsed: Parsed hunk data
+            pr_diff: Raw git diff string (like prFileDiff from test.json)
+            file_path: Path to the file being reviewed
             
         Returns:
-            Sorted list of diff lines
+            Formatted diff for LLM review
+        """
+        return self.format_parsed_diff(parse_raw_diff(file_path, pr_diff))
+
+    @staticmethod
+    def _write_hunk(output: List[str], hunk: DiffHunk, hunk_index: int) -> None:
         """
-        all_lines = []
+        Walk one hunk and append its formatted lines to the output buffer.
         
-        # Add context lines
-        for line in parsed.context_lines:
-            all_lines.append(DiffLine(
-                line_num=line['new_line'],
-                content=line['content'],
-                line_type='context',
-                marker='  '
-            ))
+        Context and added lines are numbered on the new side, deleted lines on the
+        old side. Each kind is already in ascending order as it is read, so the
+        display order comes from a three-way merge instead of a sort; on equal line
+        numbers context comes first, then deleted, then added.
         
-        # Add deleted lines
-        for line in parsed.old_lines:
-            all_lines.append(DiffLine(
-                line_num=line['old_line'],
-                content=line['content'],
-                line_type='deleted',
-                marker='- '
-            ))
+        Args:
+            output: Output buffer
+            hunk: Parsed hunk
+            hunk_index: Index of the hunk in the file
+        """
+        if not hunk.is_valid:
+            output.extend([f"## Hunk {hunk_index + 1} - Error", "Error: Invalid hunk header", ""])
+            return
         
-        # Add added lines
-        for line in parsed.new_lines:
-            all_lines.append(DiffLine(
-                line_num=line['new_line'],
-                content=line['content'],
-                line_type='added',
-                marker='+ '
-            ))
+        # Parallel per-kind buffers of line numbers and already formatted lines
+        context_nums: List[int] = []
+        context_text: List[str] = []
+        deleted_nums: List[int] = []
+        deleted_text: List[str] = []
+        added_nums: List[int] = []
+        added_text: List[str] = []
+        old_line_num = hunk.old_start
+        new_line_num = hunk.new_start
         
-        # Sort by line number
-        all_lines.sort(key=lambda x: x.line_num)
-        return all_lines
+        for line in hunk.lines:
+            if not line:
+                continue
+            first = line[0]
+            if first == ' ':
+                context_nums.append(new_line_num)
+                context_text.append(f"{new_line_num:4d}   {line[1:]}")
+                old_line_num += 1
+                new_line_num += 1
+            elif first == '-':
+                deleted_nums.append(old_line_num)
+                deleted_text.append(f"{old_line_num:4d} - {line[1:]}")
+                old_line_num += 1
+            elif first == '+':
+                added_nums.append(new_line_num)
+                added_text.append(f"{new_line_num:4d} + {line[1:]}")
+                new_line_num += 1
+        
+        old_end = hunk.old_start + hunk.old_count - 1 if hunk.old_count > 0 else hunk.old_start
+        new_end = hunk.new_start + hunk.new_count - 1 if hunk.new_count > 0 else hunk.new_start
+        output.extend([f"## Hunk {hunk_index + 1}", f"**Changes:** Lines {hunk.old_start}-{old_end} → {hunk.new_start}-{new_end}", "", "```diff"])
+        
+        if not deleted_nums and not added_nums:
+            output.extend(context_text)
+        else:
+            context_len, deleted_len, added_len = len(context_nums), len(deleted_nums), len(added_nums)
+            ci = di = ai = 0
+            while ci < context_len or di < deleted_len or ai < added_len:
+                context_num = context_nums[ci] if ci < context_len else None
+                deleted_num = deleted_nums[di] if di < deleted_len else None
+                added_num = added_nums[ai] if ai < added_len else None
+                if context_num is not None and (deleted_num is None or context_num <= deleted_num) and (added_num is None or context_num <= added_num):
+                    output.append(context_text[ci])
+                    ci += 1
+                elif deleted_num is not None and (added_num is None or deleted_num <= added_num):
+                    output.append(deleted_text[di])
+                    di += 1
+                else:
+                    output.append(added_text[ai])
+                    ai += 1
+        
+        output.extend(["```", ""])
+        
+        # Summary of changes in this hunk
+        if deleted_nums or added_nums:
+            output.append("**Summary of changes in this hunk:**")
+            if deleted_nums:
+                output.append(f"- {len(deleted_nums)} line(s) deleted")
+            if added_nums:
+                output.append(f"- {len(added_nums)} line(s) added")
+            output.append("")
+    
+    def _split_diff_into_hunks(self, pr_diff: str) -> List[str]:
+        """
+        Split a raw git diff string into individual hunks.
+        
+        Args:
+            pr_diff: Raw git diff string
+            
+        Returns:
+            List of individual hunk strings
+        """
+        try:
+            return parse_raw_diff("", pr_diff).hunk_texts
+            
+        except Exception as e:
+            logger.error(f"Error splitting diff into hunks: {str(e)}")
+            return []
     
     def create_llm_review_context(
         self, 
@@ -428,21 +455,34 @@ def parse_diff_hunk(hunk: str) -> Dict[str, Any]:
     }
 
 
+def format_parsed_diff(parsed: ParsedDiff, profile: str = "standard") -> str:
+    """Format a parsed diff into LLM-friendly format using the given render profile"""
+    return _formatter_service.format_parsed_diff(parsed, profile)
+
+
 def format_diff_for_llm(diff_hunks: List[str], file_path: str = "") -> str:
     """
     Legacy function - Format git diff hunks into LLM-friendly format.
-    Use DiffFormatterService.format_diff_for_llm() for new code.
+    Use DiffFormatterService.format_parsed_diff() for new code.
     """
     return _formatter_service.format_diff_for_llm(diff_hunks, file_path)
 
 def format_diff_for_llm_raw_diff(pr_diff: str, file_path: str = "") -> str:
     """
-    Legacy function - Format git diff hunks into LLM-friendly format.
-    Use DiffFormatterService.format_diff_for_llm() for new code.
+    Legacy function - Format a raw git diff into LLM-friendly format.
+    Use DiffFormatterService.format_parsed_diff() for new code.
     """
     return _formatter_service.format_diff_for_llm_raw_diff(pr_diff, file_path)
 
 
+def split_diff_into_hunks(pr_diff: str) -> List[str]:
+    """
+    Split a raw git diff string into individual hunks,
+    dropping the file headers that precede the first hunk.
+    """
+    return _formatter_service._split_diff_into_hunks(pr_diff)
+
+
 def create_llm_review_context(file_path: str, diff_hunks: List[str], file_content_before: str = "") -> str:
     """
     Legacy function - Create a comprehensive context for LLM review.
@@ -0,0 +1,296 @@
+"""
+Incremental, item-level parser for JSON arrays of objects in LLM output.
+Recovers every complete object from fenced, prose-wrapped, truncated or partly
+malformed arrays, from complete text or from text fed as it streams in.
+"""
+
+import re
+import json
+import logging
+from typing import List, Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+DECODER = json.JSONDecoder(strict=False)
+# Next character that changes nesting or string state outside of a string
+STRUCTURE_RE = re.compile(r'[{}\[\]"]')
+# Next quote or escape inside a string
+STRING_RE = re.compile(r'["\\]')
+# Start of the array holding the items: '[' followed by an object or by the closing bracket
+ARRAY_START_RE = re.compile(r'\[\s*(?=[{\]])')
+TRAILING_COMMA_RE = re.compile(r',\s*([}\]])')
+# Next item start or end of the array, used to skip values that are not objects
+NEXT_ITEM_RE = re.compile(r'[{\]]')
+# Boundary between two items, used to resynchronize after a malformed item
+ITEM_BOUNDARY_RE = re.compile(r'\}\s*,\s*(?=\{)')
+# Separator or closing bracket that follows an item
+ITEM_END_RE = re.compile(r'\s*[,\]]')
+
+
+class JSONArrayStreamParser:
+    """
+    Parser that yields the objects of a JSON array as soon as each one is complete.
+
+    Feed text with feed() as it arrives and call close() at the end. Objects are
+    decoded one at a time, so a malformed item is skipped without losing its
+    neighbours and a truncated tail only loses the unfinished item.
+    """
+
+    SEEKING, IN_ARRAY, DONE = "seeking", "in_array", "done"
+
+    def __init__(self, key: Optional[str] = None):
+        """
+        Create a parser.
+
+        Args:
+            key: Object key holding the array, for output such as tool input where the
+                array sits next to other values; None reads the first array of objects
+        """
+        self.buffer = ""
+        # Inside valid JSON, a quoted key followed by a colon cannot be part of a string value
+        self._key_token = json.dumps(key) if key is not None else None
+        self._start_re = re.compile(re.escape(self._key_token) + r'\s*:\s*\[') if key is not None else ARRAY_START_RE
+        self.pos = 0
+        self.state = self.SEEKING
+        self.items: List[Dict[str, Any]] = []
+        self.malformed_items = 0
+        self.truncated = False
+        # Resumable scan state of the object being read
+        self._object_start: Optional[int] = None
+        self._scan_pos = 0
+        self._depth = 0
+        self._in_string = False
+
+    @property
+    def complete(self) -> bool:
+        """Whether the closing bracket of the array was seen"""
+        return self.state == self.DONE
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        """
+        Add text to the parser.
+
+        Args:
+            text: Next piece of the model output
+
+        Returns:
+            Objects completed by this piece of text
+        """
+        if self.state == self.DONE or not text:
+            return []
+        self.buffer += text
+        new_items = self._drain(final=False)
+        self._compact()
+        return new_items
+
+    def close(self, text: str = "") -> List[Dict[str, Any]]:
+        """
+        Finish parsing once all text has been fed.
+
+        Args:
+            text: Last piece of the model output, or the whole output when it is not streamed
+
+        Returns:
+            Objects completed while finishing
+        """
+        if self.state == self.DONE:
+            return []
+        self.buffer += text
+        items = self._drain(final=True)
+        if self.state == self.IN_ARRAY:
+            self.truncated = True
+        return items
+
+    def _drain(self, final: bool) -> List[Dict[str, Any]]:
+        """Read as many complete items from the buffer as possible"""
+        new_items: List[Dict[str, Any]] = []
+
+        while True:
+            if self.state == self.SEEKING:
+                match = self._start_re.search(self.buffer, self.pos)
+                if not match:
+                    self.pos = self._seek_resume_pos()
+                    return new_items
+                self.state = self.IN_ARRAY
+                self.pos = match.end()
+                continue
+
+            if self.state == self.DONE:
+                return new_items
+
+            if self._object_start is None:
+                self.pos = self._skip_separators(self.pos)
+                if self.pos >= len(self.buffer):
+                    return new_items
+                char = self.buffer[self.pos]
+                if char == "]":
+                    self.state = self.DONE
+                    self.pos += 1
+                    return new_items
+                if char != "{":
+                    # Not an object: skip to the next item start or the end of the array
+                    next_token = NEXT_ITEM_RE.search(self.buffer, self.pos + 1)
+                    if not next_token:
+                        self.pos = len(self.buffer)
+                        return new_items
+                    self.pos = next_token.start()
+                    continue
+                if final:
+                    # Complete text: let the C decoder read well-formed items directly
+                    try:
+                        item, end = DECODER.raw_decode(self.buffer, self.pos)
+                    except json.JSONDecodeError:
+                        item = None
+                    if isinstance(item, dict):
+                        self.items.append(item)
+                        new_items.append(item)
+                        self.pos = end
+                        continue
+                self._object_start = self.pos
+                self._scan_pos = self.pos
+                self._depth = 0
+                self._in_string = False
+
+            end = self._scan_object()
+            if end is None:
+                # A truncated tail only loses its unfinished item
+                return new_items
+
+            item = self._decode(self.buffer[self._object_start:end])
+            if item is not None:
+                self.items.append(item)
+                new_items.append(item)
+                self.pos = end
+            else:
+                self.malformed_items += 1
+                self.pos = self._resync(self._object_start, end)
+            self._object_start = None
+
+    def _seek_resume_pos(self) -> int:
+        """Offset the next search for the array starts at, keeping a possibly unfinished start"""
+        if self._key_token is None:
+            # Keep a possible '[' at the end for the next piece
+            last_bracket = self.buffer.rfind("[", self.pos)
+            return last_bracket if last_bracket >= 0 else len(self.buffer)
+        # Keep the key waiting for its '[' or a partial key at the end for the next piece
+        last_key = self.buffer.rfind(self._key_token, self.pos)
+        if last_key >= 0:
+            return last_key
+        return max(len(self.buffer) - len(self._key_token) + 1, self.pos)
+
+    def _compact(self) -> None:
+        """Drop consumed text so streaming many small pieces stays linear"""
+        keep_from = self.pos if self._object_start is None else self._object_start
+        if keep_from < 65536:
+            return
+        self.buffer = self.buffer[keep_from:]
+        self.pos -= keep_from
+        self._scan_pos = max(self._scan_pos - keep_from, 0)
+        if self._object_start is not None:
+            self._object_start -= keep_from
+
+    def _resync(self, start: int, end: int) -> int:
+        """
+        Find where reading resumes after a malformed item.
+
+        A damaged quote makes the scan swallow the items that follow, so reading
+        resumes at the first item boundary inside the scanned text from which
+        well-formed items run through the scanned end. Boundaries inside the
+        strings of the damaged item do not and are skipped.
+
+        Args:
+            start: Offset of the malformed item
+            end: Offset just past its scanned end
+
+        Returns:
+            Offset to resume reading at
+        """
+        for boundary in ITEM_BOUNDARY_RE.finditer(self.buffer, start + 1, end):
+            pos = boundary.end()
+            while pos < end:
+                try:
+                    item, pos = DECODER.raw_decode(self.buffer, pos)
+                except json.JSONDecodeError:
+                    break
+                separator = ITEM_END_RE.match(self.buffer, pos)
+                if not isinstance(item, dict) or not separator:
+                    break
+                pos = self._skip_separators(separator.end())
+            else:
+                return boundary.end()
+        return end
+
+    def _skip_separators(self, pos: int) -> int:
+        """Skip whitespace and commas between items"""
+        length = len(self.buffer)
+        while pos < length and (self.buffer[pos].isspace() or self.buffer[pos] == ","):
+            pos += 1
+        return pos
+
+    def _scan_object(self) -> Optional[int]:
+        """
+        Continue scanning the current object for its closing brace.
+
+        Returns:
+            Offset just past the object, None if the buffer ends first
+        """
+        buffer = self.buffer
+        pos = self._scan_pos
+        while True:
+            if self._in_string:
+                match = STRING_RE.search(buffer, pos)
+                if not match:
+                    self._scan_pos = len(buffer)
+                    return None
+                if match.group() == "\\":
+                    if match.end() >= len(buffer):
+                        # Escape split across pieces: rescan it with the next piece
+                        self._scan_pos = match.start()
+                        return None
+                    pos = match.end() + 1
+                    continue
+                self._in_string = False
+                pos = match.end()
+                continue
+
+            match = STRUCTURE_RE.search(buffer, pos)
+            if not match:
+                self._scan_pos = len(buffer)
+                return None
+            char = match.group()
+            pos = match.end()
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            else:
+                self._depth -= 1
+                if self._depth == 0:
+                    return pos
+
+    @staticmethod
+    def _decode(text: str) -> Optional[Dict[str, Any]]:
+        """Decode one object, repairing trailing commas and raw control characters"""
+        for candidate in (text, TRAILING_COMMA_RE.sub(r"\1", text)):
+            try:
+                item = json.loads(candidate, strict=False)
+            except json.JSONDecodeError:
+                continue
+            return item if isinstance(item, dict) else None
+        return None
+
+
+def salvage_json_array(text: str, key: Optional[str] = None) -> JSONArrayStreamParser:
+    """
+    Parse all recoverable objects of a JSON array from complete text.
+
+    Args:
+        text: Model output that contains a JSON array of objects
+        key: Object key holding the array, None for the first array of objects
+
+    Returns:
+        Closed parser; its items, malformed_items, truncated and complete attributes describe the result
+    """
+    parser = JSONArrayStreamParser(key)
+    parser.close(text or "")
+    return parser
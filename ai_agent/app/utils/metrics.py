@@ -0,0 +1,233 @@
+"""
+In-process metrics exposed in the Prometheus text format.
+Counters and histograms are dictionaries keyed by label values and updated under a
+lock, so recording costs about a microsecond and can stay on in production; the
+/metrics endpoint renders them on request.
+"""
+
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Seconds, from a cheap parsing step to a long LLM call
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+# Prompt characters, about four per token
+SIZE_BUCKETS = (1000, 4000, 16000, 64000, 128000, 256000, 400000, 600000, 1000000)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    """Render a label set"""
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    """Metric family with a fixed set of label names"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], object] = {}
+
+    def _key(self, labels: Dict[str, object]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in sorted(values):
+            lines.extend(self._render_sample(key, value))
+        return lines
+
+    def _render_sample(self, key: Tuple[str, ...], value) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Current value read from a function when the metrics are rendered"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, function: Callable[[], float]):
+        super().__init__(name, documentation)
+        self.function = function
+
+    def render(self) -> List[str]:
+        try:
+            value = self.function()
+        except Exception:
+            return []
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}", f"{self.name} {_format_value(value)}"]
+
+
+class Histogram(_Metric):
+    """Distribution of observed values over fixed buckets"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket counts with a final +Inf bucket, then sum and count
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """Observe the duration of the enclosed block, including awaits inside it"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _render_sample(self, key: Tuple[str, ...], value) -> List[str]:
+        bucket_counts, total, count = value
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), bucket_counts):
+            cumulative += bucket_count
+            labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Holds the metric families of the process and renders them"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name: str, documentation: str, function: Callable[[], float]) -> Gauge:
+        return self.register(Gauge(name, documentation, function))
+
+    def render(self) -> str:
+        """
+        Render every metric.
+
+        Returns:
+            Metrics in the Prometheus text exposition format 0.0.4
+        """
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Global registry and the metrics of the agent
+registry = MetricsRegistry()
+
+STAGE_DURATION = registry.histogram(
+    "pullsight_stage_duration_seconds",
+    "Duration of processing stages: decode, validation, filtering, content_filter, diff_analysis, "
+    "git_ingestion, chunking, diff_formatting, review_parse, summary_aggregation",
+    ["stage"]
+)
+QUEUE_WAIT = registry.histogram(
+    "pullsight_queue_wait_seconds",
+    "Time work waited before it started: accepted requests before processing, callbacks before delivery",
+    ["queue"]
+)
+PROMPT_SIZE = registry.histogram(
+    "pullsight_prompt_size_chars",
+    "Characters of the prompts sent to the LLM",
+    ["operation"],
+    SIZE_BUCKETS
+)
+LLM_DURATION = registry.histogram(
+    "pullsight_llm_request_duration_seconds",
+    "Total duration of LLM requests",
+    ["operation", "model"]
+)
+LLM_TIME_TO_FIRST_TOKEN = registry.histogram(
+    "pullsight_llm_time_to_first_token_seconds",
+    "Time until the first streamed output of LLM requests",
+    ["operation", "model"]
+)
+LLM_TOKENS = registry.counter(
+    "pullsight_llm_tokens_total",
+    "LLM tokens used",
+    ["model", "direction"]
+)
+BACKEND_POST_DURATION = registry.histogram(
+    "pullsight_backend_post_duration_seconds",
+    "Duration of callback posts to the backend",
+    ["endpoint", "outcome"]
+)
+REQUESTS = registry.counter(
+    "pullsight_requests_total",
+    "Review requests received by outcome",
+    ["outcome"]
+)
+ERRORS = registry.counter(
+    "pullsight_errors_total",
+    "Errors by stage and exception class",
+    ["stage", "error"]
+)
+
+
+def record_error(stage: str, error: BaseException) -> None:
+    """Count an error of a stage by its exception class"""
+    ERRORS.inc(stage=stage, error=type(error).__name__)
+
+
+def record_llm_usage(model: Optional[str], usage: Optional[Dict]) -> None:
+    """Count the input and output tokens of an LLM response"""
+    if not usage:
+        return
+    for direction in ("input", "output"):
+        tokens = usage.get(f"{direction}_tokens") or 0
+        if tokens:
+            LLM_TOKENS.inc(tokens, model=model or "unknown", direction=direction)
@@ -0,0 +1,364 @@
+"""
+Canonical parsed representation of a file's diff.
+Each file is parsed once at ingestion and the result is shared by the chunker,
+the prompt builders, comment anchoring and metrics.
+"""
+
+import re
+import bisect
+import logging
+from typing import List, Dict, Any, Optional, Tuple
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+HUNK_HEADER_RE = re.compile(r'@@ -(\d+),?(\d*) \+(\d+),?(\d*) @@')
+
+
+@dataclass(slots=True)
+class DiffHunk:
+    """A single diff hunk: its header, parsed ranges and raw body lines (with +/-/space markers)"""
+    header: str
+    lines: List[str]
+    old_start: int = 0
+    old_count: int = 0
+    new_start: int = 0
+    new_count: int = 0
+    is_valid: bool = True
+
+    @property
+    def text(self) -> str:
+        """Raw hunk text, header first"""
+        return "\n".join([self.header] + self.lines)
+
+    @property
+    def old_range(self) -> Tuple[int, int]:
+        """Before-change line range touched by the hunk (pure insertions anchor at the insertion point)"""
+        old_end = self.old_start + self.old_count - 1 if self.old_count > 0 else self.old_start
+        return max(self.old_start, 1), max(old_end, 1)
+
+    @property
+    def new_range(self) -> Tuple[int, int]:
+        """After-change line range covered by the hunk (pure deletions anchor at the deletion point)"""
+        new_end = self.new_start + self.new_count - 1 if self.new_count > 0 else self.new_start
+        return max(self.new_start, 1), max(new_end, 1)
+
+
+@dataclass
+class ParsedDiff:
+    """All hunks of one file plus counts derived while parsing"""
+    file_name: str
+    hunks: List[DiffHunk] = field(default_factory=list)
+    additions: int = 0
+    deletions: int = 0
+    _text: Optional[str] = field(default=None, repr=False)
+    _line_index: Optional["CommentableLineIndex"] = field(default=None, repr=False)
+
+    @property
+    def text(self) -> str:
+        """Unified diff text of all hunks"""
+        if self._text is None:
+            self._text = "\n".join(hunk.text for hunk in self.hunks)
+        return self._text
+
+    @property
+    def line_index(self) -> "CommentableLineIndex":
+        """Index of the after-change lines a review comment can be attached to"""
+        if self._line_index is None:
+            self._line_index = CommentableLineIndex(self)
+        return self._line_index
+
+    @property
+    def hunk_texts(self) -> List[str]:
+        """Raw text of every hunk"""
+        return [hunk.text for hunk in self.hunks]
+
+    def changed_lines(self) -> List[str]:
+        """Content of every added or deleted line, markers stripped"""
+        return [line[1:] for hunk in self.hunks for line in hunk.lines if line[:1] in ('+', '-')]
+
+    def new_lines(self, start: int, end: int) -> Dict[int, str]:
+        """
+        Get the after-change content of lines shown in the diff.
+
+        Args:
+            start: First line number in the changed file
+            end: Last line number in the changed file
+
+        Returns:
+            Mapping of line number to content for added and context lines in the range
+        """
+        lines: Dict[int, str] = {}
+        for hunk in self.hunks:
+            if not hunk.is_valid or hunk.new_start > end:
+                continue
+            new_line_num = hunk.new_start
+            for line in hunk.lines:
+                if line[:1] in (' ', '+'):
+                    if start <= new_line_num <= end:
+                        lines[new_line_num] = line[1:]
+                    new_line_num += 1
+                    if new_line_num > end:
+                        break
+        return lines
+
+    def find_hunk(self, new_line: int) -> Optional[DiffHunk]:
+        """
+        Find the hunk whose after-change range contains a line.
+
+        Args:
+            new_line: Line number in the changed file
+
+        Returns:
+            The containing hunk, None if the line is outside the diff
+        """
+        for hunk in self.hunks:
+            if hunk.is_valid:
+                start, end = hunk.new_range
+                if start <= new_line <= end:
+                    return hunk
+        return None
+
+
+class CommentableLineIndex:
+    """
+    Sorted, merged after-change line intervals of a file's hunks.
+    Review comments can only be attached to lines inside these intervals, and a
+    multi-line comment must stay within one of them.
+    """
+
+    MIN_SNIPPET_LINE_CHARS = 4
+
+    def __init__(self, parsed: "ParsedDiff"):
+        """
+        Build the index from a parsed diff.
+
+        Args:
+            parsed: Parsed diff of the file
+        """
+        self._parsed = parsed
+        self._contents: Optional[Dict[str, List[int]]] = None
+        self._lines: Dict[int, str] = {}
+        self.intervals: List[Tuple[int, int]] = []
+        for start, end in sorted(hunk.new_range for hunk in parsed.hunks if hunk.is_valid and hunk.new_count > 0):
+            if self.intervals and start <= self.intervals[-1][1] + 1:
+                self.intervals[-1] = (self.intervals[-1][0], max(self.intervals[-1][1], end))
+            else:
+                self.intervals.append((start, end))
+        self._starts = [start for start, _ in self.intervals]
+
+    def interval_of(self, line: int) -> Optional[Tuple[int, int]]:
+        """
+        Find the interval containing a line in O(log n).
+
+        Args:
+            line: Line number in the changed file
+
+        Returns:
+            (start, end) of the containing interval, None if the line cannot be commented on
+        """
+        position = bisect.bisect_right(self._starts, line) - 1
+        if position >= 0 and line <= self.intervals[position][1]:
+            return self.intervals[position]
+        return None
+
+    def find_snippet(self, snippet: Optional[str], near_line: int, max_distance: int) -> Optional[int]:
+        """
+        Locate a code snippet in the after-change lines of the diff.
+
+        Candidates are the lines equal (ignoring surrounding whitespace) to the snippet's first
+        distinctive line; the candidate matching most following snippet lines wins, then the
+        one nearest to near_line.
+
+        Args:
+            snippet: Code snippet quoted by a review comment
+            near_line: Line the comment claims the snippet starts at
+            max_distance: Maximum distance between near_line and the snippet
+
+        Returns:
+            Line number where the snippet starts, None if it is not found close enough
+        """
+        snippet_lines = [line.strip() for line in (snippet or "").split("\n")]
+        anchor_offset = next(
+            (offset for offset, line in enumerate(snippet_lines) if len(line) >= self.MIN_SNIPPET_LINE_CHARS),
+            None
+        )
+        if anchor_offset is None:
+            return None
+
+        if self._contents is None:
+            self._lines = {
+                line_num: content
+                for start, end in self.intervals
+                for line_num, content in self._parsed.new_lines(start, end).items()
+            }
+            self._contents = {}
+            for line_num, content in sorted(self._lines.items()):
+                self._contents.setdefault(content.strip(), []).append(line_num)
+
+        best = None
+        for line_num in self._contents.get(snippet_lines[anchor_offset], []):
+            start = line_num - anchor_offset
+            if abs(start - near_line) > max_distance:
+                continue
+            matched = 0
+            for offset in range(anchor_offset, len(snippet_lines)):
+                content = self._lines.get(start + offset)
+                if content is None or content.strip() != snippet_lines[offset]:
+                    break
+                matched += 1
+            key = (-matched, abs(start - near_line))
+            if best is None or key < best[0]:
+                best = (key, start)
+
+        return best[1] if best else None
+
+
+class DiffParsingService:
+    """Service for parsing file diffs into their canonical representation"""
+
+    def parse_hunk(self, hunk: str) -> DiffHunk:
+        """
+        Parse a raw hunk string.
+
+        Args:
+            hunk: Raw diff hunk string
+
+        Returns:
+            DiffHunk, marked invalid if the header cannot be parsed
+        """
+        lines = hunk.split('\n')
+        return self._build_hunk(lines[0], lines[1:])
+
+    def parse_hunks(self, file_name: str, hunks: List[str]) -> ParsedDiff:
+        """
+        Parse a list of raw hunk strings.
+
+        Args:
+            file_name: Path of the file
+            hunks: List of raw diff hunk strings
+
+        Returns:
+            ParsedDiff for the file
+        """
+        return self.build_parsed_diff(file_name, [self.parse_hunk(hunk) for hunk in hunks])
+
+    def parse_raw_diff(self, file_name: str, pr_diff: str) -> ParsedDiff:
+        """
+        Parse a raw git diff string, skipping the file headers before the first hunk.
+
+        Args:
+            file_name: Path of the file
+            pr_diff: Raw git diff string
+
+        Returns:
+            ParsedDiff for the file
+        """
+        hunks = []
+        header = None
+        body: List[str] = []
+
+        for line in (pr_diff or "").split('\n'):
+            if line.startswith('@@'):
+                if header is not None:
+                    hunks.append(self._build_hunk(header, body))
+                header, body = line, []
+            elif header is not None:
+                body.append(line)
+
+        if header is not None:
+            hunks.append(self._build_hunk(header, body))
+
+        return self.build_parsed_diff(file_name, hunks)
+
+    def parse_file(self, file_info: Dict[str, Any]) -> ParsedDiff:
+        """
+        Parse a PR file's diff from its hunks, or from its raw diff if it has no hunks.
+
+        Args:
+            file_info: File information dictionary
+
+        Returns:
+            ParsedDiff for the file
+        """
+        file_name = file_info.get("prFileName", "unknown")
+        try:
+            if file_info.get("prFileDiffHunks"):
+                return self.parse_hunks(file_name, file_info["prFileDiffHunks"])
+            return self.parse_raw_diff(file_name, file_info.get("prFileDiff", ""))
+        except Exception as e:
+            logger.error(f"Error parsing diff for {file_name}: {str(e)}")
+            return ParsedDiff(file_name)
+
+    @staticmethod
+    def build_parsed_diff(file_name: str, hunks: List[DiffHunk]) -> ParsedDiff:
+        """
+        Build a ParsedDiff from hunks, counting added and deleted lines.
+
+        Args:
+            file_name: Path of the file
+            hunks: Parsed hunks
+
+        Returns:
+            ParsedDiff for the file
+        """
+        additions = deletions = 0
+        for hunk in hunks:
+            for line in hunk.lines:
+                if line.startswith('+'):
+                    additions += 1
+                elif line.startswith('-'):
+                    deletions += 1
+        return ParsedDiff(file_name, hunks, additions, deletions)
+
+    @staticmethod
+    def _build_hunk(header: str, lines: List[str]) -> DiffHunk:
+        """Build a hunk from its header line and body lines"""
+        header_match = HUNK_HEADER_RE.match(header)
+        if not header_match:
+            return DiffHunk(header, lines, is_valid=False)
+
+        return DiffHunk(
+            header,
+            lines,
+            old_start=int(header_match.group(1)),
+            old_count=int(header_match.group(2)) if header_match.group(2) else 1,
+            new_start=int(header_match.group(3)),
+            new_count=int(header_match.group(4)) if header_match.group(4) else 1
+        )
+
+
+# Global service instance
+_diff_parsing_service = DiffParsingService()
+
+
+def get_parsed_diff(file_info: Dict[str, Any]) -> ParsedDiff:
+    """
+    Get the parsed diff of a PR file, parsing and attaching it on first use.
+
+    Args:
+        file_info: File information dictionary
+
+    Returns:
+        ParsedDiff stored under "parsedDiff"
+    """
+    parsed = file_info.get("parsedDiff")
+    if parsed is None:
+        parsed = _diff_parsing_service.parse_file(file_info)
+        file_info["parsedDiff"] = parsed
+    return parsed
+
+
+def parse_hunks(file_name: str, hunks: List[str]) -> ParsedDiff:
+    """Parse a list of raw hunk strings"""
+    return _diff_parsing_service.parse_hunks(file_name, hunks)
+
+
+def parse_raw_diff(file_name: str, pr_diff: str) -> ParsedDiff:
+    """Parse a raw git diff string"""
+    return _diff_parsing_service.parse_raw_diff(file_name, pr_diff)
+
+
+def build_parsed_diff(file_name: str, hunks: List[DiffHunk]) -> ParsedDiff:
+    """Build a ParsedDiff from already parsed hunks"""
+    return _diff_parsing_service.build_parsed_diff(file_name, hunks)
@@ -0,0 +1,208 @@
+"""
+Decoding of PR review request bodies into typed payload models.
+Bodies are parsed by pydantic-core straight from bytes, either whole or
+incrementally as they arrive, validating each file object on its own.
+"""
+
+import re
+import json
+import codecs
+import logging
+from json.decoder import scanstring
+from typing import List, Optional
+from pydantic import ValidationError
+from app.models.pr_event import PRPayloadV2, PRFilePayload
+from app.utils.json_salvage import STRUCTURE_RE
+
+logger = logging.getLogger(__name__)
+
+# Start of the files array; a quote inside a JSON string is escaped, so this only matches a key
+FILES_ARRAY_RE = re.compile(r'"prFiles"\s*:\s*\[')
+
+
+class PRPayloadStreamDecoder:
+    """
+    Decoder that validates the files of a PR payload while the body is still arriving.
+
+    The text before and after the prFiles array is kept and validated at close();
+    each file object is validated as soon as its closing brace arrives and its text
+    is released, so the whole body is never held as text and as objects at once.
+    Validation errors raise pydantic's ValidationError, as PRPayloadV2.model_validate_json does.
+    """
+
+    SEEKING, IN_FILES, AFTER_FILES = "seeking", "in_files", "after_files"
+    COMPACT_THRESHOLD = 1 << 20
+
+    def __init__(self):
+        self._text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.pos = 0
+        self.state = self.SEEKING
+        self.files: List[PRFilePayload] = []
+        self._envelope_prefix = ""
+        # Resumable scan state of the file object being read
+        self._object_start: Optional[int] = None
+        self._scan_pos = 0
+        self._depth = 0
+
+    def feed(self, chunk: bytes) -> None:
+        """
+        Add the next piece of the request body.
+
+        Args:
+            chunk: Raw body bytes
+        """
+        self.buffer += self._text_decoder.decode(chunk)
+        self._drain()
+
+    def close(self) -> PRPayloadV2:
+        """
+        Finish decoding once the whole body has been fed.
+
+        Returns:
+            Validated payload
+        """
+        self.buffer += self._text_decoder.decode(b"", final=True)
+        self._drain()
+        if self.state == self.SEEKING:
+            # No files array: the body is small enough to validate in one go
+            return PRPayloadV2.model_validate_json(self.buffer)
+        if self.state == self.IN_FILES:
+            raise ValueError("Request body ended inside the prFiles array")
+
+        payload = PRPayloadV2.model_validate_json(self._envelope_prefix + "[]" + self.buffer[self.pos:])
+        payload.pullRequest.prFiles = self.files
+        return payload
+
+    def _drain(self) -> None:
+        """Validate every file object completed so far"""
+        if self.state == self.SEEKING:
+            match = FILES_ARRAY_RE.search(self.buffer, self.pos)
+            if not match:
+                # Resume the search near the end, where a key may be split across pieces
+                self.pos = max(len(self.buffer) - 64, 0)
+                return
+            self._envelope_prefix = self.buffer[:match.start()] + '"prFiles":'
+            self.state = self.IN_FILES
+            self.pos = match.end()
+
+        while self.state == self.IN_FILES:
+            if self._object_start is None:
+                self.pos = self._skip_separators(self.pos)
+                if self.pos >= len(self.buffer):
+                    break
+                char = self.buffer[self.pos]
+                if char == "]":
+                    self.state = self.AFTER_FILES
+                    self.pos += 1
+                    break
+                if char != "{":
+                    raise ValueError(f"Unexpected character {char!r} in the prFiles array")
+                self._object_start = self._scan_pos = self.pos
+                self._depth = 0
+
+            end = self._scan_object()
+            if end is None:
+                break
+            self.files.append(self._validate_file(self.buffer[self._object_start:end]))
+            self.pos = end
+            self._object_start = None
+
+        self._compact()
+
+    def _validate_file(self, text: str) -> PRFilePayload:
+        """Validate one file object, reporting errors at their location in the whole payload"""
+        try:
+            return PRFilePayload.model_validate_json(text)
+        except ValidationError as e:
+            raise ValidationError.from_exception_data(PRPayloadV2.__name__, [
+                {
+                    "type": error["type"],
+                    "loc": ("pullRequest", "prFiles", len(self.files), *error["loc"]),
+                    "input": error["input"],
+                    **({"ctx": error["ctx"]} if "ctx" in error else {})
+                }
+                for error in e.errors(include_url=False)
+            ])
+
+    def _compact(self) -> None:
+        """Drop the text of validated files"""
+        if self.state != self.IN_FILES:
+            return
+        keep_from = self.pos if self._object_start is None else self._object_start
+        if keep_from < self.COMPACT_THRESHOLD:
+            return
+        self.buffer = self.buffer[keep_from:]
+        self.pos -= keep_from
+        self._scan_pos = max(self._scan_pos - keep_from, 0)
+        if self._object_start is not None:
+            self._object_start -= keep_from
+
+    def _skip_separators(self, pos: int) -> int:
+        """Skip whitespace and commas between file objects"""
+        length = len(self.buffer)
+        while pos < length and (self.buffer[pos].isspace() or self.buffer[pos] == ","):
+            pos += 1
+        return pos
+
+    def _scan_object(self) -> Optional[int]:
+        """
+        Continue scanning the current file object for its closing brace.
+        Strings are skipped by the C string scanner of the json module, since file
+        contents are long strings full of escapes.
+
+        Returns:
+            Offset just past the object, None if the buffer ends first
+        """
+        buffer = self.buffer
+        pos = self._scan_pos
+        while True:
+            match = STRUCTURE_RE.search(buffer, pos)
+            if not match:
+                self._scan_pos = len(buffer)
+                return None
+            char = match.group()
+            if char == '"':
+                end = None
+                # Without a closing quote the string is surely incomplete; this spares the
+                # decoder's unterminated-string error, which counts lines over the whole buffer
+                if buffer.find('"', match.end()) >= 0:
+                    try:
+                        _, end = scanstring(buffer, match.end(), False)
+                    except json.JSONDecodeError:
+                        pass
+                if end is None:
+                    # String not complete yet: rescan it with the next piece
+                    self._scan_pos = match.start()
+                    return None
+                pos = end
+                continue
+            pos = match.end()
+            if char in "{[":
+                self._depth += 1
+            else:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._scan_pos = pos
+                    return pos
+
+
+async def decode_pr_payload(body_stream, incremental: bool = True) -> PRPayloadV2:
+    """
+    Decode a PR review request body.
+
+    Args:
+        body_stream: Async iterator of body chunks, such as Request.stream()
+        incremental: Validate files while the body arrives instead of after reading it whole
+
+    Returns:
+        Validated payload
+    """
+    if not incremental:
+        body = b"".join([chunk async for chunk in body_stream])
+        return PRPayloadV2.model_validate_json(body)
+
+    decoder = PRPayloadStreamDecoder()
+    async for chunk in body_stream:
+        decoder.feed(chunk)
+    return decoder.close()
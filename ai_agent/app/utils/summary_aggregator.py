@@ -3,9 +3,12 @@ Summary aggregation utilities for combining multiple chunk summaries.
 Provides both service-oriented and legacy interfaces for backward compatibility.
 """
 
+import asyncio
 import logging
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Tuple, Optional
 from dataclasses import dataclass
+from app.utils.summary_metadata import SummaryMetadataService
+from config.settings import settings
 
 logger = logging.getLogger(__name__)
 
@@ -19,7 +22,45 @@ class AggregationContext:
 
 
 class SummaryAggregationService:
-    """Service for aggregating multiple chunk summaries into a single comprehensive summary"""
+    """
+    Service for aggregating multiple chunk summaries into a single comprehensive summary.
+    
+    Modes:
+    - flat: one prompt holding every chunk summary
+    - tree: summaries are merged in groups of fan_in, level by level, with the nodes of a
+      level aggregated concurrently; a failed node falls back to concatenating its own group
+    
+    No aggregation prompt exceeds token_budget; a flat prompt over budget is aggregated as a tree.
+    With structured merging the summary is assembled from the chunk summaries' sections
+    without an LLM call. Either way the effort totals are the ones computed from chunk metadata.
+    """
+    
+    DEFAULT_MODEL_INFO = "claude-opus-4-1-20250805"
+    
+    def __init__(
+        self,
+        mode: Optional[str] = None,
+        fan_in: Optional[int] = None,
+        token_budget: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+        merge_mode: Optional[str] = None
+    ):
+        """
+        Initialize the aggregation service.
+        
+        Args:
+            mode: "tree" or "flat", defaults to SUMMARY_AGGREGATION_MODE
+            fan_in: Summaries merged per tree node, defaults to SUMMARY_AGGREGATION_FAN_IN
+            token_budget: Maximum estimated tokens of one aggregation prompt
+            max_concurrency: Maximum aggregation requests in flight
+            merge_mode: "auto", "structured" or "llm", defaults to SUMMARY_MERGE_MODE
+        """
+        self.mode = mode or settings.SUMMARY_AGGREGATION_MODE
+        self.fan_in = max(fan_in or settings.SUMMARY_AGGREGATION_FAN_IN, 2)
+        self.token_budget = token_budget or settings.SUMMARY_AGGREGATION_TOKEN_BUDGET
+        self.max_concurrency = max(max_concurrency or settings.SUMMARY_AGGREGATION_CONCURRENCY, 1)
+        self.merge_mode = merge_mode or settings.SUMMARY_MERGE_MODE
+        self.metadata_service = SummaryMetadataService()
     
     async def aggregate_summaries(
         self, 
@@ -38,22 +79,42 @@ class SummaryAggregationService:
         Returns:
             Tuple of (aggregated_summary, usage_stats, model_info)
         """
+        # Chunk results may be passed as PRSummaryResponse objects
+        chunk_summaries = [getattr(summary, "pr_summary", summary) or "" for summary in chunk_summaries]
         try:
             if not chunk_summaries:
                 logger.warning("No chunk summaries to aggregate")
-                return "", {"input_tokens": 0, "output_tokens": 0}, "claude-opus-4-1-20250805"
+                return "", {"input_tokens": 0, "output_tokens": 0}, self.DEFAULT_MODEL_INFO
             
             if len(chunk_summaries) == 1:
                 logger.info("Only one chunk summary, returning as-is")
-                return chunk_summaries[0], {"input_tokens": 0, "output_tokens": 0}, "claude-opus-4-1-20250805"
+                return chunk_summaries[0], {"input_tokens": 0, "output_tokens": 0}, self.DEFAULT_MODEL_INFO
             
-            logger.info(f"Aggregating {len(chunk_summaries)} chunk summaries")
+            if self.use_structured_merge(len(chunk_summaries)):
+                logger.info(f"Merging {len(chunk_summaries)} chunk summaries by section without an LLM call")
+                merged_summary = self.metadata_service.structured_merge(chunk_summaries, context.summary_info)
+                return merged_summary, {"input_tokens": 0, "output_tokens": 0}, ""
             
-            # Create aggregation prompt
-            aggregation_prompt = self.create_aggregation_prompt(chunk_summaries, context)
+            if self.mode == "tree":
+                aggregated_summary, summary_usage, model_info = await self.tree_reduce_summaries(chunk_summaries, context, llm_service)
+            else:
+                logger.info(f"Aggregating {len(chunk_summaries)} chunk summaries")
+                
+                # Create aggregation prompt
+                aggregation_prompt = self.create_aggregation_prompt(chunk_summaries, context)
+                if len(aggregation_prompt) // 4 > self.token_budget:
+                    logger.warning(
+                        f"Aggregation prompt of ~{len(aggregation_prompt) // 4} tokens exceeds the budget of "
+                        f"{self.token_budget}, aggregating as a tree"
+                    )
+                    aggregated_summary, summary_usage, model_info = await self.tree_reduce_summaries(chunk_summaries, context, llm_service)
+                else:
+                    # Use LLM to aggregate summaries
+                    aggregated_summary, summary_usage, model_info = await llm_service.generate_pr_summary(aggregation_prompt)
             
-            # Use LLM to aggregate summaries
-            aggregated_summary, summary_usage, model_info = await llm_service.generate_pr_summary(aggregation_prompt)
+            # The LLM rewrites the totals; report the ones computed from the chunk metadata
+            aggregated_summary, _ = self.metadata_service.split(aggregated_summary)
+            aggregated_summary = self.metadata_service.apply_totals(aggregated_summary, context.summary_info)
             logger.info("Successfully aggregated chunk summaries")
             return aggregated_summary, summary_usage, model_info
             
@@ -62,20 +123,117 @@ class SummaryAggregationService:
             # Fallback: simple concatenation
             logger.info("Falling back to simple concatenation")
             fallback_summary = self.create_fallback_aggregation(chunk_summaries)
-            return fallback_summary, {"input_tokens": 0, "output_tokens": 0}, "claude-opus-4-1-20250805"
+            return fallback_summary, {"input_tokens": 0, "output_tokens": 0}, self.DEFAULT_MODEL_INFO
     
-    def create_aggregation_prompt(self, chunk_summaries: List[str], context: AggregationContext) -> str:
+    def use_structured_merge(self, chunk_count: int) -> bool:
+        """
+        Whether to assemble the summary from chunk sections instead of asking the LLM.
+        
+        Args:
+            chunk_count: Number of chunk summaries
+            
+        Returns:
+            True in "structured" mode, or in "auto" mode for at most SUMMARY_STRUCTURED_MERGE_MAX_CHUNKS chunks
+        """
+        if self.merge_mode == "structured":
+            return True
+        return self.merge_mode == "auto" and chunk_count <= settings.SUMMARY_STRUCTURED_MERGE_MAX_CHUNKS
+    
+    async def tree_reduce_summaries(
+        self,
+        chunk_summaries: List[str],
+        context: AggregationContext,
+        llm_service: Any
+    ) -> Tuple[str, Dict[str, Any], str]:
+        """
+        Aggregate summaries bottom-up in groups of fan_in until one summary is left.
+        Intermediate nodes merge the content; only the root is given the PR-wide review info.
+        
+        Args:
+            chunk_summaries: List of summaries from different chunks
+            context: Aggregation context with PR metadata and summary info
+            llm_service: LLM service for aggregation
+            
+        Returns:
+            Tuple of (aggregated_summary, usage_stats, model_info)
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        usage = {"input_tokens": 0, "output_tokens": 0}
+        model_info = self.DEFAULT_MODEL_INFO
+        level_summaries = list(chunk_summaries)
+        level = 0
+        
+        while len(level_summaries) > 1:
+            level += 1
+            groups = [level_summaries[i:i + self.fan_in] for i in range(0, len(level_summaries), self.fan_in)]
+            is_root = len(groups) == 1
+            logger.info(f"Aggregation level {level}: merging {len(level_summaries)} summaries in {len(groups)} groups")
+            
+            results = await asyncio.gather(*[
+                self._aggregate_node(group, context, llm_service, semaphore, is_root)
+                for group in groups
+            ])
+            
+            level_summaries = []
+            for summary, node_usage, node_model in results:
+                level_summaries.append(summary)
+                usage["input_tokens"] += node_usage.get("input_tokens", 0)
+                usage["output_tokens"] += node_usage.get("output_tokens", 0)
+                model_info = node_model or model_info
+        
+        logger.info(f"Aggregated {len(chunk_summaries)} chunk summaries in {level} levels")
+        return level_summaries[0], usage, model_info
+    
+    async def _aggregate_node(
+        self,
+        group: List[str],
+        context: AggregationContext,
+        llm_service: Any,
+        semaphore: asyncio.Semaphore,
+        is_root: bool
+    ) -> Tuple[str, Dict[str, Any], str]:
+        """Aggregate one group of summaries, falling back to concatenating the group"""
+        if len(group) == 1:
+            return group[0], {}, ""
+        
+        try:
+            prompt = self.create_aggregation_prompt(self._fit_to_budget(group, context), context, is_final=is_root)
+            async with semaphore:
+                return await llm_service.generate_pr_summary(prompt)
+        except Exception as e:
+            logger.error(f"Failed to aggregate a group of {len(group)} summaries with LLM: {str(e)}")
+            return self.create_fallback_aggregation(group), {}, ""
+    
+    def _fit_to_budget(self, group: List[str], context: AggregationContext) -> List[str]:
+        """Truncate the summaries of a group so their aggregation prompt stays within the token budget"""
+        overhead = len(self.create_aggregation_prompt([""] * len(group), context)) // 4
+        per_summary_chars = max(self.token_budget - overhead, 0) // len(group) * 4
+        fitted = []
+        for summary in group:
+            if len(summary) > per_summary_chars:
+                logger.warning(f"Truncating a summary of ~{len(summary) // 4} tokens to fit the aggregation token budget")
+                summary = summary[:per_summary_chars]
+            fitted.append(summary)
+        return fitted
+    
+    def create_aggregation_prompt(self, chunk_summaries: List[str], context: AggregationContext, is_final: bool = True) -> str:
         """
         Create a prompt for aggregating multiple chunk summaries.
         
         Args:
             chunk_summaries: List of chunk summaries
             context: Aggregation context
+            is_final: Whether the result is the PR summary; intermediate tree nodes
+                merge a subset of the chunks and leave the review info to the root
             
         Returns:
             Aggregation prompt
         """
         try:
+            if is_final:
+                scope = "Below are the summaries from each chunk:"
+            else:
+                scope = "Below are summaries covering part of the chunks, to be merged into one partial summary:"
             prompt = f"""You are tasked with aggregating multiple summaries of a pull request into a single comprehensive summary.
 
 Pull Request Information:
@@ -83,13 +241,19 @@ Pull Request Information:
 - Number: {context.pr_metadata.get('prNumber', 'N/A')}
 - Author: {context.pr_metadata.get('author_name', 'N/A')}
 
-The PR has been analyzed in {context.chunk_count} chunks due to size constraints. Below are the summaries from each chunk:
+The PR has been analyzed in {context.chunk_count} chunks due to size constraints. {scope}
 
 """
             
             for i, summary in enumerate(chunk_summaries, 1):
                 prompt += f"--- Chunk {i} Summary ---\n{summary}\n\n"
             
+            if not is_final:
+                prompt += """Please create a single summary that combines all the key information above, keeps the same format and structure, and eliminates redundancy while preserving all important details.
+
+Aggregated Summary:"""
+                return prompt
+            
             prompt += f"""Please create a single, comprehensive summary that:
 1. Combines all the key information from all chunks
 2. Maintains the same format and structure as the original summaries
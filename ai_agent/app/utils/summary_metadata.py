@@ -0,0 +1,212 @@
+"""
+Machine-readable metadata of chunk summaries and deterministic summary merging.
+Each chunk summary ends with an HTML comment holding its review totals as JSON;
+the totals are summed in code and the final summary can be assembled from the
+Markdown sections of the chunk summaries without an LLM call.
+"""
+
+import re
+import json
+import logging
+from typing import List, Dict, Any, Tuple
+from dataclasses import dataclass
+from app.utils.line_perser import extract_summary_info
+
+logger = logging.getLogger(__name__)
+
+METADATA_RE = re.compile(r"<!--\s*pullsight-metadata\s*(\{.*?\})\s*-->", re.DOTALL)
+HEADING_RE = re.compile(r"^(#{1,2})\s+(.+?)\s*$", re.MULTILINE)
+EFFORT_LINE_RE = re.compile(r"⚠️\s*~\s*\d+\s*issues?\s*\|\s*⏱️\s*~\s*\d+\s*minutes?", re.IGNORECASE)
+TABLE_SEPARATOR_RE = re.compile(r"^\|[\s:\-|]+\|$")
+
+TITLE = "# Summary by Pullsight AI"
+WALKTHROUGH_SECTION = "walkthrough"
+FILE_CHANGES_SECTION = "file changes"
+EFFORT_SECTION = "estimated code review effort"
+FILE_CHANGES_HEADER = "| File Path | Change type | Short description |\n| --- | ---: | --- |"
+
+
+@dataclass
+class SummaryMetadata:
+    """Review totals reported by one summary"""
+    estimated_code_review_time: int = 0
+    potential_issue_count: int = 0
+    source: str = "metadata"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Totals in the shape of the summary_info posted to the backend"""
+        return {
+            "estimated_code_review_time": self.estimated_code_review_time,
+            "potential_issue_count": self.potential_issue_count
+        }
+
+
+class SummaryMetadataService:
+    """Service for reading summary metadata and merging chunk summaries without an LLM"""
+
+    def split(self, summary: str) -> Tuple[str, SummaryMetadata]:
+        """
+        Separate the metadata comment from a summary.
+        Summaries without a readable metadata comment fall back to the regexes of TextParsingService.
+
+        Args:
+            summary: Summary text as generated by the LLM
+
+        Returns:
+            Tuple of (summary without the metadata comment, metadata)
+        """
+        summary = summary or ""
+        match = METADATA_RE.search(summary)
+        prose = METADATA_RE.sub("", summary).rstrip()
+        if match:
+            try:
+                data = json.loads(match.group(1))
+                return prose, SummaryMetadata(
+                    estimated_code_review_time=int(data.get("estimatedReviewMinutes", 0)),
+                    potential_issue_count=int(data.get("potentialIssues", 0))
+                )
+            except (ValueError, TypeError, AttributeError) as e:
+                logger.warning(f"Unreadable summary metadata, falling back to text parsing: {str(e)}")
+
+        info = extract_summary_info(prose)
+        return prose, SummaryMetadata(
+            estimated_code_review_time=info.get("estimated_code_review_time", 0),
+            potential_issue_count=info.get("potential_issue_count", 0),
+            source="text"
+        )
+
+    @staticmethod
+    def from_review_section(section: Dict[str, Any]) -> Tuple[str, SummaryMetadata]:
+        """
+        Read the summary section returned by a combined summary and review call.
+
+        Args:
+            section: Tool input fields summary, estimatedReviewMinutes and potentialIssues
+
+        Returns:
+            Tuple of (summary Markdown, metadata)
+        """
+        try:
+            metadata = SummaryMetadata(
+                estimated_code_review_time=int(section.get("estimatedReviewMinutes") or 0),
+                potential_issue_count=int(section.get("potentialIssues") or 0)
+            )
+        except (ValueError, TypeError):
+            logger.warning("Unreadable totals in the review summary section")
+            metadata = SummaryMetadata(source="missing")
+        return str(section.get("summary") or "").strip(), metadata
+
+    @staticmethod
+    def sections(summary: str) -> List[Tuple[str, str]]:
+        """
+        Split a summary into its H2 sections.
+
+        Args:
+            summary: Summary text
+
+        Returns:
+            List of (heading, body) in document order; the H1 title is dropped
+        """
+        result = []
+        matches = list(HEADING_RE.finditer(summary))
+        for position, match in enumerate(matches):
+            end = matches[position + 1].start() if position + 1 < len(matches) else len(summary)
+            if len(match.group(1)) == 2:
+                result.append((match.group(2).strip(), summary[match.end():end].strip()))
+        return result
+
+    def structured_merge(self, summaries: List[str], summary_info: Dict[str, Any]) -> str:
+        """
+        Assemble one summary from the sections of several chunk summaries.
+
+        Walkthrough paragraphs are joined, File changes rows are concatenated keeping the
+        first row of each file, other sections are joined under their first heading and the
+        effort line is written from the summed totals.
+
+        Args:
+            summaries: Chunk summaries without their metadata comments
+            summary_info: Totals of all chunks
+
+        Returns:
+            Merged summary in the layout of the summary prompt
+        """
+        walkthroughs: List[str] = []
+        file_rows: Dict[str, str] = {}
+        other_sections: Dict[str, Tuple[str, List[str]]] = {}
+
+        for summary in summaries:
+            for heading, body in self.sections(summary):
+                key = heading.lower()
+                if key == WALKTHROUGH_SECTION:
+                    if body:
+                        walkthroughs.append(body)
+                elif key == FILE_CHANGES_SECTION:
+                    for path, row in self._table_rows(body):
+                        file_rows.setdefault(path, row)
+                elif key != EFFORT_SECTION and body:
+                    other_sections.setdefault(key, (heading, []))[1].append(body)
+
+        parts = [TITLE, "## Walkthrough", "\n\n".join(walkthroughs)]
+        if file_rows:
+            parts += ["## File changes", "\n".join([FILE_CHANGES_HEADER, *file_rows.values()])]
+        for heading, bodies in other_sections.values():
+            parts += [f"## {heading}", "\n\n".join(bodies)]
+        parts += ["## Estimated Code Review Effort", self._effort_line(summary_info)]
+        return "\n\n".join(part for part in parts if part)
+
+    def apply_totals(self, summary: str, summary_info: Dict[str, Any]) -> str:
+        """
+        Write the computed totals into a summary's effort line, adding the section if it is missing.
+
+        Args:
+            summary: Summary text
+            summary_info: Totals to report
+
+        Returns:
+            Summary whose effort line matches summary_info
+        """
+        effort_line = self._effort_line(summary_info)
+        if EFFORT_LINE_RE.search(summary):
+            return EFFORT_LINE_RE.sub(effort_line, summary, count=1)
+        return f"{summary.rstrip()}\n\n## Estimated Code Review Effort\n\n{effort_line}"
+
+    @staticmethod
+    def _effort_line(summary_info: Dict[str, Any]) -> str:
+        """Effort line in the format of the summary prompt"""
+        return (
+            f"⚠️ ~ {summary_info.get('potential_issue_count', 0)} issues | "
+            f"⏱️ ~ {summary_info.get('estimated_code_review_time', 0)} minutes"
+        )
+
+    @staticmethod
+    def _table_rows(body: str) -> List[Tuple[str, str]]:
+        """Data rows of a Markdown table keyed by their first cell"""
+        rows = []
+        table_lines = [line.strip() for line in body.splitlines() if line.strip().startswith("|")]
+        for line in table_lines[1:]:
+            if TABLE_SEPARATOR_RE.match(line):
+                continue
+            cells = [cell.strip() for cell in line.strip("|").split("|")]
+            if cells and cells[0]:
+                rows.append((cells[0].strip("`"), line))
+        return rows
+
+
+# Global service instance
+_metadata_service = SummaryMetadataService()
+
+
+# Legacy functions for backward compatibility
+def split_summary_metadata(summary: str) -> Tuple[str, Dict[str, Any]]:
+    """
+    Legacy function - Separate the metadata comment from a summary.
+    Use SummaryMetadataService.split() for new code.
+
+    Args:
+        summary: Summary text as generated by the LLM
+
+    Returns:
+        Tuple of (summary without the metadata comment, summary_info dictionary)
+    """
+    prose, metadata = _metadata_service.split(summary)
+    return prose, metadata.to_dict()
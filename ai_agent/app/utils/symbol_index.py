@@ -0,0 +1,300 @@
+"""
+Symbol indexing utilities for building lightweight per-file outlines.
+Uses the Python ast for .py files and regex/brace/indent heuristics for other common languages.
+"""
+
+import re
+import ast
+import bisect
+import logging
+from functools import lru_cache
+from typing import List, Dict, Optional, Tuple
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Symbol:
+    """A named definition in a file (1-based, inclusive line range)"""
+    name: str
+    kind: str  # 'class', 'function', 'method', 'type'
+    start: int
+    end: int
+    qualified_name: str = ""
+
+
+@dataclass
+class SymbolIndex:
+    """Outline of a single file that answers enclosing-symbol and definition lookups"""
+    file_name: str
+    symbols: List[Symbol] = field(default_factory=list)
+    _starts: List[int] = field(default_factory=list, repr=False)
+    _by_name: Dict[str, List[Symbol]] = field(default_factory=dict, repr=False)
+
+    def __post_init__(self):
+        self.symbols.sort(key=lambda symbol: (symbol.start, -symbol.end))
+        self._starts = [symbol.start for symbol in self.symbols]
+        for symbol in self.symbols:
+            self._by_name.setdefault(symbol.name, []).append(symbol)
+
+    def enclosing(self, start: int, end: int) -> List[Symbol]:
+        """
+        Get the symbols that fully contain a line range, outermost first.
+
+        Args:
+            start: First line of the range
+            end: Last line of the range
+
+        Returns:
+            List of enclosing symbols
+        """
+        # Only symbols starting at or before the range can contain it
+        candidates = self.symbols[:bisect.bisect_right(self._starts, start)]
+        return [symbol for symbol in candidates if symbol.end >= end]
+
+    def definitions(self, name: str) -> List[Symbol]:
+        """Get all symbols defined with the given name"""
+        return self._by_name.get(name, [])
+
+
+# Name and parameter list of a method declaration; parameters hold no string literals or
+# inline functions, which only appear in the arguments of calls
+METHOD_SIGNATURE = (
+    r"(?P<name>[A-Za-z_]\w*)\s*\((?:(?!\bfunction\b)[^;\"'`])*\)\s*(?::\s*[^{;]+)?(?:throws\s+[\w.,\s]+)?"
+)
+
+
+class SymbolIndexService:
+    """Service for building symbol indexes from file content"""
+
+    BRACE_LANGUAGES = {
+        ".js", ".jsx", ".mjs", ".cjs", ".ts", ".tsx", ".java", ".kt", ".kts", ".cs", ".go",
+        ".rs", ".php", ".c", ".h", ".cc", ".cpp", ".hpp", ".swift", ".scala", ".dart"
+    }
+
+    INDENT_LANGUAGES = {".rb", ".rake"}
+
+    # Each pattern captures the symbol name in group "name"
+    BRACE_PATTERNS: List[Tuple[str, re.Pattern]] = [
+        ("class", re.compile(
+            r"^\s*(?:export\s+)?(?:default\s+)?(?:(?:public|private|protected|internal|abstract|final|sealed|static|partial|data|open|pub(?:\([^)]*\))?)\s+)*"
+            r"(?:class|interface|enum|struct|trait|record|object|protocol|extension)\s+(?P<name>[A-Za-z_]\w*)"
+        )),
+        ("type", re.compile(r"^\s*(?:export\s+)?(?:type|typedef)\s+(?P<name>[A-Za-z_]\w*)")),
+        ("type", re.compile(r"^\s*impl(?:<[^>]*>)?\s+(?:[\w:<>]+\s+for\s+)?(?P<name>[A-Za-z_]\w*)")),
+        ("function", re.compile(r"^func\s+(?:\([^)]*\)\s*)?(?P<name>[A-Za-z_]\w*)")),
+        ("function", re.compile(
+            r"^\s*(?:export\s+)?(?:default\s+)?(?:pub(?:\([^)]*\))?\s+)?(?:(?:public|private|protected|static|async|unsafe|const|extern)\s+)*"
+            r"(?:function\*?|fn|def|fun)\s+(?P<name>[A-Za-z_]\w*)"
+        )),
+        ("function", re.compile(
+            r"^\s*(?:export\s+)?(?:const|let|var)\s+(?P<name>[A-Za-z_$][\w$]*)\s*(?::[^=]+)?=\s*(?:async\s+)?(?:function\b|\([^)]*\)\s*(?::[^=]+)?=>|[A-Za-z_$][\w$]*\s*=>)"
+        )),
+        # Methods with a return type or modifier, the opening brace may follow on the next line
+        ("method", re.compile(
+            r"^\s*(?:(?:public|private|protected|internal|static|final|abstract|async|override|virtual|synchronized|readonly|get|set)\s+)*"
+            r"(?!(?:return|await|yield|new|throw|go|defer|else|case|delete|typeof)\b)[\w<>\[\],.?*&]+\s+"
+            + METHOD_SIGNATURE + r"\{?\s*$"
+        )),
+        # Untyped methods (JavaScript classes, constructors) must open their body on the same line,
+        # otherwise a call statement without a semicolon looks the same
+        ("method", re.compile(r"^\s*" + METHOD_SIGNATURE + r"\{\s*$")),
+    ]
+
+    INDENT_PATTERNS: List[Tuple[str, re.Pattern]] = [
+        ("class", re.compile(r"^\s*(?:class|module)\s+(?P<name>[A-Za-z_][\w:]*)")),
+        ("function", re.compile(r"^\s*def\s+(?:self\.)?(?P<name>[A-Za-z_]\w*[?!=]?)")),
+    ]
+
+    # Control-flow keywords that the generic method pattern would otherwise pick up
+    NON_SYMBOL_NAMES = {
+        "if", "for", "while", "switch", "catch", "return", "else", "elif", "do", "try", "with",
+        "function", "new", "typeof", "sizeof", "await", "yield", "when", "match", "foreach", "using", "lock"
+    }
+
+    IDENTIFIER_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+    STRING_OR_COMMENT_RE = re.compile(r"\"(?:\\.|[^\"\\])*\"|'(?:\\.|[^'\\])*'|`(?:\\.|[^`\\])*`|//.*$")
+
+    # Maximum number of lines scanned when looking for the end of a brace-delimited block
+    MAX_BLOCK_SCAN_LINES = 5000
+
+    def build_index(self, file_name: str, file_content: str) -> SymbolIndex:
+        """
+        Build a symbol index for a file.
+
+        Args:
+            file_name: Path of the file, used to pick the language strategy
+            file_content: Content of the file
+
+        Returns:
+            SymbolIndex, empty if the language is not supported
+        """
+        try:
+            if not file_content:
+                return SymbolIndex(file_name)
+
+            extension = ("." + file_name.rsplit(".", 1)[-1].lower()) if "." in file_name else ""
+            lines = file_content.split("\n")
+
+            if extension in (".py", ".pyi"):
+                symbols = self._build_python_symbols(file_content)
+                if symbols is None:
+                    symbols = self._build_indent_symbols(lines, self.INDENT_PATTERNS + [
+                        ("function", re.compile(r"^\s*(?:async\s+)?def\s+(?P<name>[A-Za-z_]\w*)")),
+                    ], python_style=True)
+            elif extension in self.BRACE_LANGUAGES:
+                symbols = self._build_brace_symbols(lines)
+            elif extension in self.INDENT_LANGUAGES:
+                symbols = self._build_indent_symbols(lines, self.INDENT_PATTERNS, python_style=False)
+            else:
+                symbols = []
+
+            return SymbolIndex(file_name, symbols)
+
+        except Exception as e:
+            logger.error(f"Error building symbol index for {file_name}: {str(e)}")
+            return SymbolIndex(file_name)
+
+    def _build_python_symbols(self, file_content: str) -> Optional[List[Symbol]]:
+        """
+        Collect classes and functions from the Python ast.
+
+        Returns:
+            List of symbols, None if the file does not parse
+        """
+        try:
+            tree = ast.parse(file_content)
+        except (SyntaxError, ValueError):
+            return None
+
+        symbols = []
+
+        def visit(node: ast.AST, parents: List[str], in_class: bool) -> None:
+            for child in ast.iter_child_nodes(node):
+                if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                    start = min([child.lineno] + [decorator.lineno for decorator in child.decorator_list])
+                    is_class = isinstance(child, ast.ClassDef)
+                    kind = "class" if is_class else ("method" if in_class else "function")
+                    symbols.append(Symbol(
+                        name=child.name,
+                        kind=kind,
+                        start=start,
+                        end=child.end_lineno or child.lineno,
+                        qualified_name=".".join(parents + [child.name])
+                    ))
+                    visit(child, parents + [child.name], is_class)
+                else:
+                    visit(child, parents, in_class)
+
+        visit(tree, [], False)
+        return symbols
+
+    def _build_brace_symbols(self, lines: List[str]) -> List[Symbol]:
+        """Collect symbols from brace-delimited languages"""
+        symbols = []
+
+        for index, line in enumerate(lines):
+            matched = self._match_line(line, self.BRACE_PATTERNS)
+            if not matched:
+                continue
+            kind, name = matched
+            end = self._find_brace_block_end(lines, index)
+            symbols.append(Symbol(name=name, kind=kind, start=index + 1, end=end + 1, qualified_name=name))
+
+        return symbols
+
+    def _build_indent_symbols(self, lines: List[str], patterns: List[Tuple[str, re.Pattern]], python_style: bool) -> List[Symbol]:
+        """Collect symbols from indentation-structured languages"""
+        symbols = []
+
+        for index, line in enumerate(lines):
+            matched = self._match_line(line, patterns)
+            if not matched:
+                continue
+            kind, name = matched
+            indent = len(line) - len(line.lstrip())
+            end = index
+
+            for next_index in range(index + 1, len(lines)):
+                next_line = lines[next_index]
+                if not next_line.strip():
+                    continue
+                next_indent = len(next_line) - len(next_line.lstrip())
+                if next_indent <= indent:
+                    # Ruby blocks close with an "end" at the opening indent
+                    if not python_style and next_line.strip() == "end":
+                        end = next_index
+                    break
+                end = next_index
+
+            symbols.append(Symbol(name=name, kind=kind, start=index + 1, end=end + 1, qualified_name=name))
+
+        return symbols
+
+    def _match_line(self, line: str, patterns: List[Tuple[str, re.Pattern]]) -> Optional[Tuple[str, str]]:
+        """Return (kind, name) for the first pattern that matches a definition line"""
+        for kind, pattern in patterns:
+            match = pattern.match(line)
+            if match and match.group("name") not in self.NON_SYMBOL_NAMES:
+                return kind, match.group("name")
+        return None
+
+    def _find_brace_block_end(self, lines: List[str], start_index: int) -> int:
+        """
+        Find the line that closes the block opened at or just after start_index.
+        Definitions without a body (declarations, one-line aliases) end on their own line.
+        """
+        depth = 0
+        opened = False
+        last_index = min(len(lines), start_index + self.MAX_BLOCK_SCAN_LINES)
+
+        for index in range(start_index, last_index):
+            code = self.STRING_OR_COMMENT_RE.sub("", lines[index])
+            for char in code:
+                if char == "{":
+                    depth += 1
+                    opened = True
+                elif char == "}":
+                    depth -= 1
+            if opened and depth <= 0:
+                return index
+            if not opened and (index - start_index >= 2 or code.rstrip().endswith(";")):
+                return start_index
+
+        return last_index - 1 if opened else start_index
+
+    def extract_identifiers(self, code_lines: List[str]) -> List[str]:
+        """
+        Extract identifiers referenced by lines of code.
+
+        Args:
+            code_lines: Lines of code (diff markers already stripped)
+
+        Returns:
+            Unique identifier names in order of first appearance
+        """
+        identifiers: Dict[str, None] = {}
+        for line in code_lines:
+            for identifier in self.IDENTIFIER_RE.findall(self.STRING_OR_COMMENT_RE.sub("", line)):
+                if identifier not in self.NON_SYMBOL_NAMES:
+                    identifiers.setdefault(identifier, None)
+        return list(identifiers)
+
+
+# Global service instance
+_symbol_index_service = SymbolIndexService()
+
+
+@lru_cache(maxsize=64)
+def get_symbol_index(file_name: str, file_content: str) -> SymbolIndex:
+    """
+    Build (or reuse) the symbol index for a file.
+    Cached because the chunker and the prompt builder both look at the same files.
+    """
+    return _symbol_index_service.build_index(file_name, file_content)
+
+
+def extract_identifiers(code_lines: List[str]) -> List[str]:
+    """Extract identifiers referenced by lines of code"""
+    return _symbol_index_service.extract_identifiers(code_lines)
@@ -0,0 +1,88 @@
+"""
+Benchmark and equivalence check of the single-pass diff formatter.
+
+Compares format_diff_for_llm and format_diff_for_llm_raw_diff with the formatter
+of a baseline revision: the output must be byte-identical on random and edge-case
+diffs, then both are timed on large diffs.
+
+    python -m benchmarks.bench_diff_formatter [--baseline e8bfd99] [--cases 2000]
+"""
+
+import random
+import argparse
+from typing import List
+from benchmarks.common import load_module_at_revision, measure, quiet_logging
+from app.utils import diff_formatter
+
+FORMATTER_PATH = "ai_agent/app/utils/diff_formatter.py"
+
+EDGE_CASES = [
+    ["garbage"],
+    [""],
+    ["@@ -1 +1 @@\n-a\n+b\n\\ No newline at end of file"],
+    ["@@ -0,0 +1,3 @@\n+a\n+b\n+c"],
+    ["@@ -5,3 +5,0 @@\n-a\n-b\n-c\n"],
+]
+
+
+def make_hunk(rng: random.Random, line_count: int, old_start: int = 1, new_start: int = 1) -> str:
+    """Build a hunk of random context, deleted and added lines with a matching header"""
+    body = []
+    old_count = new_count = 0
+    for index in range(line_count):
+        text = f"    value_{index} = compute(x, y)  # {'z' * rng.randint(0, 40)}"
+        roll = rng.random()
+        if roll < 0.6:
+            body.append(" " + text)
+            old_count += 1
+            new_count += 1
+        elif roll < 0.8:
+            body.append("-" + text)
+            old_count += 1
+        else:
+            body.append("+" + text)
+            new_count += 1
+    return f"@@ -{old_start},{old_count} +{new_start},{new_count} @@ def f():\n" + "\n".join(body)
+
+
+def check_equivalence(baseline, rng: random.Random, case_count: int) -> int:
+    """Assert both formatters agree on random and edge-case diffs, returning the number of cases"""
+    cases: List[List[str]] = [
+        [make_hunk(rng, rng.randint(0, 60), rng.randint(0, 300), rng.randint(0, 300)) for _ in range(rng.randint(1, 6))]
+        for _ in range(case_count)
+    ] + EDGE_CASES
+    for hunks in cases:
+        raw_diff = "diff --git a/f b/f\n--- a/f\n+++ b/f\n" + "\n".join(hunks)
+        assert baseline.format_diff_for_llm(hunks, "f.py") == diff_formatter.format_diff_for_llm(hunks, "f.py"), hunks
+        assert baseline.format_diff_for_llm_raw_diff(raw_diff, "f.py") == diff_formatter.format_diff_for_llm_raw_diff(raw_diff, "f.py"), hunks
+    return len(cases)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--baseline", default="e8bfd99", help="Revision holding the formatter to compare against")
+    parser.add_argument("--cases", type=int, default=2000, help="Random diffs checked for identical output")
+    args = parser.parse_args()
+
+    quiet_logging()
+    rng = random.Random(7)
+    baseline = load_module_at_revision(FORMATTER_PATH, args.baseline, "diff_formatter_baseline")
+    print(f"Output identical on {check_equivalence(baseline, rng, args.cases)} diffs")
+
+    one_hunk = [make_hunk(rng, 50000)]
+    many_hunks = [make_hunk(rng, 500, index * 1000 + 1, index * 1000 + 1) for index in range(100)]
+    raw_diff = "diff --git a/f b/f\n" + "\n".join(many_hunks)
+    workloads = [
+        ("1 hunk x 50k lines", "format_diff_for_llm", one_hunk),
+        ("100 hunks x 500 lines", "format_diff_for_llm", many_hunks),
+        ("raw diff, 50k lines", "format_diff_for_llm_raw_diff", raw_diff),
+    ]
+    for label, function_name, argument in workloads:
+        for name, module in (("baseline", baseline), ("current", diff_formatter)):
+            function = getattr(module, function_name)
+            seconds, peak, _ = measure(lambda: function(argument, "big.py"))
+            print(f"{label:24s} {name:9s} {seconds * 1000:8.1f} ms  peak {peak:6.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
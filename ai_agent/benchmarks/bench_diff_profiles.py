@@ -0,0 +1,92 @@
+"""
+Prompt size of the standard and compact diff render profiles.
+
+Renders real and synthetic diffs with both profiles and reports tokens (chars/4)
+per changed line. Every changed line must keep the same (line number, +/-)
+anchor in both profiles.
+
+Corpora:
+- this repository's own history since a revision
+- standard library modules with scattered edits, as -U3 patches and as
+  GitHub-style patches with wide (-U10) context
+
+    python -m benchmarks.bench_diff_profiles [--since e3bf1bc] [--stdlib-files 60]
+"""
+
+import os
+import re
+import glob
+import random
+import difflib
+import argparse
+import subprocess
+from typing import Dict, List, Tuple
+from benchmarks.common import REPO_ROOT, quiet_logging
+from app.utils.parsed_diff import ParsedDiff, parse_raw_diff
+from app.utils.diff_formatter import format_parsed_diff
+
+STANDARD_ANCHOR_RE = re.compile(r"(?m)^\s*(\d+) ([+-]) ")
+COMPACT_ANCHOR_RE = re.compile(r"(?m)^(\d+)([+-]) ")
+
+
+def history_corpus(since: str) -> List[Tuple[str, ParsedDiff]]:
+    """Diffs of every file changed in this repository since a revision"""
+    output = subprocess.run(
+        ["git", "-C", REPO_ROOT, "diff", "-U3", since, "HEAD", "--", "ai_agent", "backend"],
+        capture_output=True, text=True, check=True
+    ).stdout
+    corpus = []
+    for block in re.split(r"(?m)^diff --git ", output)[1:]:
+        file_name = block.split("\n", 1)[0].split(" b/")[-1]
+        corpus.append(("repo-history", parse_raw_diff(file_name, block)))
+    return corpus
+
+
+def stdlib_corpus(file_count: int) -> List[Tuple[str, ParsedDiff]]:
+    """Standard library modules with eight whitespace edits each, rendered with narrow and wide context"""
+    rng = random.Random(5)
+    corpus = []
+    for path in sorted(glob.glob(os.path.join(os.path.dirname(os.__file__), "*.py")))[:file_count]:
+        with open(path, encoding="utf-8", errors="replace") as handle:
+            before = handle.read().split("\n")
+        after = list(before)
+        for _ in range(8):
+            index = rng.randrange(len(after))
+            after[index] = after[index].replace("=", " = ", 1) + "  "
+        for context, label in ((3, "stdlib-U3"), (10, "stdlib-U10")):
+            diff = "\n".join(difflib.unified_diff(before, after, lineterm="", n=context))
+            corpus.append((label, parse_raw_diff(path, diff)))
+    return corpus
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--since", default="e3bf1bc", help="Revision the repository history corpus starts at")
+    parser.add_argument("--stdlib-files", type=int, default=60, help="Standard library modules edited")
+    args = parser.parse_args()
+
+    quiet_logging()
+    rows: Dict[str, List[int]] = {}
+    for label, parsed in history_corpus(args.since) + stdlib_corpus(args.stdlib_files):
+        changed = parsed.additions + parsed.deletions
+        if not changed:
+            continue
+        standard = format_parsed_diff(parsed, "standard")
+        compact = format_parsed_diff(parsed, "compact")
+        assert set(STANDARD_ANCHOR_RE.findall(standard)) == set(COMPACT_ANCHOR_RE.findall(compact)), parsed.file_name
+        row = rows.setdefault(label, [0, 0, 0, 0])
+        for index, value in enumerate((1, changed, len(standard) // 4, len(compact) // 4)):
+            row[index] += value
+
+    rows["total"] = [sum(values) for values in zip(*rows.values())]
+    for label, (files, changed, standard, compact) in rows.items():
+        print(
+            f"{label:14s} files={files:4d} changed={changed:6d} "
+            f"standard={standard / changed:6.1f} tok/line compact={compact / changed:6.1f} tok/line "
+            f"({100 - 100 * compact / standard:.0f}% smaller)"
+        )
+    print("Anchors identical between the profiles on every file")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Review output parsing: the item-level salvaging parser against the previous
+whole-array parser of a baseline revision.
+
+Both parsers read a large fenced review, streamed or complete; the items must be
+identical. The same review cut at two thirds and with one malformed item shows
+how many items each parser recovers.
+
+    python -m benchmarks.bench_json_salvage [--baseline f17a599] [--items 60000]
+"""
+
+import json
+import random
+import argparse
+from typing import Any, Callable, Dict, List
+from benchmarks.common import load_module_at_revision, measure, quiet_logging
+from app.utils.json_salvage import JSONArrayStreamParser, salvage_json_array
+
+
+def review_items(count: int) -> List[Dict[str, Any]]:
+    """Review comments with long issue texts and snippets full of JSON punctuation"""
+    rng = random.Random(1)
+    return [
+        {
+            "fileName": f"src/mod{index % 300}/file{index}.py",
+            "lineStart": rng.randint(1, 5000),
+            "lineEnd": rng.randint(1, 5000),
+            "issue": "Possible None dereference when the cache entry expires; guard the lookup. " * 3,
+            "codeSnippet": "if cache.get(key)[\"value\"] > limit:\n    return {\"ok\": False}",
+            "severity": "Major",
+            "category": "Bug",
+            "suggestion": "Check for None first."
+        }
+        for index in range(count)
+    ]
+
+
+def streamed(text: str, piece_size: int) -> List[Dict[str, Any]]:
+    """Feed text to the incremental parser in pieces of a fixed size"""
+    parser = JSONArrayStreamParser()
+    items = []
+    for start in range(0, len(text), piece_size):
+        items += parser.feed(text[start:start + piece_size])
+    return items + parser.close()
+
+
+def report(label: str, function: Callable[[], List[Dict[str, Any]]], repeat: int) -> List[Dict[str, Any]]:
+    """Measure one parse and print its time, peak memory and item count"""
+    seconds, peak, items = measure(function, repeat)
+    print(f"{label:34s} {seconds * 1000:8.1f} ms {peak:7.1f} MiB {len(items):6d} items")
+    return items
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--baseline", default="f17a599", help="Revision of the previous parser")
+    parser.add_argument("--items", type=int, default=60000, help="Items in the generated review")
+    args = parser.parse_args()
+
+    quiet_logging()
+    baseline = load_module_at_revision("ai_agent/app/api/review_parser.py", args.baseline, "baseline_review_parser")
+    parse_before = baseline.JSONParser.parse_json_from_text
+    parse_after = lambda text: salvage_json_array(text).items
+
+    items = review_items(args.items)
+    text = "```json\n" + json.dumps(items, indent=2) + "\n```"
+    print(f"Review of {len(items)} items, {len(text) / 2 ** 20:.1f} MiB")
+
+    assert report("complete, baseline", lambda: parse_before(text), 3) == items
+    assert report("complete, salvage", lambda: parse_after(text), 3) == items
+    assert report("streamed 4 KiB pieces", lambda: streamed(text, 4096), 3) == items
+    assert report("streamed 16 B pieces", lambda: streamed(text, 16), 1) == items
+    print("Items identical for every complete and streamed parse")
+
+    truncated = text[:len(text) * 2 // 3]
+    report("truncated at 2/3, baseline", lambda: parse_before(truncated), 3)
+    report("truncated at 2/3, salvage", lambda: parse_after(truncated), 3)
+
+    malformed = text.replace('"lineEnd": ', '"lineEnd": ,', 1)
+    report("one malformed item, baseline", lambda: parse_before(malformed), 3)
+    report("one malformed item, salvage", lambda: parse_after(malformed), 3)
+
+
+if __name__ == "__main__":
+    main()
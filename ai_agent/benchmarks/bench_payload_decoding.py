@@ -0,0 +1,100 @@
+"""
+Review request decoding: json.loads into the untyped payload model of a baseline
+revision against the typed models, decoded from the whole body or incrementally
+while the body arrives.
+
+The body is a generated pull request with thousands of files and is fed in
+64 KiB chunks, as the ASGI server delivers it. Each path ends with the ignore
+filter and the file dictionaries the pipeline reads; those must be identical.
+
+    python -m benchmarks.bench_payload_decoding [--baseline bf57c16~1] [--files 2000]
+"""
+
+import json
+import random
+import asyncio
+import argparse
+from typing import Any, AsyncIterator, Dict, List
+from benchmarks.common import load_module_at_revision, measure, quiet_logging
+from app.models.pr_event import PRFilePayload
+from app.utils.payload_decoder import decode_pr_payload
+from app.utils.filter_files import filter_pr_files
+
+CHUNK_SIZE = 65536
+
+
+def request_body(file_count: int) -> bytes:
+    """Body of a review request with file contents of a few hundred lines each"""
+    rng = random.Random(0)
+    line = "    result = compute_value(item, index) + offset  # {}\n"
+    files = []
+    for index in range(file_count):
+        before = "".join(line.format(number) for number in range(rng.randint(200, 320)))
+        files.append({
+            "prFileName": f"src/pkg{index % 50}/module_{index}.py",
+            "prFileStatus": "modified",
+            "prFileAdditions": 3,
+            "prFileDeletions": 1,
+            "prFileChanges": 4,
+            "prFileContentBefore": before,
+            "prFileContentAfter": before + "x = 1\n",
+            "prFileDiff": "@@ -1,3 +1,4 @@\n a\n+b\n c\n d",
+            "prFileDiffHunks": ["@@ -1,3 +1,4 @@\n a\n+b\n c\n d"],
+            "prFileBlobUrl": "https://example.com/blob",
+            "_id": "x" * 24
+        })
+    return json.dumps({"pullRequest": {
+        "provider": "github", "prNumber": "12", "prTitle": "t", "prBody": "b", "installationId": "1",
+        "pullRequestAnalysisId": "a" * 24, "prFiles": files, "ignore": ["**/module_1?.py"], "minSeverity": "Major"
+    }}).encode()
+
+
+async def body_stream(body: bytes) -> AsyncIterator[bytes]:
+    """Yield the body in chunks the size the server reads"""
+    for start in range(0, len(body), CHUNK_SIZE):
+        yield body[start:start + CHUNK_SIZE]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--baseline", default="bf57c16~1", help="Revision of the untyped payload model")
+    parser.add_argument("--files", type=int, default=2000, help="Files in the generated request")
+    args = parser.parse_args()
+
+    quiet_logging()
+    baseline = load_module_at_revision("ai_agent/app/models/pr_event.py", args.baseline, "baseline_pr_event")
+    body = request_body(args.files)
+    loop = asyncio.new_event_loop()
+    print(f"Request of {args.files} files, {len(body) / 2 ** 20:.1f} MiB")
+
+    def before() -> List[Dict[str, Any]]:
+        async def read() -> bytes:
+            return b"".join([chunk async for chunk in body_stream(body)])
+        pull_request = baseline.PRPayloadV2.model_validate(json.loads(loop.run_until_complete(read()))).pullRequest
+        allowed = set(filter_pr_files(pull_request.get("ignore", []), [f.get("prFileName") for f in pull_request["prFiles"]]))
+        return [f for f in pull_request["prFiles"] if f.get("prFileName") in allowed]
+
+    def after(incremental: bool) -> List[Dict[str, Any]]:
+        pull_request = loop.run_until_complete(decode_pr_payload(body_stream(body), incremental)).pullRequest
+        allowed = set(filter_pr_files(pull_request.ignore or [], [f.prFileName for f in pull_request.prFiles]))
+        return [f.to_file_info() for f in pull_request.prFiles if f.prFileName in allowed]
+
+    results = []
+    for label, function in (
+        ("json.loads + dict model, baseline", before),
+        ("typed model, whole body", lambda: after(False)),
+        ("typed model, incremental", lambda: after(True))
+    ):
+        seconds, peak, files = measure(function, repeat=3)
+        print(f"{label:36s} {seconds * 1000:7.0f} ms {peak:7.1f} MiB peak {len(files):5d} files")
+        results.append(files)
+
+    # The typed models drop fields the agent does not read
+    fields = set(PRFilePayload.model_fields)
+    expected = [{key: value for key, value in f.items() if key in fields} for f in results[0]]
+    assert results[1] == expected and results[2] == expected
+    print("File dictionaries identical for every path")
+
+
+if __name__ == "__main__":
+    main()
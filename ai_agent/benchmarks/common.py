@@ -0,0 +1,66 @@
+"""
+Helpers shared by the benchmark scripts.
+Run every script from the ai_agent directory, e.g. `python -m benchmarks.bench_diff_formatter`.
+"""
+
+import gc
+import os
+import time
+import types
+import logging
+import subprocess
+import tracemalloc
+from typing import Any, Callable, Tuple
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def quiet_logging() -> None:
+    """Silence the application loggers so timings are not dominated by log output"""
+    logging.disable(logging.CRITICAL)
+
+
+def load_module_at_revision(path: str, revision: str, module_name: str) -> types.ModuleType:
+    """
+    Load a module as it was at an earlier git revision, to compare against the current code.
+
+    Args:
+        path: Path of the module relative to the repository root
+        revision: Git revision to read the module from
+        module_name: Name given to the loaded module
+
+    Returns:
+        The executed module
+    """
+    source = subprocess.run(
+        ["git", "-C", REPO_ROOT, "show", f"{revision}:{path}"],
+        capture_output=True, text=True, check=True
+    ).stdout
+    module = types.ModuleType(module_name)
+    exec(compile(source, f"{revision}:{path}", "exec"), module.__dict__)
+    return module
+
+
+def measure(function: Callable[[], Any], repeat: int = 5) -> Tuple[float, float, Any]:
+    """
+    Time a function and measure its peak traced memory.
+
+    Args:
+        function: Function to measure
+        repeat: Timed runs; the mean is reported
+
+    Returns:
+        Tuple of (mean seconds, peak MiB of one extra traced run, result of that run)
+    """
+    gc.collect()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    seconds = (time.perf_counter() - start) / repeat
+
+    gc.collect()
+    tracemalloc.start()
+    result = function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak / 2 ** 20, result
@@ -5,9 +5,87 @@ load_dotenv()
 
 class Settings:
     CLAUDE_API_KEY = os.getenv("CLAUDE_API_KEY")
+    # Validate the files of a review request while its body arrives instead of after reading it whole
+    PAYLOAD_INCREMENTAL_DECODING = os.getenv("PAYLOAD_INCREMENTAL_DECODING", "true").lower() == "true"
+    # Largest review request body accepted after undoing its gzip, deflate or zstd Content-Encoding
+    PAYLOAD_MAX_MB = int(os.getenv("PAYLOAD_MAX_MB", "256"))
     BACKEND_SUMMARY_ENDPOINT = os.getenv("BACKEND_SUMMARY_ENDPOINT", "http://backend/v1/github/summary")
     BACKEND_REVIEW_ENDPOINT = os.getenv("BACKEND_REVIEW_ENDPOINT", "http://backend/v1/github/reviews")
+    # "gzip" compresses summary and review callbacks of at least CALLBACK_COMPRESSION_MIN_BYTES, "none" sends plain JSON
+    CALLBACK_COMPRESSION = os.getenv("CALLBACK_COMPRESSION", "gzip")
+    CALLBACK_COMPRESSION_MIN_BYTES = int(os.getenv("CALLBACK_COMPRESSION_MIN_BYTES", "1024"))
+    # Callbacks are spooled here and retried with exponential backoff until the backend accepts them
+    CALLBACK_OUTBOX_DIR = os.getenv("CALLBACK_OUTBOX_DIR", ".cache/outbox")
+    CALLBACK_MAX_ATTEMPTS = int(os.getenv("CALLBACK_MAX_ATTEMPTS", "10"))
+    CALLBACK_RETRY_BASE_SECONDS = float(os.getenv("CALLBACK_RETRY_BASE_SECONDS", "2"))
+    CALLBACK_RETRY_MAX_SECONDS = float(os.getenv("CALLBACK_RETRY_MAX_SECONDS", "300"))
+    # Callbacks given up on after CALLBACK_MAX_ATTEMPTS are retried from failed/ when the agent starts
+    CALLBACK_RETRY_FAILED_ON_START = os.getenv("CALLBACK_RETRY_FAILED_ON_START", "true").lower() == "true"
+    # Connections and per-request timeout (seconds) of the shared backend client
+    CALLBACK_MAX_CONNECTIONS = int(os.getenv("CALLBACK_MAX_CONNECTIONS", "10"))
+    CALLBACK_TIMEOUT = float(os.getenv("CALLBACK_TIMEOUT", "30"))
     DEFAULT_MODEL = os.getenv("DEFAULT_MODEL_NAME", "claude-sonnet-4-20250514")
+    # "tool" reads review comments from a forced tool call, "text" parses a JSON array from the reply
+    REVIEW_OUTPUT_MODE = os.getenv("REVIEW_OUTPUT_MODE", "tool")
+    # "compact" asks for short keys, severity/category codes and line ranges instead of code snippets
+    REVIEW_OUTPUT_SCHEMA = os.getenv("REVIEW_OUTPUT_SCHEMA", "standard")
+    # "window" keeps only line-numbered windows of the original file around each hunk,
+    # "symbols" also keeps enclosing symbols and referenced definitions, "full" sends the whole file
+    REVIEW_CONTEXT_MODE = os.getenv("REVIEW_CONTEXT_MODE", "symbols")
+    REVIEW_CONTEXT_WINDOW_LINES = int(os.getenv("REVIEW_CONTEXT_WINDOW_LINES", "20"))
+    REVIEW_CONTEXT_TOKEN_BUDGET = int(os.getenv("REVIEW_CONTEXT_TOKEN_BUDGET", "4000"))
+    # "standard" renders review diffs as annotated markdown, "compact" drops the decoration and
+    # collapses unchanged runs longer than twice DIFF_COMPACT_CONTEXT_LINES while keeping line numbers
+    DIFF_RENDER_PROFILE = os.getenv("DIFF_RENDER_PROFILE", "compact")
+    DIFF_COMPACT_CONTEXT_LINES = int(os.getenv("DIFF_COMPACT_CONTEXT_LINES", "3"))
+    # "combined" has each review chunk return its summary section, replacing the separate summary pass
+    # (needs REVIEW_OUTPUT_MODE=tool); "separate" summarizes the PR in its own LLM pass
+    SUMMARY_GENERATION_MODE = os.getenv("SUMMARY_GENERATION_MODE", "separate")
+    # "tree" merges chunk summaries in groups of SUMMARY_AGGREGATION_FAN_IN level by level, "flat" uses one prompt
+    SUMMARY_AGGREGATION_MODE = os.getenv("SUMMARY_AGGREGATION_MODE", "tree")
+    SUMMARY_AGGREGATION_FAN_IN = int(os.getenv("SUMMARY_AGGREGATION_FAN_IN", "4"))
+    # Maximum estimated tokens of one aggregation prompt and aggregation requests in flight
+    SUMMARY_AGGREGATION_TOKEN_BUDGET = int(os.getenv("SUMMARY_AGGREGATION_TOKEN_BUDGET", "100000"))
+    SUMMARY_AGGREGATION_CONCURRENCY = int(os.getenv("SUMMARY_AGGREGATION_CONCURRENCY", "4"))
+    # "auto" assembles the summary from chunk sections without an LLM call for at most
+    # SUMMARY_STRUCTURED_MERGE_MAX_CHUNKS chunks, "structured" always does, "llm" never does
+    SUMMARY_MERGE_MODE = os.getenv("SUMMARY_MERGE_MODE", "auto")
+    SUMMARY_STRUCTURED_MERGE_MAX_CHUNKS = int(os.getenv("SUMMARY_STRUCTURED_MERGE_MAX_CHUNKS", "3"))
+    # Exclude generated, minified, vendored, snapshot and SQL dump files detected from their content
+    CONTENT_FILTER_ENABLED = os.getenv("CONTENT_FILTER_ENABLED", "true").lower() == "true"
+    # Replace whitespace-only changes, renames without content changes and verbatim moved code with one-line notes
+    DIFF_ANALYSIS_ENABLED = os.getenv("DIFF_ANALYSIS_ENABLED", "true").lower() == "true"
+    # Minimum number of lines for a deleted block reappearing verbatim to count as moved code
+    DIFF_MOVED_CODE_MIN_LINES = int(os.getenv("DIFF_MOVED_CODE_MIN_LINES", "5"))
+    # Skip files whose hunks and before-content are unchanged since the last analysis of the same PR
+    INCREMENTAL_REVIEW_ENABLED = os.getenv("INCREMENTAL_REVIEW_ENABLED", "true").lower() == "true"
+    FINGERPRINT_STORE_DIR = os.getenv("FINGERPRINT_STORE_DIR", ".cache/fingerprints")
+    # Days a PR's fingerprints and comments are kept after its last analysis, 0 keeps them forever
+    FINGERPRINT_STORE_TTL_DAYS = float(os.getenv("FINGERPRINT_STORE_TTL_DAYS", "30"))
+    # Compute the files of requests naming a clone URL, base and head SHA from local bare mirrors
+    GIT_INGESTION_ENABLED = os.getenv("GIT_INGESTION_ENABLED", "true").lower() == "true"
+    GIT_MIRROR_DIR = os.getenv("GIT_MIRROR_DIR", ".cache/mirrors")
+    GIT_FETCH_TIMEOUT = int(os.getenv("GIT_FETCH_TIMEOUT", "300"))
+    # Keep file contents by SHA-256 so review requests can reference already sent contents by hash;
+    # off until the backend sends hashes, since every inline content is otherwise written to disk for nothing
+    BLOB_STORE_ENABLED = os.getenv("BLOB_STORE_ENABLED", "false").lower() == "true"
+    BLOB_STORE_DIR = os.getenv("BLOB_STORE_DIR", ".cache/blobs")
+    # Size of stored contents above which the least recently used are evicted
+    BLOB_STORE_MAX_MB = int(os.getenv("BLOB_STORE_MAX_MB", "1024"))
+    # Maximum distance (lines) over which a review comment is moved onto its quoted code snippet
+    COMMENT_SNAP_MAX_DISTANCE = int(os.getenv("COMMENT_SNAP_MAX_DISTANCE", "20"))
+    # What to do with comments outside the diff: "demote" attaches them to the file's first changed line, "drop" discards them
+    COMMENT_UNANCHORED_ACTION = os.getenv("COMMENT_UNANCHORED_ACTION", "demote")
+    # Collapse repeated review comments across chunks and against comments posted by earlier analyses
+    COMMENT_DEDUP_ENABLED = os.getenv("COMMENT_DEDUP_ENABLED", "true").lower() == "true"
+    # Estimated similarity (0-1) of the normalized issue text above which comments count as duplicates
+    COMMENT_DEDUP_SIMILARITY = float(os.getenv("COMMENT_DEDUP_SIMILARITY", "0.7"))
+    # Review comments of all chunks are posted in batches of at most this many comments and bytes,
+    # the rest with the completed marker; a COMMENT_BATCH_MAX_DELAY above 0 posts a batch after that
+    # many seconds, which only coalesces chunks when it is longer than the review of one chunk
+    COMMENT_BATCH_MAX_COMMENTS = int(os.getenv("COMMENT_BATCH_MAX_COMMENTS", "50"))
+    COMMENT_BATCH_MAX_BYTES = int(os.getenv("COMMENT_BATCH_MAX_BYTES", "262144"))
+    COMMENT_BATCH_MAX_DELAY = float(os.getenv("COMMENT_BATCH_MAX_DELAY", "0"))
 
 
 settings = Settings()
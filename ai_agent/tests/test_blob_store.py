@@ -0,0 +1,58 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import app.api.supervisor as supervisor_module
+import app.services.validation as validation_module
+from app.services.blob_store import BlobStore, MissingBlobsError
+from config.settings import settings
+
+
+def test_stored_contents_resolve_and_the_least_recently_used_are_evicted(tmp_path):
+    store = BlobStore(str(tmp_path), max_bytes=10)
+    first, second = store.write("aaaa"), store.write("bbbb")
+    assert store.read(first) == "aaaa"
+    third = store.write("cccc")
+    assert store.missing([first, second, third]) == [second]
+    # A new instance rebuilds its index from the directory
+    assert BlobStore(str(tmp_path), max_bytes=10).missing([first, third, second]) == [second]
+
+    file_info = {"prFileName": "a.py", "prFileContentBeforeHash": first, "prFileContentAfter": "new"}
+    assert store.resolve_file(file_info)["prFileContentBefore"] == "aaaa"
+    with pytest.raises(MissingBlobsError) as raised:
+        store.resolve_file({"prFileName": "b.py", "prFileContentAfterHash": second})
+    assert raised.value.hashes == [second]
+
+
+def test_only_contents_sent_inline_are_stored(tmp_path):
+    store = BlobStore(str(tmp_path))
+    files = [
+        {"prFileContentBefore": "old", "prFileContentAfter": "new"},
+        {"prFileContentBefore": "old", "prFileContentAfter": "resolved", "prFileContentAfterHash": "f" * 64}
+    ]
+    assert store.store_files(files) == 2
+    assert store.missing([store.hash_content("old"), store.hash_content("resolved")]) == [store.hash_content("resolved")]
+
+
+def test_contents_evicted_after_the_check_are_answered_with_409(tmp_path, monkeypatch):
+    store = BlobStore(str(tmp_path))
+    content_hash = store.write("print('hi')\n")
+    monkeypatch.setattr(settings, "BLOB_STORE_ENABLED", True)
+    monkeypatch.setattr(supervisor_module, "blob_store", store)
+    monkeypatch.setattr(validation_module, "blob_store", store)
+    # Evict the content once the request has been checked against the index
+    check = store.missing
+
+    def missing_then_evict(hashes):
+        result = check(hashes)
+        (tmp_path / content_hash[:2] / content_hash).unlink()
+        return result
+
+    monkeypatch.setattr(store, "missing", missing_then_evict)
+    app = FastAPI()
+    app.include_router(supervisor_module.supervisor)
+    response = TestClient(app).post("/ai_agent", json={"pullRequest": {
+        "prNumber": "1", "prTitle": "t", "pullRequestAnalysisId": "a" * 24,
+        "prFiles": [{"prFileName": "a.py", "prFileContentBeforeHash": content_hash, "prFileDiff": "@@ -1 +1 @@\n-a\n+b"}]
+    }})
+    assert response.status_code == 409
+    assert response.json()["detail"]["missing"] == [content_hash]
@@ -0,0 +1,73 @@
+import gzip
+import json
+import zlib
+import asyncio
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.api.supervisor import supervisor
+from app.utils.body_encoding import (
+    decompress_body_stream, encode_json_body, PayloadTooLargeError, UnsupportedContentEncodingError
+)
+
+BODY = json.dumps({"pullRequest": {"prFiles": [{"prFileName": f"f{index}.py", "prFileDiff": "+x\n" * 50} for index in range(200)]}}).encode()
+
+
+def decode(data, content_encoding, max_bytes=0, chunk_size=97):
+    async def chunks():
+        for start in range(0, len(data), chunk_size):
+            yield data[start:start + chunk_size]
+
+    async def read():
+        return b"".join([piece async for piece in decompress_body_stream(chunks(), content_encoding, max_bytes)])
+
+    return asyncio.run(read())
+
+
+def test_gzip_and_deflate_bodies_decompress_while_they_arrive():
+    assert decode(gzip.compress(BODY), "gzip") == BODY
+    assert decode(zlib.compress(BODY), "deflate") == BODY
+    assert decode(gzip.compress(BODY[:1000]) + gzip.compress(BODY[1000:]), "x-gzip") == BODY
+    # Codings are listed in the order they were applied
+    assert decode(gzip.compress(zlib.compress(BODY)), "deflate, gzip") == BODY
+    assert decode(BODY, "identity") == BODY
+
+
+def test_decompressed_size_is_limited():
+    bomb = gzip.compress(b" " * (8 << 20))
+    with pytest.raises(PayloadTooLargeError):
+        decode(bomb, "gzip", max_bytes=1 << 20, chunk_size=len(bomb))
+    assert decode(gzip.compress(BODY), "gzip", max_bytes=len(BODY)) == BODY
+
+
+def test_unsupported_truncated_and_corrupt_bodies_are_refused():
+    with pytest.raises(UnsupportedContentEncodingError):
+        decode(BODY, "br")
+    with pytest.raises(ValueError, match="ended inside"):
+        decode(gzip.compress(BODY)[:-20], "gzip")
+    with pytest.raises(ValueError, match="Corrupt"):
+        decode(b"not gzip at all", "gzip")
+
+
+def test_callback_bodies_are_compressed_once_large_enough():
+    body, headers = encode_json_body({"summary": "ok"}, min_bytes=1024)
+    assert headers == {"Content-Type": "application/json"}
+    assert json.loads(body) == {"summary": "ok"}
+
+    payload = {"comments": [{"issue": "é" * 100}] * 50}
+    body, headers = encode_json_body(payload, min_bytes=1024)
+    assert headers["Content-Encoding"] == "gzip"
+    assert json.loads(gzip.decompress(body)) == payload
+    assert "Content-Encoding" not in encode_json_body(payload, compression="none")[1]
+
+
+def test_review_endpoint_answers_413_and_415_for_bodies_it_cannot_decode(monkeypatch):
+    monkeypatch.setattr("app.api.supervisor.settings.PAYLOAD_MAX_MB", 1)
+    app = FastAPI()
+    app.include_router(supervisor)
+    client = TestClient(app)
+    headers = {"Content-Type": "application/json"}
+    response = client.post("/ai_agent", content=gzip.compress(b" " * (2 << 20)), headers={**headers, "Content-Encoding": "gzip"})
+    assert response.status_code == 413
+    response = client.post("/ai_agent", content=BODY, headers={**headers, "Content-Encoding": "br"})
+    assert response.status_code == 415
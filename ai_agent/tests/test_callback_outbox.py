@@ -0,0 +1,93 @@
+import os
+import json
+import asyncio
+import httpx
+from app.services.callback_outbox import CallbackOutbox
+
+
+def outbox_with(tmp_path, handler, max_attempts=10):
+    outbox = CallbackOutbox(str(tmp_path))
+    outbox.max_attempts = max_attempts
+    outbox.retry_base_seconds = outbox.retry_max_seconds = 0.01
+    outbox._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return outbox
+
+
+def test_a_slow_delivery_does_not_hold_back_other_analyses(tmp_path):
+    delivered = []
+
+    async def handler(request):
+        key = request.headers["Idempotency-Key"]
+        if key == "slow":
+            await asyncio.sleep(1)
+        delivered.append(key)
+        return httpx.Response(201)
+
+    async def run():
+        outbox = outbox_with(tmp_path, handler)
+        outbox.enqueue("http://backend/review", {}, "slow", "a", "slow")
+        outbox.enqueue("http://backend/review", {}, "a:next", "a", "next")
+        for index in range(3):
+            outbox.enqueue("http://backend/review", {}, f"b:{index}", "b", "fast")
+        await asyncio.sleep(0.3)
+        early = list(delivered)
+        await asyncio.sleep(1)
+        await outbox.close()
+        return early
+
+    assert asyncio.run(run()) == ["b:0", "b:1", "b:2"]
+    assert delivered == ["b:0", "b:1", "b:2", "slow", "a:next"]
+
+
+def test_exhausted_callbacks_are_retried_on_start_and_rejected_ones_kept(tmp_path):
+    outcomes = {"rejected": 400, "exhausted": 503}
+
+    async def run(handler, keys):
+        outbox = outbox_with(tmp_path, handler, max_attempts=2)
+        outbox.start()
+        for key in keys:
+            outbox.enqueue("http://backend/review", {}, key, key, key)
+        await asyncio.sleep(0.2)
+        await outbox.close()
+        return outbox
+
+    first = asyncio.run(run(lambda request: httpx.Response(outcomes[request.headers["Idempotency-Key"]]), list(outcomes)))
+    assert first._failed_count == 2
+    failed = [json.load(open(os.path.join(tmp_path, "failed", name))) for name in os.listdir(os.path.join(tmp_path, "failed"))]
+    assert sorted(record["failed_reason"] for record in failed) == ["exhausted", "rejected"]
+
+    delivered = []
+    second = asyncio.run(run(lambda request: delivered.append(request.headers["Idempotency-Key"]) or httpx.Response(201), []))
+    assert delivered == ["exhausted"]
+    assert second._failed_count == 1
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".json")] == []
+
+
+def test_failures_after_the_backend_may_have_acted_are_not_retried(tmp_path):
+    attempts = {}
+
+    async def handler(request):
+        key = request.headers["Idempotency-Key"]
+        attempts[key] = attempts.get(key, 0) + 1
+        if key == "timeout":
+            raise httpx.ReadTimeout("timed out", request=request)
+        if key == "connect" and attempts[key] < 3:
+            raise httpx.ConnectError("refused", request=request)
+        if key == "busy" and attempts[key] < 3:
+            return httpx.Response(503)
+        return httpx.Response(500 if key == "error" else 201)
+
+    async def run():
+        outbox = outbox_with(tmp_path, handler)
+        outbox.start()
+        for key in ["timeout", "error", "connect", "busy"]:
+            outbox.enqueue("http://backend/review", {}, key, key, key)
+        await asyncio.sleep(0.3)
+        await outbox.close()
+
+    asyncio.run(run())
+    assert attempts == {"timeout": 1, "error": 1, "connect": 3, "busy": 3}
+    failed = [json.load(open(os.path.join(tmp_path, "failed", name))) for name in os.listdir(os.path.join(tmp_path, "failed"))]
+    assert sorted((record["idempotency_key"], record["failed_reason"]) for record in failed) == [
+        ("error", "unconfirmed"), ("timeout", "unconfirmed")
+    ]
@@ -0,0 +1,87 @@
+from app.utils.chunking_strategy import ChunkingService, ChunkPreparationService
+from app.utils.parsed_diff import build_parsed_diff, get_parsed_diff, parse_hunks
+from config.settings import settings
+
+
+def long_hunk(start, added):
+    body = [f" context {start}"] + [f"+value_{start}_{index} = compute({index})  # " + "x" * 40 for index in range(added)] + [f" context {start + 1}"]
+    return f"@@ -{start},2 +{start},{added + 2} @@\n" + "\n".join(body)
+
+
+def new_line_numbers(hunks, markers=("+", " ")):
+    numbers = []
+    for hunk in hunks:
+        line_number = hunk.new_start
+        for line in hunk.lines:
+            if line.startswith(("+", " ")):
+                if line.startswith(markers):
+                    numbers.append((line_number, line))
+                line_number += 1
+    return numbers
+
+
+def test_split_hunks_keep_every_line_at_its_line_number():
+    hunk = parse_hunks("big.py", [long_hunk(100, 300)]).hunks[0]
+    pieces = ChunkingService().split_hunk(hunk, max_tokens=500)
+    assert len(pieces) > 1
+    assert all(sum(len(line) + 1 for line in piece.lines) <= 500 * 4 for piece in pieces)
+    assert [line for piece in pieces for line in piece.lines] == hunk.lines
+    assert new_line_numbers(pieces) == new_line_numbers([hunk])
+
+
+def test_oversized_files_are_split_into_parts_in_separate_chunks():
+    hunks = [long_hunk(1 + index * 500, 120) for index in range(6)]
+    big = {"prFileName": "src/big.py", "prFileDiffHunks": hunks, "prFileDiff": "\n".join(hunks)}
+    small = {"prFileName": "src/small.py", "prFileDiff": "@@ -1 +1 @@\n-a = 1\n+a = 2"}
+    service = ChunkingService(max_chunk_tokens=40000, max_file_tokens=4000)
+    assert service.is_file_oversized(big)[0]
+
+    chunks, ignored = service.create_chunks([big, small])
+    assert ignored == []
+    parts = [file_info for chunk in chunks for file_info in chunk.files if file_info["prFileName"] == "src/big.py"]
+    assert len(parts) > 1
+    assert [part["prFilePart"] for part in parts] == [{"index": index + 1, "total": len(parts)} for index in range(len(parts))]
+    assert all(service.estimate_file_tokens(part) <= 4000 for part in parts)
+    # Together the parts hold every added line of the file exactly once, at its original line number
+    part_hunks = [hunk for part in parts for hunk in get_parsed_diff(part).hunks]
+    assert new_line_numbers(part_hunks, "+") == new_line_numbers(get_parsed_diff(big).hunks, "+")
+    for chunk in chunks:
+        assert sum(1 for file_info in chunk.files if file_info["prFileName"] == "src/big.py") <= 1
+    assert sum(1 for chunk in chunks for file_info in chunk.files if file_info["prFileName"] == "src/small.py") == 1
+
+
+def test_a_line_larger_than_the_budget_is_reported_as_ignored():
+    hunk = "@@ -1,1 +1,2 @@\n a\n+" + "y" * 40000
+    service = ChunkingService(max_chunk_tokens=40000, max_file_tokens=2000)
+    chunks, ignored = service.create_chunks([{"prFileName": "data.py", "prFileDiffHunks": [hunk], "prFileDiff": hunk}])
+    assert chunks == []
+    assert [(entry.file_name, entry.reason) for entry in ignored] == [("data.py", "Hunk '@@ -2,0 +2,1 @@' exceeds 2000 token limit")]
+
+
+def test_summary_and_review_estimates_measure_their_own_prompt_sections(monkeypatch):
+    monkeypatch.setattr(settings, "REVIEW_CONTEXT_MODE", "window")
+    content = "".join(f"    total = total + item_{number}  # running sum\n" for number in range(2000))
+    hunk = "@@ -1000,1 +1000,1 @@\n-    total = total + item_999  # running sum\n+    total += item_999"
+    file_info = {"prFileName": "sum.py", "prFileContentBefore": content, "prFileDiffHunks": [hunk], "prFileDiff": hunk}
+    service = ChunkingService()
+
+    summary_tokens = service.estimate_file_tokens(file_info, "summary")
+    review_tokens = service.estimate_file_tokens(file_info, "review")
+    assert summary_tokens == len(ChunkPreparationService.render_summary_diff(file_info)) // 4
+    # The review carries a window of the before-content, not the whole file
+    assert summary_tokens < review_tokens < len(content) // 40
+
+    variables = ChunkPreparationService.prepare_chunk_for_review({"files": [file_info], "chunk_index": 0}, {"prTitle": "t"})
+    assert variables["pr_diff"] == ChunkPreparationService.render_review_diff(file_info)
+    assert variables["prFileContentBefore"] == ChunkPreparationService.render_content_before(file_info)
+    assert review_tokens == len(variables["pr_diff"]) // 4 + len(variables["prFileContentBefore"]) // 4
+
+
+def test_rendered_sections_follow_a_replaced_diff():
+    hunks = ["@@ -1,1 +1,1 @@\n-a = 1\n+a = 2", "@@ -9,1 +9,1 @@\n-b = 1\n+b = 2"]
+    file_info = {"prFileName": "a.py", "prFileDiffHunks": hunks, "prFileDiff": "\n".join(hunks)}
+    assert "b = 2" in ChunkPreparationService.render_review_diff(file_info)
+    file_info["parsedDiff"] = build_parsed_diff("a.py", get_parsed_diff(file_info).hunks[:1])
+    file_info.setdefault("prFileNotes", []).append("Original lines 9-9 moved unchanged")
+    rendered = ChunkPreparationService.render_review_diff(file_info)
+    assert "b = 2" not in rendered and "Note: Original lines 9-9 moved unchanged" in rendered
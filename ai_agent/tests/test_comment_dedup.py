@@ -0,0 +1,56 @@
+from app.utils.comment_dedup import CommentDeduplicationService
+
+
+def comment(file_path, line, issue, severity="Major", category="Bug"):
+    return {
+        "filePath": file_path, "lineStart": line, "lineEnd": line, "severity": severity, "category": category,
+        "content": f"**Issue**: {issue}\n\n**Suggestion**: Fix it.", "metadata": {}
+    }
+
+
+NONE_CHECK = "The result of `cache.get({})` may be None and is dereferenced without a check on line {}"
+
+
+def test_repeated_issues_in_other_files_are_collapsed_into_occurrences():
+    service = CommentDeduplicationService(0.7)
+    first = service.add_comments([
+        comment("a.py", 10, NONE_CHECK.format("'user'", 10)),
+        comment("a.py", 40, "SQL query is built with string formatting and is open to injection")
+    ])
+    second = service.add_comments([comment("b.py", 7, NONE_CHECK.format("'order'", 7))])
+    assert [c["lineStart"] for c in first] == [10, 40]
+    # Already posted in an earlier chunk, so the repeat is dropped rather than posted again
+    assert second == []
+    assert service.collapsed_count == 1
+
+    service = CommentDeduplicationService(0.7)
+    posted = service.add_comments([
+        comment("a.py", 10, NONE_CHECK.format("'user'", 10)),
+        comment("b.py", 7, NONE_CHECK.format("'order'", 7)),
+        comment("c.py", 3, NONE_CHECK.format("'order'", 3), category="Performance")
+    ])
+    assert [(c["filePath"], c["lineStart"]) for c in posted] == [("a.py", 10), ("c.py", 3)]
+    assert posted[0]["metadata"]["occurrences"] == [{"filePath": "b.py", "lineStart": 7, "lineEnd": 7}]
+    assert posted[0]["content"].endswith("**Also found in**: `b.py:7`")
+
+
+def test_rephrased_comments_on_the_same_lines_keep_the_most_severe():
+    service = CommentDeduplicationService(0.7)
+    posted = service.add_comments([
+        comment("a.py", 10, "Possible None dereference of the cache entry when it expires", "Minor"),
+        comment("a.py", 11, "The cache entry may be None when it expires, causing a dereference error", "Critical"),
+        comment("a.py", 30, "Unclosed file handle leaks a descriptor")
+    ])
+    assert [(c["lineStart"], c["severity"]) for c in posted] == [(11, "Critical"), (30, "Major")]
+    assert service.merged_count == 1
+
+
+def test_comments_posted_by_a_previous_analysis_are_suppressed_for_the_same_file_only():
+    previous = [comment("a.py", 10, NONE_CHECK.format("'user'", 10))]
+    service = CommentDeduplicationService(0.7, previous)
+    posted = service.add_comments([
+        comment("a.py", 12, NONE_CHECK.format("'user'", 12)),
+        comment("z.py", 5, NONE_CHECK.format("'user'", 5))
+    ])
+    assert [(c["filePath"], c["lineStart"]) for c in posted] == [("z.py", 5)]
+    assert [c["lineStart"] for c in service.suppressed_previous] == [12]
@@ -0,0 +1,50 @@
+import asyncio
+from app.services.comment_sink import ReviewCommentSink
+
+
+class FakeOutbox:
+    def __init__(self):
+        self.posts = []
+        self.payloads = []
+
+    def enqueue(self, url, payload, idempotency_key, group, label):
+        self.payloads.append(payload)
+        self.posts.append((idempotency_key, len(payload["comments"]), payload["completed"]))
+
+
+def comments(count):
+    return [{"filePath": f"f{index}.py", "content": "x" * 100} for index in range(count)]
+
+
+def review(max_delay, chunk_seconds=0.02, chunks=10):
+    async def run():
+        outbox = FakeOutbox()
+        sink = ReviewCommentSink(outbox, "http://backend/review", "a1", max_comments=8, max_bytes=262144, max_delay=max_delay)
+        for _ in range(chunks):
+            await asyncio.sleep(chunk_seconds)
+            sink.add(comments(3), {}, {})
+        sink.complete([])
+        return outbox.posts
+    return asyncio.run(run())
+
+
+def test_without_a_deadline_batches_are_posted_when_full_and_on_completion():
+    assert review(max_delay=0) == [
+        ("a1:review:batch:0", 8, 0), ("a1:review:batch:1", 8, 0), ("a1:review:batch:2", 8, 0), ("a1:review:final", 6, 1)
+    ]
+
+
+def test_a_deadline_shorter_than_a_chunk_posts_once_per_chunk():
+    posts = review(max_delay=0.005)
+    # The last chunk's comments go out with the completed marker
+    assert [count for _, count, _ in posts] == [3] * 10
+    assert posts[-1] == ("a1:review:final", 3, 1)
+
+
+def test_the_completed_marker_reports_unchanged_and_excluded_files():
+    outbox = FakeOutbox()
+    sink = ReviewCommentSink(outbox, "http://backend/review", "a1", max_delay=0)
+    excluded = [{"fileName": "dist/app.min.js", "kind": "minified", "reason": "Minified content"}]
+    sink.complete(["src/a.py"], excluded)
+    assert outbox.payloads[-1]["unchangedFiles"] == ["src/a.py"]
+    assert outbox.payloads[-1]["excludedFiles"] == excluded
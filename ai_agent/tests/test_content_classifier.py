@@ -0,0 +1,58 @@
+from app.utils.content_classifier import classify_file_content, exclude_generated_files
+
+
+def added_file(name, content):
+    lines = content.split("\n")
+    diff = f"@@ -0,0 +1,{len(lines)} @@\n" + "\n".join("+" + line for line in lines)
+    return {"prFileName": name, "prFileContentAfter": content, "prFileDiff": diff, "prFileDiffHunks": [diff]}
+
+
+def kind(name, content):
+    classification = classify_file_content(added_file(name, content))
+    return classification.kind if classification else None
+
+
+def test_generator_names_in_code_are_not_markers():
+    script = (
+        "import sys\n"
+        "from grpc_tools import protoc\n"
+        "from google.protobuf.internal import builder\n\n\n"
+        "def main():\n"
+        "    return protoc.main(['protoc', '-I.', '--python_out=.', 'api.proto'])\n"
+    )
+    assert kind("scripts/build_protos.py", script) is None
+
+
+def test_generated_headers_are_recognized():
+    assert kind("api_pb2.py", "# -*- coding: utf-8 -*-\n# Generated by the protocol buffer compiler.  DO NOT EDIT!\n# source: api.proto\nimport sys\n") == "generated"
+    assert kind("api_grpc.pb.go", "// Code generated by protoc-gen-go-grpc. DO NOT EDIT.\n\npackage api\n") == "generated"
+    openapi = (
+        "# coding: utf-8\n\n"
+        '"""\n'
+        "    Petstore API\n\n"
+        "    The version of the OpenAPI document: 1.0.0\n"
+        "    Generated by OpenAPI Generator (https://openapi-generator.tech)\n\n"
+        "    Do not edit the class manually.\n"
+        '"""  # noqa: E501\n\n'
+        "import re\n"
+    )
+    assert kind("client/api/pets_api.py", openapi) == "generated"
+    assert kind("src/schema.ts", "/* eslint-disable */\n/*\n * graphql-codegen output\n */\nexport type Query = {};\n") == "generated"
+
+
+def test_django_migrations_stay_reviewable():
+    migration = "# Generated by Django 4.2 on 2024-01-01 10:00\n\nfrom django.db import migrations\n"
+    assert kind("app/migrations/0002_auto.py", migration) is None
+
+
+def test_minified_and_snapshot_files_are_excluded():
+    minified = ";".join(f"var a{index}=function(b){{return b*{index}}}" for index in range(400))
+    kept, excluded = exclude_generated_files([
+        added_file("dist/app.min.js", minified),
+        added_file("src/__snapshots__/view.test.js.snap", "// Jest Snapshot v1, https://goo.gl/fbAQLP\n\nexports[`renders`] = `<div />`;\n"),
+        added_file("src/app.py", "def main():\n    return 1\n")
+    ])
+    assert [file_info["prFileName"] for file_info in kept] == ["src/app.py"]
+    assert [(entry["fileName"], entry["kind"]) for entry in excluded] == [
+        ("dist/app.min.js", "minified"), ("src/__snapshots__/view.test.js.snap", "snapshot")
+    ]
@@ -0,0 +1,42 @@
+from app.utils.chunking_strategy import ChunkPreparationService
+from app.utils.context_extractor import ContextExtractionService
+from app.utils.parsed_diff import parse_hunks
+from config.settings import settings
+
+CONTENT = "".join(f"line {number}\n" for number in range(1, 101))
+HUNKS = [
+    "@@ -10,1 +10,1 @@\n-line 10\n+line ten",
+    "@@ -15,0 +16,1 @@\n+inserted",
+    "@@ -80,2 +81,1 @@\n-line 80\n-line 81\n+line 80-81"
+]
+
+
+def test_windows_merge_and_keep_original_line_numbers():
+    excerpt = ContextExtractionService(window_lines=3).extract_context(CONTENT, parse_hunks("a.txt", HUNKS).hunks)
+    lines = excerpt.split("\n")
+    assert lines[0] == "... (lines 1-6 omitted) ..."
+    assert lines[1:13] == [f"{number:4d} | line {number}" for number in range(7, 19)]
+    assert lines[13] == "... (lines 19-76 omitted) ..."
+    assert lines[14:22] == [f"{number:4d} | line {number}" for number in range(77, 85)]
+    assert lines[22:] == ["... (lines 85-100 omitted) ..."]
+
+
+def test_windows_are_clamped_to_the_file():
+    service = ContextExtractionService(window_lines=50)
+    excerpt = service.extract_context(CONTENT, parse_hunks("a.txt", HUNKS[:1]).hunks)
+    assert excerpt.split("\n")[0] == "   1 | line 1"
+    assert excerpt.split("\n")[-1] == "... (lines 61-100 omitted) ..."
+    assert service.extract_context("", parse_hunks("a.txt", HUNKS).hunks) == ""
+
+
+def test_review_prompt_sends_windows_unless_full_context_is_configured(monkeypatch):
+    def file_info():
+        return {"prFileName": "a.txt", "prFileContentBefore": CONTENT, "prFileDiffHunks": HUNKS, "prFileDiff": "\n".join(HUNKS)}
+
+    monkeypatch.setattr(settings, "REVIEW_CONTEXT_MODE", "window")
+    windowed = ChunkPreparationService.render_content_before(file_info())
+    assert "excerpt with original line numbers" in windowed
+    assert "| line 50" not in windowed and "  10 | line 10" in windowed
+
+    monkeypatch.setattr(settings, "REVIEW_CONTEXT_MODE", "full")
+    assert ChunkPreparationService.render_content_before(file_info()).endswith(CONTENT)
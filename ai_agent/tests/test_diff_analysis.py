@@ -0,0 +1,88 @@
+from app.utils.diff_analysis import DiffAnalysisService
+from app.utils.parsed_diff import get_parsed_diff
+
+
+def pr_file(name, hunk, status="modified", **fields):
+    return {"prFileName": name, "prFileStatus": status, "prFileDiff": hunk, "prFileDiffHunks": [hunk], **fields}
+
+
+def changed_lines(file_info):
+    return [line for hunk in get_parsed_diff(file_info).hunks for line in hunk.lines if line[:1] in ("+", "-")]
+
+
+def test_whitespace_inside_string_literals_is_a_real_change():
+    file_info = pr_file("src/users.js", "\n".join([
+        "@@ -10,3 +10,3 @@",
+        " function load() {",
+        '-  return db.query("SELECT * FROM users WHERE id = ?", [id]);',
+        '+  return db.query("SELECT * FROMusers WHERE id = ?", [id]);',
+        " }"
+    ]))
+    report = DiffAnalysisService(min_moved_lines=3).analyze([file_info])
+    assert report.whitespace_only_changes == 0
+    assert len(changed_lines(file_info)) == 2
+    assert "prFileNotes" not in file_info
+
+
+def test_reformatting_outside_literals_is_omitted():
+    file_info = pr_file("src/users.js", "\n".join([
+        "@@ -10,4 +10,4 @@",
+        " function load() {",
+        '-  return db.query( "SELECT * FROM users",[id] );',
+        "-  const total=count + 1;",
+        '+    return db.query("SELECT * FROM users", [id]);',
+        "+    const total = count  +  1;",
+        " }",
+        "-  const  old=1;",
+        "+  const old = 2;"
+    ]))
+    report = DiffAnalysisService(min_moved_lines=3).analyze([file_info])
+    assert report.whitespace_only_changes == 1
+    assert changed_lines(file_info) == ["-  const  old=1;", "+  const old = 2;"]
+    assert file_info["prFileNotes"] == ["Whitespace-only changes omitted at lines 11-12"]
+
+
+def test_dedented_python_block_is_not_reported_as_moved():
+    body = [
+        "result = compute_value(x, offset)",
+        "if result > limit:",
+        "    log_overflow(result, limit)",
+        "cache[x] = result",
+        "return result"
+    ]
+    hunk = "\n".join(
+        ["@@ -11,7 +11,6 @@", " def handle(x):", "-    if check(x):"]
+        + ["-        " + line for line in body]
+        + ["+    " + line for line in body]
+        + ["     # done"]
+    )
+    file_info = pr_file("app/handler.py", hunk)
+    report = DiffAnalysisService(min_moved_lines=3).analyze([file_info])
+    assert report.moved_blocks == 0
+    assert len(changed_lines(file_info)) == 11
+
+    # The same change in a language without significant indentation is a move
+    brace_file = pr_file("app/handler.js", hunk)
+    assert DiffAnalysisService(min_moved_lines=3).analyze([brace_file]).moved_lines == 5
+
+
+def test_code_moved_between_files_is_replaced_by_notes():
+    block = [
+        "def normalize_address(address):",
+        "    street = address.street.strip().title()",
+        "    city = address.city.strip().title()",
+        "    return f'{street}, {city}'"
+    ]
+    old = pr_file("app/models.py", "\n".join(["@@ -20,5 +20,1 @@", " import re"] + ["-" + line for line in block]))
+    new = pr_file("app/address.py", "\n".join(["@@ -0,0 +1,4 @@"] + ["+" + line for line in block]), status="added")
+    report = DiffAnalysisService(min_moved_lines=3).analyze([old, new])
+    assert (report.moved_blocks, report.moved_lines) == (1, 4)
+    assert changed_lines(old) == changed_lines(new) == []
+    assert old["prFileNotes"] == ["Original lines 21-24 moved unchanged to app/address.py lines 1-4"]
+
+
+def test_rename_without_changes_keeps_only_a_note():
+    file_info = pr_file("src/new_name.py", "", status="renamed", prFilePreviousName="src/old_name.py")
+    report = DiffAnalysisService().analyze([file_info])
+    assert report.rename_only_files == 1
+    assert file_info["prFileNotes"] == ["Renamed from src/old_name.py without content changes"]
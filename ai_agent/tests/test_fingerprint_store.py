@@ -0,0 +1,69 @@
+import os
+import time
+import asyncio
+from app.services.fingerprint_store import FingerprintStore
+from config.settings import settings
+
+
+def pr(files):
+    return {"provider": "github", "repo_structure_summary": "org/repo", "prNumber": "7", "minSeverity": "Major", "prFiles": files}
+
+
+def file(name, added):
+    return {"prFileName": name, "prFileDiffHunks": [f"@@ -1,1 +1,2 @@\n a\n+{added}"], "prFileContentBefore": "a\n"}
+
+
+def reviewed_store(tmp_path):
+    store = FingerprintStore(str(tmp_path))
+    data = pr([file("a.py", "x"), file("b.py", "y")])
+    comments = [{"filePath": "a.py", "lineStart": 2, "content": "issue"}]
+    store.record_review(data, data["prFiles"], comments, {})
+    return store
+
+
+def test_only_changed_files_are_reviewed_again(tmp_path):
+    store = reviewed_store(tmp_path)
+    changed, unchanged = store.partition_files(pr([file("a.py", "x"), file("b.py", "z"), file("c.py", "w")]))
+    assert [f["prFileName"] for f in changed] == ["b.py", "c.py"]
+    assert list(unchanged) == ["a.py"]
+    assert unchanged["a.py"]["comments"] == [{"filePath": "a.py", "lineStart": 2, "content": "issue"}]
+
+
+def test_settings_that_shape_review_output_invalidate_stored_results(tmp_path, monkeypatch):
+    store = reviewed_store(tmp_path)
+    data = pr([file("a.py", "x"), file("b.py", "y")])
+    assert store.partition_files(data)[1]
+    for name, value in (("REVIEW_OUTPUT_SCHEMA", "compact"), ("DIFF_RENDER_PROFILE", "standard"), ("REVIEW_OUTPUT_MODE", "text")):
+        with monkeypatch.context() as patch:
+            patch.setattr(settings, name, value)
+            changed, unchanged = store.partition_files(data)
+            assert len(changed) == 2 and unchanged == {}, name
+
+
+def test_records_older_than_the_ttl_are_ignored_and_pruned(tmp_path):
+    store = reviewed_store(tmp_path)
+    data = pr([file("a.py", "x")])
+    path = store._record_path(store.get_pr_key(data))
+    old = time.time() - store.ttl_seconds - 60
+    os.utime(path, (old, old))
+    assert store.partition_files(data) == (data["prFiles"], {})
+    assert store.prune() == 1
+    assert not os.path.exists(path)
+
+
+def test_analyses_of_the_same_pr_are_serialized(tmp_path):
+    store = FingerprintStore(str(tmp_path))
+    events = []
+
+    async def analysis(name):
+        async with store.lock(pr([])):
+            events.append(f"{name} start")
+            await asyncio.sleep(0.01)
+            events.append(f"{name} end")
+
+    async def run():
+        await asyncio.gather(analysis("first"), analysis("second"))
+
+    asyncio.run(run())
+    assert events == ["first start", "first end", "second start", "second end"]
+    assert store._locks == {}
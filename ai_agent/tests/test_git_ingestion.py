@@ -0,0 +1,108 @@
+import re
+import asyncio
+import subprocess
+import pytest
+import app.api.supervisor as supervisor_module
+from app.models.pr_event import PRPayloadV2
+from app.services.git_mirror import GitMirrorError, GitMirrorService
+from app.services.validation import validate_git_ingestion_payload
+
+BASE_SHA = "a" * 40
+HEAD_SHA = "b" * 40
+
+
+def git(cwd, *args):
+    command = ["git", "-c", "user.name=t", "-c", "user.email=t@example.com", "-c", "init.defaultBranch=main", *args]
+    return subprocess.run(command, cwd=cwd, check=True, capture_output=True, text=True).stdout.strip()
+
+
+def payload(clone_url, **fields):
+    return PRPayloadV2.model_validate({"pullRequest": {
+        "prNumber": "7", "prTitle": "t", "pullRequestAnalysisId": "c" * 24,
+        "prRepoCloneUrl": clone_url, "prBaseSha": BASE_SHA, "prHeadSha": HEAD_SHA, **fields
+    }})
+
+
+def test_only_remote_clone_urls_are_accepted():
+    for clone_url in ["https://github.com/org/repo.git", "ssh://git@host/org/repo", "git@github.com:org/repo.git"]:
+        assert validate_git_ingestion_payload(payload(clone_url)) == (True, "")
+    for clone_url in ["--upload-pack=touch /tmp/PWNED;", "file:///srv/repo", "/srv/repo", "ext::sh -c id", "git@host:-oProxyCommand=x"]:
+        assert not validate_git_ingestion_payload(payload(clone_url))[0]
+
+
+def test_option_like_clone_urls_never_reach_git(tmp_path):
+    service = GitMirrorService(str(tmp_path / "mirrors"))
+    marker = tmp_path / "PWNED"
+    with pytest.raises(GitMirrorError):
+        asyncio.run(service.load_pr_files(f"--upload-pack=touch {marker};", BASE_SHA, HEAD_SHA))
+    assert not marker.exists()
+
+
+def test_local_repositories_cannot_be_fetched(tmp_path, monkeypatch):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    git(repo, "init", "-q")
+    git(repo, "commit", "-q", "--allow-empty", "-m", "base")
+    head = git(repo, "rev-parse", "HEAD")
+    # Even past the URL check, git itself refuses the file transport
+    monkeypatch.setattr("app.services.git_mirror.CLONE_URL_RE", re.compile(".*"))
+    service = GitMirrorService(str(tmp_path / "mirrors"))
+    with pytest.raises(GitMirrorError):
+        asyncio.run(service.ensure_commits(f"file://{repo}", [head]))
+
+
+def test_files_are_computed_from_the_mirror(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    git(repo, "init", "-q")
+    (repo / "app.py").write_text("a = 1\nb = 2\n")
+    (repo / "old.txt").write_text("gone\n")
+    git(repo, "add", "-A")
+    git(repo, "commit", "-q", "-m", "base")
+    base = git(repo, "rev-parse", "HEAD")
+    (repo / "app.py").write_text("a = 1\nb = 3\n")
+    (repo / "old.txt").unlink()
+    (repo / "dist").mkdir()
+    (repo / "dist" / "bundle.js").write_text("x\n")
+    git(repo, "add", "-A")
+    git(repo, "commit", "-q", "-m", "head")
+    head = git(repo, "rev-parse", "HEAD")
+
+    service = GitMirrorService(str(tmp_path / "mirrors"))
+    clone_url = "https://git.example.com/org/repo.git"
+    mirror_path = service.get_mirror_path(clone_url)
+    git(tmp_path, "init", "-q", "--bare", mirror_path)
+    git(mirror_path, "fetch", "-q", str(repo), "main:refs/heads/main")
+
+    files = asyncio.run(service.load_pr_files(clone_url, base, head, ["dist/**"]))
+    by_name = {file_info["prFileName"]: file_info for file_info in files}
+    assert sorted(by_name) == ["app.py", "old.txt"]
+    assert by_name["app.py"]["prFileStatus"] == "modified"
+    assert (by_name["app.py"]["prFileAdditions"], by_name["app.py"]["prFileDeletions"]) == (1, 1)
+    assert by_name["app.py"]["prFileContentBefore"] == "a = 1\nb = 2\n"
+    assert by_name["app.py"]["prFileContentAfter"] == "a = 1\nb = 3\n"
+    assert by_name["app.py"]["prFileDiff"].startswith("@@ -1,2 +1,2 @@")
+    assert by_name["old.txt"]["prFileStatus"] == "removed"
+    assert by_name["old.txt"]["prFileContentAfter"] == ""
+
+
+class FakeOutbox:
+    def __init__(self):
+        self.payloads = []
+
+    def enqueue(self, url, payload, idempotency_key, group, label):
+        self.payloads.append(payload)
+
+
+def test_failed_ingestion_closes_the_analysis(monkeypatch):
+    async def failing_load(*args):
+        raise GitMirrorError("git fetch failed: repository not found")
+
+    outbox = FakeOutbox()
+    monkeypatch.setattr(supervisor_module.git_mirror_service, "load_pr_files", failing_load)
+    monkeypatch.setattr(supervisor_module.pr_processor, "callback_outbox", outbox)
+    asyncio.run(supervisor_module.process_git_pr_background(payload("https://github.com/org/repo.git")))
+    assert len(outbox.payloads) == 1
+    final = outbox.payloads[0]
+    assert (final["pullRequestAnalysisId"], final["completed"], final["comments"]) == ("c" * 24, 1, [])
+    assert "repository not found" in final["failedReason"]
@@ -0,0 +1,106 @@
+import json
+import random
+from app.utils.json_salvage import JSONArrayStreamParser, salvage_json_array
+
+TRICKY_PIECES = ['}', '{', '[', ']', '"', '\\', '}, {', '\\"', '\n', 'é', '😀', ',', '```', 'abc', ' ', 'x=1;']
+WRAPPERS = ["{}", "```json\n{}\n```", "Here is the review [see below]:\n{}\nThanks", "```\n{}"]
+
+
+def random_items(rng, count):
+    def text():
+        return "".join(rng.choice(TRICKY_PIECES) for _ in range(rng.randint(0, 12)))
+
+    return [
+        {
+            "fileName": f"src/f{index}.py",
+            "lineStart": rng.randint(1, 900),
+            "issue": text(),
+            "codeSnippet": text(),
+            "severity": rng.choice(["Major", "Minor"]),
+            "meta": {"tags": [text(), 1, None]}
+        }
+        for index in range(count)
+    ]
+
+
+def render(rng, items):
+    body = json.dumps(items, indent=rng.choice([None, 2]), ensure_ascii=rng.random() < 0.5)
+    return rng.choice(WRAPPERS).replace("{}", body)
+
+
+def stream(text, rng):
+    parser = JSONArrayStreamParser()
+    items = []
+    position = 0
+    while position < len(text):
+        size = rng.randint(1, 40)
+        items += parser.feed(text[position:position + size])
+        position += size
+    return items + parser.close(), parser
+
+
+def test_complete_and_streamed_output_yield_every_item():
+    rng = random.Random(7)
+    for _ in range(300):
+        items = random_items(rng, rng.randint(0, 15))
+        text = render(rng, items)
+        assert salvage_json_array(text).items == items
+        streamed, parser = stream(text, rng)
+        assert streamed == items
+        assert parser.complete
+
+
+def test_truncated_output_yields_a_prefix_of_the_items():
+    rng = random.Random(11)
+    for _ in range(300):
+        items = random_items(rng, rng.randint(0, 15))
+        text = render(rng, items)
+        recovered = salvage_json_array(text[:rng.randint(0, len(text))]).items
+        assert recovered == items[:len(recovered)]
+
+
+def test_truncated_output_keeps_every_finished_item():
+    items = random_items(random.Random(3), 10)
+    text = json.dumps(items)
+    cut = text.index(json.dumps(items[7]))
+    parser = salvage_json_array(text[:cut + 5])
+    assert parser.items == items[:7]
+    assert parser.truncated
+
+
+def test_malformed_item_only_loses_itself():
+    rng = random.Random(5)
+    for _ in range(300):
+        items = random_items(rng, rng.randint(3, 12))
+        broken = rng.randrange(len(items))
+        pieces = [json.dumps(item) for item in items]
+        # Structural damage that keeps the braces balanced
+        damage = rng.choice([('"lineStart": ', '"lineStart" '), ('"severity": ', '"severity": ,'), ('", "', '" "')])
+        pieces[broken] = pieces[broken].replace(*damage, 1)
+        parser = salvage_json_array("[" + ", ".join(pieces) + "]")
+        # Resynchronizing inside the damaged item may also pick up fragments of its strings
+        assert [item for item in parser.items if item in items] == items[:broken] + items[broken + 1:]
+        assert parser.malformed_items >= 1
+        assert parser.complete
+
+
+def test_keyed_parser_ignores_brackets_in_strings_before_the_key():
+    comments = [{"fileName": "a.py", "lineStart": 3, "issue": "Uses [] here"}, {"fileName": "b.py", "lineStart": 9, "issue": "x"}]
+    text = json.dumps({"summary": "Uses arr[] and list[{...}] now, \"comments\": [] too", "comments": comments, "potentialIssues": 2})
+    assert salvage_json_array(text, key="comments").items == comments
+    for size in (1, 3, 17):
+        parser = JSONArrayStreamParser(key="comments")
+        streamed = []
+        for start in range(0, len(text), size):
+            streamed += parser.feed(text[start:start + size])
+        assert streamed + parser.close() == comments
+        assert parser.complete
+
+
+def test_keyed_parser_recovers_comments_of_truncated_tool_input():
+    comments = random_items(random.Random(13), 6)
+    text = json.dumps({"summary": "list[{}] and {\"a\": [1]}", "comments": comments})
+    cut = text.index(json.dumps(comments[4]))
+    parser = salvage_json_array(text[:cut + 10], key="comments")
+    assert parser.items == comments[:4]
+    assert parser.truncated
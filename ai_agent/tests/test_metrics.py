@@ -0,0 +1,57 @@
+import asyncio
+from fastapi.testclient import TestClient
+from app.main import app
+from app.utils.metrics import MetricsRegistry, REQUESTS
+
+
+def test_counters_gauges_and_histograms_render_in_the_text_format():
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests", ["outcome"])
+    requests.inc(outcome="accepted")
+    requests.inc(2, outcome="accepted")
+    requests.inc(outcome='bad "quote"')
+    registry.gauge("queue_depth", "Depth", lambda: 7)
+    registry.gauge("broken", "Fails", lambda: 1 / 0)
+    duration = registry.histogram("duration_seconds", "Duration", ["stage"], buckets=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 3):
+        duration.observe(value, stage="decode")
+
+    assert registry.render().splitlines() == [
+        "# HELP requests_total Requests",
+        "# TYPE requests_total counter",
+        'requests_total{outcome="accepted"} 3',
+        'requests_total{outcome="bad \\"quote\\""} 1',
+        "# HELP queue_depth Depth",
+        "# TYPE queue_depth gauge",
+        "queue_depth 7",
+        "# HELP duration_seconds Duration",
+        "# TYPE duration_seconds histogram",
+        'duration_seconds_bucket{stage="decode",le="0.1"} 2',
+        'duration_seconds_bucket{stage="decode",le="1"} 3',
+        'duration_seconds_bucket{stage="decode",le="+Inf"} 4',
+        'duration_seconds_sum{stage="decode"} 3.65',
+        'duration_seconds_count{stage="decode"} 4',
+    ]
+
+
+def test_histogram_timer_includes_awaits():
+    registry = MetricsRegistry()
+    duration = registry.histogram("step_seconds", "Step", buckets=(0.01, 10))
+
+    async def step():
+        with duration.time():
+            await asyncio.sleep(0.02)
+
+    asyncio.run(step())
+    lines = registry.render().splitlines()
+    assert 'step_seconds_bucket{le="0.01"} 0' in lines
+    assert 'step_seconds_bucket{le="10"} 1' in lines
+
+
+def test_metrics_endpoint_serves_the_global_registry():
+    REQUESTS.inc(outcome="test")
+    response = TestClient(app).get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'pullsight_requests_total{outcome="test"}' in response.text
+    assert "# TYPE pullsight_stage_duration_seconds histogram" in response.text
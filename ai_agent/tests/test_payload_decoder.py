@@ -0,0 +1,52 @@
+import json
+import random
+import pytest
+from pydantic import ValidationError
+from app.models.pr_event import PRPayloadV2
+from app.utils.payload_decoder import PRPayloadStreamDecoder
+
+
+def payload(rng):
+    files = [
+        {
+            "prFileName": f"f{index}.py",
+            "prFileContentBefore": 'x = "a\\"b" ü 日本 {[]}\n' * rng.randint(0, 30),
+            "prFileDiffHunks": ["@@ -1 +1 @@\n-a\n+b"],
+            "extra": {"k": [1, {"z": "}"}]}
+        }
+        for index in range(20)
+    ]
+    # A decoy "prFiles" inside a string and unknown values around the array
+    return {"pullRequest": {
+        "prBody": 'see "prFiles": [ {"x":1} ]', "prNumber": 5, "prTitle": "t",
+        "prFiles": files, "ignore": None, "tail": [{"a": 1}]
+    }}
+
+
+def decode_in_pieces(body, rng, compact_threshold):
+    decoder = PRPayloadStreamDecoder()
+    decoder.COMPACT_THRESHOLD = compact_threshold
+    position = 0
+    while position < len(body):
+        size = rng.randint(1, 200)
+        decoder.feed(body[position:position + size])
+        position += size
+    return decoder.close()
+
+
+@pytest.mark.parametrize("indent", [None, 2])
+def test_incremental_decoding_matches_whole_body_decoding(indent):
+    rng = random.Random(3)
+    body = json.dumps(payload(rng), ensure_ascii=False, indent=indent).encode()
+    expected = PRPayloadV2.model_validate_json(body)
+    for _ in range(200):
+        assert decode_in_pieces(body, rng, rng.choice([16, 1 << 20])) == expected
+
+
+def test_invalid_file_raises_a_validation_error():
+    body = json.dumps({"pullRequest": {"prNumber": 1, "prTitle": "t", "prFiles": [{"prFileName": 3}]}}).encode()
+    with pytest.raises(ValidationError) as error:
+        decoder = PRPayloadStreamDecoder()
+        decoder.feed(body)
+        decoder.close()
+    assert error.value.errors()[0]["loc"] == ("pullRequest", "prFiles", 0, "prFileName")
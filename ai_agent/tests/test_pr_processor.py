@@ -0,0 +1,33 @@
+import asyncio
+from app.services.pr_processor import PRProcessor
+
+
+class FakeOutbox:
+    def __init__(self):
+        self.posts = []
+
+    def enqueue(self, url, payload, idempotency_key, group, label):
+        self.posts.append((idempotency_key, payload))
+
+
+def extracted_data(pr_files, excluded_files):
+    return {
+        "provider": "github", "installation_id": "1", "pullRequestAnalysisId": "a" * 24, "number_of_files": len(pr_files),
+        "prNumber": "5", "prTitle": "Regenerate clients", "prBody": "", "author_name": "", "repo_structure_summary": "",
+        "prFiles": pr_files, "excluded_files": excluded_files, "diff_analysis": {}, "api_key": "key", "model_name": None,
+        "minSeverity": "Major", "prFileDiffHunks": []
+    }
+
+
+def test_an_analysis_with_nothing_to_review_is_still_completed():
+    excluded = [{"fileName": "client/api.py", "kind": "generated", "reason": "Generated OpenAPI client code"}]
+    for combined in (False, True):
+        processor = PRProcessor()
+        processor.callback_outbox = FakeOutbox()
+        processor.incremental_review_enabled = processor.comment_dedup_enabled = False
+        processor.combined_summary_enabled = combined
+        asyncio.run(processor.process_pr_review(extracted_data([], excluded)))
+        keys = [key for key, _ in processor.callback_outbox.posts]
+        assert keys == ["a" * 24 + ":summary", "a" * 24 + ":review:final"]
+        final = processor.callback_outbox.posts[-1][1]
+        assert (final["completed"], final["comments"], final["excludedFiles"]) == (1, [], excluded)
@@ -0,0 +1,40 @@
+from app.utils.chunking_strategy import ChunkingService
+from app.api.review_parser import build_chunked_review_comments
+
+
+def split_file():
+    hunks = []
+    for index in range(20):
+        start = 1 + index * 100
+        body = [f" line {start}"] + [f"+new {start + offset} " + "z" * 60 for offset in range(1, 30)] + [f" line {start + 1}"]
+        hunks.append(f"@@ -{start},2 +{start},31 @@\n" + "\n".join(body))
+    file_info = {"prFileName": "big.py", "prFileDiffHunks": hunks, "prFileDiff": "\n".join(hunks)}
+    parts, _ = ChunkingService(max_file_tokens=2000).split_oversized_file(file_info)
+    assert len(parts) > 1
+    return parts
+
+
+def item(**fields):
+    return {"fileName": "big.py", "severity": "Critical", "issue": "issue", "suggestion": "fix", **fields}
+
+
+def test_comments_anchor_against_every_part_of_a_split_file():
+    comments = build_chunked_review_comments(
+        [item(lineStart=6), item(lineStart=1906, lineEnd=1908)], split_file(), "Major"
+    )
+    assert [(comment["lineStart"], comment["lineEnd"]) for comment in comments] == [(6, 6), (1906, 1908)]
+
+
+def test_line_numbers_given_as_strings_are_coerced():
+    comments = build_chunked_review_comments(
+        [item(lineStart="910", lineEnd="912", codeSnippet="new 906 " + "z" * 60, codeSnippetLineStart="908")],
+        split_file(), "Major"
+    )
+    assert [(comment["lineStart"], comment["lineEnd"], comment["codeSnippetLineStart"]) for comment in comments] == [(908, 910, 906)]
+
+
+def test_a_bad_item_does_not_discard_the_chunk():
+    comments = build_chunked_review_comments(
+        [item(lineStart=6, codeSnippet=["not", "text"]), item(lineStart=106)], split_file(), "Major"
+    )
+    assert [comment["lineStart"] for comment in comments] == [106]
@@ -0,0 +1,50 @@
+import asyncio
+from app.utils.summary_aggregator import AggregationContext, SummaryAggregationService
+
+TOTALS = {"estimated_code_review_time": 45, "potential_issue_count": 6}
+
+
+def context(count):
+    return AggregationContext({"prTitle": "t", "prNumber": "1"}, TOTALS, count)
+
+
+class FakeLLM:
+    def __init__(self, failing_text=None):
+        self.prompts = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.failing_text = failing_text
+
+    async def generate_pr_summary(self, prompt):
+        self.prompts.append(prompt)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        if self.failing_text and f"{self.failing_text}\n" in prompt and "Aggregated Summary from" not in prompt:
+            raise RuntimeError("overloaded")
+        return f"merged({prompt.count('--- Chunk ')})", {"input_tokens": 10, "output_tokens": 2}, "model"
+
+
+def test_tree_reduce_merges_level_by_level_with_bounded_concurrency():
+    llm = FakeLLM()
+    service = SummaryAggregationService(mode="tree", fan_in=3, max_concurrency=2, merge_mode="llm")
+    summaries = [f"chunk {index}" for index in range(10)]
+    summary, usage, model = asyncio.run(service.tree_reduce_summaries(summaries, context(10), llm))
+    # 10 -> 4 (three calls, one group of one) -> 2 (one call) -> 1 (one call)
+    assert len(llm.prompts) == 5
+    assert llm.max_in_flight == 2
+    assert usage == {"input_tokens": 50, "output_tokens": 10}
+    assert summary == "merged(2)"
+    # Only the root is given the PR-wide totals
+    assert [str(TOTALS) in prompt for prompt in llm.prompts] == [False] * 4 + [True]
+
+
+def test_a_failed_node_falls_back_to_concatenating_its_own_group():
+    llm = FakeLLM(failing_text="chunk 4")
+    service = SummaryAggregationService(mode="tree", fan_in=3, max_concurrency=4, merge_mode="llm")
+    summary, _, _ = asyncio.run(service.tree_reduce_summaries([f"chunk {index}" for index in range(6)], context(6), llm))
+    assert summary == "merged(2)"
+    root_prompt = llm.prompts[-1]
+    assert "merged(3)" in root_prompt
+    assert "# Aggregated Summary from 3 Chunks" in root_prompt and "chunk 4" in root_prompt
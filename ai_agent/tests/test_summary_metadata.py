@@ -0,0 +1,63 @@
+import asyncio
+from app.utils.summary_aggregator import AggregationContext, SummaryAggregationService
+from app.utils.summary_metadata import SummaryMetadataService
+
+TOTALS = {"estimated_code_review_time": 25, "potential_issue_count": 4}
+
+
+def chunk_summary(walkthrough, rows, minutes, issues):
+    table = "\n".join(f"| `{path}` | Modified | {text} |" for path, text in rows)
+    return (
+        f"# Summary by Pullsight AI\n\n## Walkthrough\n\n{walkthrough}\n\n"
+        f"## File changes\n\n| File Path | Change type | Short description |\n| --- | ---: | --- |\n{table}\n\n"
+        f"## Estimated Code Review Effort\n\n⚠️ ~ {issues} issues | ⏱️ ~ {minutes} minutes\n\n"
+        f'<!-- pullsight-metadata {{"estimatedReviewMinutes": {minutes}, "potentialIssues": {issues}}} -->'
+    )
+
+
+def test_split_reads_the_metadata_comment_and_falls_back_to_the_effort_line():
+    service = SummaryMetadataService()
+    prose, metadata = service.split(chunk_summary("Adds caching.", [("a.py", "x")], 10, 3))
+    assert "pullsight-metadata" not in prose
+    assert (metadata.estimated_code_review_time, metadata.potential_issue_count, metadata.source) == (10, 3, "metadata")
+
+    prose, metadata = service.split(prose.replace("3 issues", "2 issues"))
+    assert (metadata.estimated_code_review_time, metadata.potential_issue_count, metadata.source) == (10, 2, "text")
+
+
+def test_structured_merge_keeps_one_row_per_file_and_writes_the_summed_totals():
+    service = SummaryMetadataService()
+    summaries = [
+        service.split(chunk_summary("Adds caching.", [("a.py", "first"), ("b.py", "b")], 10, 3))[0],
+        service.split(chunk_summary("Fixes expiry.", [("a.py", "second"), ("c.py", "c")], 15, 1))[0]
+    ]
+    merged = service.structured_merge(summaries, TOTALS)
+    assert "Adds caching.\n\nFixes expiry." in merged
+    assert [line for line in merged.splitlines() if line.startswith("| `")] == [
+        "| `a.py` | Modified | first |", "| `b.py` | Modified | b |", "| `c.py` | Modified | c |"
+    ]
+    assert merged.count("⚠️") == 1
+    assert merged.endswith("⚠️ ~ 4 issues | ⏱️ ~ 25 minutes")
+
+
+def test_apply_totals_replaces_or_adds_the_effort_line():
+    service = SummaryMetadataService()
+    summary = "# Summary\n\n## Estimated Code Review Effort\n\n⚠️ ~ 9 issues | ⏱️ ~ 90 minutes\n\n## Notes\n\nx"
+    assert service.apply_totals(summary, TOTALS) == summary.replace("9 issues | ⏱️ ~ 90", "4 issues | ⏱️ ~ 25")
+    assert service.apply_totals("# Summary", TOTALS).endswith(
+        "## Estimated Code Review Effort\n\n⚠️ ~ 4 issues | ⏱️ ~ 25 minutes"
+    )
+
+
+def test_auto_mode_merges_a_few_chunks_without_an_llm_call():
+    class NoLLM:
+        async def generate_pr_summary(self, prompt):
+            raise AssertionError("unexpected LLM call")
+
+    service = SummaryAggregationService(merge_mode="auto")
+    summaries = [chunk_summary(f"Part {index}.", [(f"f{index}.py", "x")], 5, 1) for index in range(2)]
+    summaries = [SummaryMetadataService().split(summary)[0] for summary in summaries]
+    context = AggregationContext({"prTitle": "t", "prNumber": "1"}, TOTALS, len(summaries))
+    summary, usage, model = asyncio.run(service.aggregate_summaries(summaries, context, NoLLM()))
+    assert (usage, model) == ({"input_tokens": 0, "output_tokens": 0}, "")
+    assert "Part 0.\n\nPart 1." in summary and summary.endswith("⚠️ ~ 4 issues | ⏱️ ~ 25 minutes")
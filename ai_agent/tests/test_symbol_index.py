@@ -0,0 +1,92 @@
+from app.utils.symbol_index import SymbolIndexService
+
+
+def outline(file_name, content):
+    index = SymbolIndexService().build_index(file_name, content)
+    return [(symbol.kind, symbol.name, symbol.start, symbol.end) for symbol in index.symbols]
+
+
+def test_javascript_call_statements_are_not_methods():
+    content = "\n".join([
+        "function handle(req) {",
+        "  const ok = check(req)",
+        "  validate(req)",
+        "  if (!ok) {",
+        "    return fail(req)",
+        "  }",
+        "  await save(req)",
+        "  items.forEach(function (item) {",
+        "    log(item)",
+        "  })",
+        "  it(\"saves\", async function () {",
+        "  })",
+        "}",
+        "",
+        "function save(req) {",
+        "  return db.insert(req)",
+        "}",
+        "",
+        "class Store {",
+        "  constructor(db) {",
+        "    this.db = db",
+        "  }",
+        "",
+        "  async load(id) {",
+        "    return this.db.get(id)",
+        "  }",
+        "}",
+    ])
+
+    assert outline("handler.js", content) == [
+        ("function", "handle", 1, 13),
+        ("function", "save", 15, 17),
+        ("class", "Store", 19, 27),
+        ("method", "constructor", 20, 22),
+        ("method", "load", 24, 26),
+    ]
+
+
+def test_go_call_statements_are_not_methods():
+    content = "\n".join([
+        "package main",
+        "",
+        "func (s *Server) Run() error {",
+        "\tvalidate(s.addr)",
+        "\tgo worker(s.jobs)",
+        "\tdefer close(s.jobs)",
+        "\tif err := save(s); err != nil {",
+        "\t\treturn err",
+        "\t}",
+        "\treturn nil",
+        "}",
+        "",
+        "func save(s *Server) error {",
+        "\treturn nil",
+        "}",
+    ])
+
+    assert outline("server.go", content) == [
+        ("function", "Run", 3, 11),
+        ("function", "save", 13, 15),
+    ]
+
+
+def test_typed_method_declarations_are_kept():
+    content = "\n".join([
+        "public class Repository {",
+        "    public List<User> findAll(int limit)",
+        "    {",
+        "        return query(limit);",
+        "    }",
+        "",
+        "    private void save(User user) throws IOException {",
+        "        writer.write(user);",
+        "    }",
+        "}",
+    ])
+
+    assert outline("Repository.java", content) == [
+        ("class", "Repository", 1, 10),
+        ("method", "findAll", 2, 5),
+        ("method", "save", 7, 9),
+    ]
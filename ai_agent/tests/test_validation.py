@@ -0,0 +1,28 @@
+from app.models.pr_event import PRPayloadV2
+from app.services.validation import validate_and_extract_pr_data, validate_git_ingestion_payload
+
+
+def payload(**fields):
+    return PRPayloadV2.model_validate({"pullRequest": {"prNumber": "3", "prTitle": "t", **fields}})
+
+
+def test_requests_without_an_analysis_id_are_rejected():
+    files = [{"prFileName": "a.py", "prFileDiff": "@@ -1 +1 @@\n-a\n+b"}]
+    is_valid, error_message, _ = validate_and_extract_pr_data(payload(prFiles=files))
+    assert not is_valid and "pullRequestAnalysisId" in error_message
+    is_valid, error_message = validate_git_ingestion_payload(payload(
+        prRepoCloneUrl="https://github.com/org/repo.git", prBaseSha="a" * 40, prHeadSha="b" * 40
+    ))
+    assert not is_valid and "pullRequestAnalysisId" in error_message
+
+    is_valid, _, extracted_data = validate_and_extract_pr_data(payload(prFiles=files, pullRequestAnalysisId="c" * 24))
+    assert is_valid and extracted_data["pullRequestAnalysisId"] == "c" * 24
+
+
+def test_ignored_files_are_filtered_out():
+    files = [{"prFileName": name, "prFileDiff": "@@ -1 +1 @@\n-a\n+b"} for name in ["src/a.py", "dist/b.js", "README.md"]]
+    is_valid, _, extracted_data = validate_and_extract_pr_data(payload(
+        prFiles=files, pullRequestAnalysisId="c" * 24, ignore=["dist/**", "*.md"]
+    ))
+    assert is_valid
+    assert [file_info["prFileName"] for file_info in extracted_data["prFiles"]] == ["src/a.py"]
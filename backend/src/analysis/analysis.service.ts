@@ -222,10 +222,15 @@ export class AnalysisService {
                     },
                     {
                         $set: {
-                            status: Status.COMPLETED,
+                            status: postReviewDto.failedReason
+                                ? Status.FAILED
+                                : Status.COMPLETED,
                             completedAt: new Date(),
+                            failedReason: postReviewDto.failedReason ?? null,
                             prReviewModelInfo: postReviewDto.modelInfo,
-                            prReviewUsageInfo: postReviewDto.usageInfo
+                            prReviewUsageInfo: postReviewDto.usageInfo,
+                            unchangedFiles: postReviewDto.unchangedFiles ?? [],
+                            excludedFiles: postReviewDto.excludedFiles ?? []
                         }
                     },
                     { new: true }
@@ -258,6 +263,11 @@ export class AnalysisService {
             })
         )
 
+        // A failed analysis has nothing to post to the pull request
+        if (postReviewDto.failedReason) {
+            return {}
+        }
+
         switch (analysis.provider) {
             case 'github':
                 await this.githubEventService.addPRReviewComments(
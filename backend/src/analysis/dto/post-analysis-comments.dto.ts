@@ -42,6 +42,17 @@ export class CommentDto {
     category: string
 }
 
+export class ExcludedFileDto {
+    @IsString()
+    fileName: string
+
+    @IsString()
+    kind: string
+
+    @IsString()
+    reason: string
+}
+
 export class PullRequestAnalysisCommentsDto {
     @IsMongoId()
     pullRequestAnalysisId: string
@@ -62,4 +73,19 @@ export class PullRequestAnalysisCommentsDto {
     @IsOptional()
     @IsNumber()
     completed: number
+
+    @IsOptional()
+    @IsArray()
+    @IsString({ each: true })
+    unchangedFiles?: string[]
+
+    @IsOptional()
+    @IsArray()
+    @ValidateNested({ each: true })
+    @Type(() => ExcludedFileDto)
+    excludedFiles?: ExcludedFileDto[]
+
+    @IsOptional()
+    @IsString()
+    failedReason?: string
 }
@@ -87,6 +87,8 @@ export class BitbucketEventsService {
             prFiles.push({
                 prFileName: fileName,
                 prFileStatus: file.status,
+                prFilePreviousName:
+                    file.status === 'renamed' ? file.old?.path : undefined,
                 prFileAdditions: file.lines_added || 0,
                 prFileDeletions: file.lines_removed || 0,
                 prFileChanges:
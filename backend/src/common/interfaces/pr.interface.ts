@@ -1,6 +1,7 @@
 export interface PRFile {
     prFileName: string
     prFileStatus: string
+    prFilePreviousName?: string
     prFileAdditions: number
     prFileDeletions: number
     prFileChanges: number
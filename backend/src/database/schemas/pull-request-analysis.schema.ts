@@ -61,6 +61,9 @@ export class PullRequestAnalysis {
     @Prop({ type: Date, default: null })
     completedAt: Date
 
+    @Prop({ type: String, default: null })
+    failedReason: string
+
     @Prop({
         required: true,
         type: Types.ObjectId,
@@ -88,6 +91,15 @@ export class PullRequestAnalysis {
 
     @Prop({ type: Number, default: 0 })
     potentialIssueCount: number
+
+    @Prop({ type: [String], default: [] })
+    unchangedFiles: string[]
+
+    @Prop({
+        type: [{ fileName: String, kind: String, reason: String, _id: false }],
+        default: []
+    })
+    excludedFiles: { fileName: string; kind: string; reason: string }[]
 }
 
 const schema = SchemaFactory.createForClass(PullRequestAnalysis)
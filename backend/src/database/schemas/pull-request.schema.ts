@@ -13,6 +13,9 @@ export class PRFile {
     @Prop({ nullable: true })
     prFileStatus: string
 
+    @Prop({ nullable: true })
+    prFilePreviousName: string
+
     @Prop({ default: 0 })
     prFileAdditions: number
 
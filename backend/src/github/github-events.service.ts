@@ -160,6 +160,7 @@ export class GithubEventService {
             prFiles.push({
                 prFileName: file.filename,
                 prFileStatus: file.status,
+                prFilePreviousName: file.previous_filename,
                 prFileAdditions: file.additions,
                 prFileDeletions: file.deletions,
                 prFileChanges: file.changes,